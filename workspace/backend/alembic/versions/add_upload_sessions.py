@@ -0,0 +1,38 @@
+"""Add upload sessions for direct-to-storage uploads
+
+Revision ID: upload_sessions_001
+Revises: pgvector_001
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = 'upload_sessions_001'
+down_revision: Union[str, None] = 'pgvector_001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Create the upload_sessions table"""
+    op.create_table('upload_sessions',
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('state', sa.String(length=20), nullable=False),
+    sa.Column('file_keys', sa.Text(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_upload_sessions_state'), 'upload_sessions', ['state'], unique=False)
+
+
+def downgrade() -> None:
+    """Drop the upload_sessions table"""
+    op.drop_index(op.f('ix_upload_sessions_state'), table_name='upload_sessions')
+    op.drop_table('upload_sessions')
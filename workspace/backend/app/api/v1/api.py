@@ -13,7 +13,8 @@ from app.api.v1.endpoints import (
     generation,
     chat,
     admin,
-    websocket
+    websocket,
+    webhooks
 )
 
 api_router = APIRouter()
@@ -26,4 +27,5 @@ api_router.include_router(algorithms.router, prefix="/algorithms", tags=["algori
 api_router.include_router(generation.router, prefix="/generation", tags=["generation"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(admin.router, prefix="/admin", tags=["admin"])
-api_router.include_router(websocket.router, prefix="/ws", tags=["websocket"])
\ No newline at end of file
+api_router.include_router(websocket.router, prefix="/ws", tags=["websocket"])
+api_router.include_router(webhooks.router, prefix="/webhooks", tags=["webhooks"])
\ No newline at end of file
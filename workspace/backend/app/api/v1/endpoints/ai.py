@@ -153,7 +153,7 @@ async def test_ai_services(current_user: User = Depends(get_current_user)):
         openai_available = vision_ai_service.openai_client is not None
         
         # Test embedding service
-        embedding_available = embedding_service.openai_client is not None
+        embedding_available = embedding_service.is_configured
         
         return {
             "success": True,
@@ -3,6 +3,7 @@ Chat and conversation management endpoints
 """
 from typing import Dict, Any, Optional, List
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from app.services.chat_service import chat_service, ChatServiceError, ConversationType, MessageType
 from app.core.dependencies import get_current_user
@@ -237,8 +238,22 @@ async def export_conversation(
 ):
     """
     Export conversation to various formats
+    
+    Plain-text exports are streamed to the client as they are produced.
     """
     try:
+        if format == "txt":
+            export = await chat_service.stream_conversation_export(
+                conversation_id=conversation_id,
+                user_id=current_user.id,
+                include_metadata=include_metadata
+            )
+            return StreamingResponse(
+                export["stream"],
+                media_type="text/plain; charset=utf-8",
+                headers={"Content-Disposition": f'attachment; filename="{export["filename"]}"'}
+            )
+        
         result = await chat_service.export_conversation(
             conversation_id=conversation_id,
             user_id=current_user.id,
@@ -429,21 +429,14 @@ async def delete_generation(
     Delete a generation
     """
     try:
-        from app.services.redis_service import redis_service
-        
         # Verify ownership
         result_data = await generation_service.get_generation_result(
             generation_id=generation_id,
             user_id=current_user.id
         )
         
-        # Delete from storage (mock implementation)
-        generation_key = f"generation:{generation_id}"
-        await redis_service.delete(generation_key)
-        
-        # Remove from user's history
-        user_generations_key = f"user:{current_user.id}:generations"
-        await redis_service.lrem(user_generations_key, generation_id, 0)
+        # Delete the stored record and remove it from the user's history
+        await generation_service.remove_from_history(current_user.id, generation_id)
         
         return {
             "success": True,
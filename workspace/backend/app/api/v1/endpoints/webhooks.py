@@ -0,0 +1,32 @@
+"""
+Provider webhook endpoints
+"""
+from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request
+from app.services.midjourney_service import midjourney_service
+
+router = APIRouter()
+
+@router.post("/midjourney/{callback_id}", response_model=Dict[str, Any])
+async def midjourney_webhook(
+    callback_id: str,
+    signature: str,
+    request: Request
+):
+    """
+    Receive a Midjourney provider callback and hand it to the waiting generation
+    """
+    if not midjourney_service.verify_webhook_signature(callback_id, signature):
+        raise HTTPException(status_code=403, detail="Invalid webhook signature")
+    
+    try:
+        payload = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    await midjourney_service.deliver_webhook(callback_id, payload)
+    
+    return {"success": True}
@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Literal, Optional, Union
 
 from pydantic import AnyHttpUrl, Field, model_validator, field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -76,6 +76,13 @@ class Settings(BaseSettings):
     EMBEDDING_DIMENSIONS: int = 1536
     EMBEDDING_CACHE_TTL: int = 86_400  # 24 hours
     EMBEDDING_BATCH_SIZE: int = 100
+    EMBEDDING_CACHE_QUANTIZE: bool = False  # Store cached embeddings as int8
+    EMBEDDING_L1_CACHE_SIZE: int = 10_000  # In-process entries in front of Redis
+    TEMPLATE_EMBEDDING_FORMAT: Literal["float32", "float16", "int8"] = "float16"  # Stored template search vectors
+
+    # Generation settings
+    MAX_CONCURRENT_UPSCALES: int = 4  # Per-process cap on in-flight Midjourney upscales
+    PUBLIC_WEBHOOK_URL: Optional[str] = None  # Externally reachable base URL; enables Midjourney webhooks
 
     @property
     def is_production(self) -> bool:
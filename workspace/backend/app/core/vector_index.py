@@ -0,0 +1,272 @@
+"""
+Routix Platform In-Process Vector Index
+Nearest-neighbour search over unit-normalized embeddings
+"""
+
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import faiss
+except ImportError:  # pragma: no cover - optional speedup
+    faiss = None
+
+try:
+    import torch
+except ImportError:  # pragma: no cover - optional speedup
+    torch = None
+
+
+class VectorIndex:
+    """
+    Inner-product index over L2-normalized float32 vectors keyed by string id
+
+    Uses an approximate FAISS HNSW graph when faiss is installed and an exact
+    NumPy scan otherwise (or always, with exact=True). Large exact indexes are
+    scanned on the GPU in float16 when torch has CUDA. HNSW graphs cannot
+    delete vectors, so replaced or removed rows are tombstoned and skipped at
+    search time until compaction.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(
+        self,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        exact: bool = False,
+        gpu_min_rows: int = 100_000
+    ):
+        self.hnsw_m = hnsw_m  # Graph neighbours per node
+        self.ef_search = ef_search  # Candidate list size at query time
+        self.exact = exact
+        self.gpu_min_rows = gpu_min_rows  # Below this a CPU GEMV beats the transfer overhead
+        self._cuda = torch is not None and torch.cuda.is_available()
+        # float16 mirror of the first _gpu_rows rows of _matrix
+        self._gpu_matrix = None
+        self._gpu_rows = 0
+        self.dim: Optional[int] = None
+        self._rows: Dict[str, int] = {}
+        self._ids: List[Optional[str]] = []
+        self._stale = 0
+        self._faiss = None
+        self._matrix: Optional[np.ndarray] = None
+
+    @property
+    def approximate(self) -> bool:
+        """Whether searches go through the FAISS HNSW graph"""
+        return faiss is not None and not self.exact
+
+    def add(self, key: str, vector: np.ndarray) -> None:
+        """Insert or replace the vector for a key"""
+        self.add_many([key], vector[None, :])
+
+    def add_many(self, keys: List[str], vectors: np.ndarray) -> None:
+        """Insert or replace vectors for several keys; rows must be unit-normalized"""
+        if not keys:
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if self.dim is None:
+            self.dim = vectors.shape[1]
+        elif vectors.shape[1] != self.dim:
+            raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index ({self.dim})")
+
+        # Later duplicates within the batch win
+        latest = {key: row for row, key in enumerate(keys)}
+        if len(latest) != len(keys):
+            keys = list(latest)
+            vectors = vectors[list(latest.values())]
+
+        for key in keys:
+            self.remove(key)
+
+        start = len(self._ids)
+        if self.approximate:
+            if self._faiss is None:
+                self._faiss = faiss.IndexHNSWFlat(self.dim, self.hnsw_m, faiss.METRIC_INNER_PRODUCT)
+                self._faiss.hnsw.efSearch = self.ef_search
+            self._faiss.add(vectors)
+        else:
+            end = start + len(keys)
+            if self._matrix is None or end > self._matrix.shape[0]:
+                # Grow geometrically so repeated single adds stay amortized O(d)
+                capacity = max(end, 2 * start, 64)
+                grown = np.empty((capacity, self.dim), dtype=np.float32)
+                if self._matrix is not None:
+                    grown[:start] = self._matrix[:start]
+                self._matrix = grown
+            self._matrix[start:end] = vectors
+
+        self._ids.extend(keys)
+        self._rows.update((key, start + offset) for offset, key in enumerate(keys))
+
+    def remove(self, key: str) -> bool:
+        """Drop a key from search results; returns whether it was indexed"""
+        row = self._rows.pop(key, None)
+        if row is None:
+            return False
+        self._ids[row] = None
+        self._stale += 1
+        if self._stale > len(self._rows):
+            self._compact()
+        return True
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (key, similarity) pairs for a unit query, best first"""
+        if k <= 0 or not self._rows:
+            return []
+        query = np.ascontiguousarray(query, dtype=np.float32)
+
+        # Over-fetch so tombstoned rows do not shrink the result set
+        fetch = min(k + self._stale, len(self._ids))
+        if self._faiss is not None:
+            self._faiss.hnsw.efSearch = max(self.ef_search, fetch)
+            scores, rows = self._faiss.search(query[None, :], fetch)
+            scores, rows = scores[0].tolist(), rows[0].tolist()
+        elif self._cuda and len(self._ids) >= self.gpu_min_rows:
+            rows, scores = self._search_gpu(query, fetch)
+        else:
+            # One GEMV over the pre-normalized rows, then an O(n) partial selection
+            # so only the top candidates are sorted
+            similarities = self._matrix[:len(self._ids)] @ query
+            if fetch < similarities.shape[0]:
+                top = np.argpartition(-similarities, fetch - 1)[:fetch]
+            else:
+                top = np.arange(similarities.shape[0])
+            top = top[np.argsort(-similarities[top])]
+            rows, scores = top.tolist(), similarities[top].tolist()
+
+        results = []
+        for row, score in zip(rows, scores):
+            if row < 0:
+                continue
+            key = self._ids[row]
+            if key is not None:
+                results.append((key, score))
+                if len(results) == k:
+                    break
+        return results
+
+    def search_subset(self, query: np.ndarray, keys: Iterable[str], k: int) -> List[Tuple[str, float]]:
+        """Exact top-k among the given keys, for candidate sets already narrowed by filters"""
+        keys = [key for key in keys if key in self._rows]
+        if k <= 0 or not keys:
+            return []
+        rows = np.fromiter((self._rows[key] for key in keys), dtype=np.int64, count=len(keys))
+        if self._faiss is not None:
+            vectors = self._faiss.reconstruct_batch(rows)
+        else:
+            vectors = self._matrix[rows]
+        similarities = vectors @ np.asarray(query, dtype=np.float32)
+        if k < similarities.shape[0]:
+            top = np.argpartition(-similarities, k - 1)[:k]
+        else:
+            top = np.arange(similarities.shape[0])
+        top = top[np.argsort(-similarities[top])]
+        return [(keys[position], score) for position, score in zip(top.tolist(), similarities[top].tolist())]
+
+    def clear(self) -> None:
+        """Remove all vectors"""
+        self._rows.clear()
+        self._ids.clear()
+        self._stale = 0
+        self._faiss = None
+        self._matrix = None
+        self._gpu_matrix = None
+        self._gpu_rows = 0
+
+    def _search_gpu(self, query: np.ndarray, fetch: int) -> Tuple[List[int], List[float]]:
+        """Top rows by float16 GEMV on the GPU; only the selected scores are copied back"""
+        count = len(self._ids)
+        if self._gpu_matrix is None or self._gpu_matrix.shape[0] < count:
+            self._gpu_matrix = torch.empty(
+                (self._matrix.shape[0], self.dim), dtype=torch.float16, device="cuda"
+            )
+            self._gpu_rows = 0
+        if self._gpu_rows < count:
+            # Rows are append-only between compactions, so only the tail needs uploading
+            self._gpu_matrix[self._gpu_rows:count] = torch.from_numpy(
+                self._matrix[self._gpu_rows:count]
+            ).to("cuda", dtype=torch.float16)
+            self._gpu_rows = count
+
+        query = torch.tensor(query, dtype=torch.float16, device="cuda")
+        scores, rows = torch.topk(torch.mv(self._gpu_matrix[:count], query).float(), fetch)
+        return rows.tolist(), scores.tolist()
+
+    def _compact(self) -> None:
+        """Rebuild without tombstoned rows"""
+        live = list(self._rows.values())
+        keys = [self._ids[row] for row in live]
+        if self._faiss is not None:
+            vectors = self._faiss.reconstruct_n(0, self._faiss.ntotal)[live]
+        else:
+            vectors = self._matrix[live]
+        self.clear()
+        self.add_many(keys, vectors)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+
+class SemanticCache:
+    """
+    Bounded TTL cache looked up by embedding similarity
+
+    A lookup hits when a stored query vector in the same scope is at least
+    threshold-similar to the probe, so paraphrased queries share results.
+    Not thread-safe; intended for use from a single event loop.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, threshold: float = 0.97, probe: int = 8):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.probe = probe  # Nearest entries checked for a matching scope
+        self._index = VectorIndex(exact=True)
+        self._entries: "OrderedDict[str, Tuple[Hashable, float, Any]]" = OrderedDict()
+        self._keys = itertools.count()
+
+    def get(self, vector: np.ndarray, scope: Hashable) -> Optional[Any]:
+        """Return the freshest-matching cached value for a unit vector, if any"""
+        if self._index.dim is not None and vector.shape[0] != self._index.dim:
+            return None
+        now = time.monotonic()
+        for key, similarity in self._index.search(vector, self.probe):
+            if similarity < self.threshold:
+                break
+            entry_scope, expires_at, value = self._entries[key]
+            if expires_at <= now:
+                self._evict(key)
+            elif entry_scope == scope:
+                self._entries.move_to_end(key)
+                return value
+        return None
+
+    def set(self, vector: np.ndarray, scope: Hashable, value: Any) -> None:
+        """Cache a value under a unit vector, evicting the least recently used entry when full"""
+        if self.maxsize <= 0 or (self._index.dim is not None and vector.shape[0] != self._index.dim):
+            return
+        key = str(next(self._keys))
+        self._index.add(key, vector)
+        self._entries[key] = (scope, time.monotonic() + self.ttl, value)
+        while len(self._entries) > self.maxsize:
+            self._evict(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._index.clear()
+        self._entries.clear()
+
+    def _evict(self, key: str) -> None:
+        self._entries.pop(key, None)
+        self._index.remove(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -18,6 +18,11 @@ from app.core.config import settings
 from app.core.database import engine
 from app.api.v1.api import api_router
 from app.core.exceptions import RouxixException
+from app.services.embedding_service import embedding_service
+from app.services.generation_service import generation_service
+from app.services.midjourney_service import midjourney_service
+from app.services.storage_service import storage_service
+from app.services.template_service import template_service
 
 
 # Configure logging
@@ -40,12 +45,20 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
     # async with engine.begin() as conn:
     #     await conn.run_sync(Base.metadata.create_all)
 
+    generation_service.start_analytics_flusher()
+    template_service.start_analytics_flusher()
+
     logger.info("✅ Routix Platform started successfully!")
 
     try:
         yield
     finally:
         logger.info("🛑 Shutting down Routix Platform…")
+        await generation_service.stop_analytics_flusher()
+        await template_service.stop_analytics_flusher()
+        await embedding_service.close()
+        await midjourney_service.close()
+        await storage_service.close()
         await engine.dispose()
         logger.info("✅ Shutdown complete")
 
@@ -8,7 +8,7 @@ from .user import User
 from .template import Template
 from .generation import GenerationAlgorithm, GenerationRequest
 from .conversation import Conversation, Message
-from .asset import UserAsset
+from .asset import UserAsset, UploadSession
 from .transaction import CreditTransaction, Subscription
 from .audit import AdminAuditLog, TemplatePerformance, SystemSettings
 
@@ -29,6 +29,7 @@ __all__ = [
     "Conversation",
     "Message",
     "UserAsset",
+    "UploadSession",
     "CreditTransaction",
     "Subscription",
     "AdminAuditLog",
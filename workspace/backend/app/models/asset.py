@@ -1,7 +1,7 @@
 """
 User assets and related models
 """
-from sqlalchemy import Column, String, Integer, Boolean, BigInteger, ForeignKey
+from sqlalchemy import Column, String, Integer, Boolean, BigInteger, DateTime, ForeignKey, Text
 from sqlalchemy.orm import relationship
 from .base import BaseModel
 
@@ -23,4 +23,17 @@ class UserAsset(BaseModel):
     user = relationship("User", back_populates="user_assets")
     
     def __repr__(self):
-        return f"<UserAsset(id={self.id}, type={self.asset_type}, file_name={self.file_name})>"
\ No newline at end of file
+        return f"<UserAsset(id={self.id}, type={self.asset_type}, file_name={self.file_name})>"
+
+
+class UploadSession(BaseModel):
+    """Direct-to-storage upload session covering one or more files"""
+    __tablename__ = "upload_sessions"
+    
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=True)
+    state = Column(String(20), default="pending", nullable=False, index=True)  # pending, committed, aborted
+    file_keys = Column(Text, default='[]', nullable=False)  # JSON list as text
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+    
+    def __repr__(self):
+        return f"<UploadSession(id={self.id}, state={self.state})>"
@@ -3,9 +3,10 @@ Chat Service for Routix Platform
 Handles conversation creation, message management, and AI-powered features
 """
 import asyncio
+import io
 import json
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any, Union
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 from enum import Enum
 import uuid
 import re
@@ -54,6 +55,7 @@ class ChatService:
         
         # Search configuration
         self.search_limit = 50
+        self.search_scan_length = 4096  # Characters of each message scanned by search
         self.context_window = 10  # Messages for context
         
     async def create_conversation(
@@ -459,12 +461,31 @@ class ChatService:
             else:
                 # Search across all user's conversations
                 user_conversations = await self._get_user_conversations(user_id, 100, 0)
+                per_conversation_limit = limit // max(len(user_conversations), 1) + 1
                 
-                for conv in user_conversations:
-                    conv_results = await self._search_conversation_messages(
-                        conv["id"], user_id, query, limit // len(user_conversations) + 1
+                # Fetch the next conversation's messages while scanning the current one
+                next_fetch = None
+                if user_conversations:
+                    next_fetch = asyncio.create_task(
+                        self._get_conversation_messages(user_conversations[0]["id"], 100)
                     )
-                    search_results.extend(conv_results)
+                
+                try:
+                    for index, conv in enumerate(user_conversations):
+                        messages = await next_fetch
+                        next_fetch = None
+                        if index + 1 < len(user_conversations):
+                            next_fetch = asyncio.create_task(
+                                self._get_conversation_messages(user_conversations[index + 1]["id"], 100)
+                            )
+                        
+                        conv_results = await self._search_conversation_messages(
+                            conv["id"], user_id, query, per_conversation_limit, messages=messages
+                        )
+                        search_results.extend(conv_results)
+                finally:
+                    if next_fetch is not None:
+                        next_fetch.cancel()
             
             # Sort by relevance and recency
             search_results.sort(key=lambda x: (x["relevance_score"], x["timestamp"]), reverse=True)
@@ -503,32 +524,7 @@ class ChatService:
             Export data or file path
         """
         try:
-            # Validate access
-            conversation_data = await self._get_cached_conversation_data(conversation_id)
-            
-            if not conversation_data:
-                raise ChatServiceError(f"Conversation not found: {conversation_id}")
-            
-            if user_id not in conversation_data.get("participants", []):
-                raise ChatServiceError("Access denied to conversation")
-            
-            # Get all messages
-            messages = await self._get_conversation_messages(conversation_id, self.max_messages_per_conversation)
-            
-            # Prepare export data
-            export_data = {
-                "conversation": conversation_data,
-                "messages": messages,
-                "exported_at": datetime.now(timezone.utc).isoformat(),
-                "exported_by": user_id,
-                "format": format
-            }
-            
-            if not include_metadata:
-                # Remove metadata from conversation and messages
-                export_data["conversation"].pop("metadata", None)
-                for msg in export_data["messages"]:
-                    msg.pop("metadata", None)
+            export_data = await self._prepare_export_data(conversation_id, user_id, format, include_metadata)
             
             # Format-specific processing
             if format == "json":
@@ -540,7 +536,10 @@ class ChatService:
             
             elif format == "txt":
                 # Convert to plain text
-                text_content = self._format_conversation_as_text(export_data)
+                buffer = io.StringIO()
+                async for chunk in self._stream_conversation_as_text(export_data):
+                    buffer.write(chunk)
+                text_content = buffer.getvalue()
                 result = {
                     "export_type": "txt",
                     "content": text_content,
@@ -567,6 +566,39 @@ class ChatService:
             logger.info(f"Export failed for conversation {conversation_id}: {e}")
             raise ChatServiceError(f"Export failed: {str(e)}")
     
+    async def stream_conversation_export(
+        self,
+        conversation_id: str,
+        user_id: str,
+        include_metadata: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Export conversation as plain text produced incrementally
+        
+        Args:
+            conversation_id: Conversation ID to export
+            user_id: User requesting export
+            include_metadata: Whether to include metadata
+            
+        Returns:
+            Filename and an async iterator of text chunks
+        """
+        try:
+            export_data = await self._prepare_export_data(conversation_id, user_id, "txt", include_metadata)
+            
+            # Track export
+            await self._track_conversation_event(conversation_id, "exported", user_id)
+            
+            return {
+                "export_type": "txt",
+                "stream": self._stream_conversation_as_text(export_data),
+                "filename": f"conversation_{conversation_id}_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.txt"
+            }
+            
+        except Exception as e:
+            logger.info(f"Export failed for conversation {conversation_id}: {e}")
+            raise ChatServiceError(f"Export failed: {str(e)}")
+    
     # Private helper methods
     
     def _generate_conversation_id(self) -> str:
@@ -766,48 +798,91 @@ class ChatService:
         conversation_id: str,
         user_id: str,
         query: str,
-        limit: int
+        limit: int,
+        messages: Optional[List[Dict[str, Any]]] = None
     ) -> List[Dict[str, Any]]:
-        """Search messages within a conversation"""
+        """Search messages within a conversation, optionally using prefetched messages"""
         # Mock search implementation
-        messages = await self._get_conversation_messages(conversation_id, 100)
+        if messages is None:
+            messages = await self._get_conversation_messages(conversation_id, 100)
+        
+        # Lowercase the query once rather than per message
+        query_lc = query.lower()
         
         search_results = []
         for msg in messages:
-            if query.lower() in msg.get("content", "").lower():
+            if len(search_results) >= limit:
+                break
+            
+            content = msg.get("content", "")
+            if query_lc in content[:self.search_scan_length].lower():
                 search_results.append({
                     "conversation_id": conversation_id,
                     "message_id": msg["id"],
-                    "content": msg["content"],
+                    "content": content,
                     "sender_id": msg["sender_id"],
                     "timestamp": msg["created_at"],
                     "relevance_score": 0.8,  # Mock relevance
-                    "context": msg.get("content", "")[:200]  # Context snippet
+                    "context": content[:200]  # Context snippet
                 })
         
-        return search_results[:limit]
+        return search_results
     
-    def _format_conversation_as_text(self, export_data: Dict[str, Any]) -> str:
-        """Format conversation as plain text"""
+    async def _prepare_export_data(
+        self,
+        conversation_id: str,
+        user_id: str,
+        format: str,
+        include_metadata: bool
+    ) -> Dict[str, Any]:
+        """Validate access and gather conversation data for export"""
+        # Validate access
+        conversation_data = await self._get_cached_conversation_data(conversation_id)
+        
+        if not conversation_data:
+            raise ChatServiceError(f"Conversation not found: {conversation_id}")
+        
+        if user_id not in conversation_data.get("participants", []):
+            raise ChatServiceError("Access denied to conversation")
+        
+        # Get all messages
+        messages = await self._get_conversation_messages(conversation_id, self.max_messages_per_conversation)
+        
+        # Prepare export data
+        export_data = {
+            "conversation": conversation_data,
+            "messages": messages,
+            "exported_at": datetime.now(timezone.utc).isoformat(),
+            "exported_by": user_id,
+            "format": format
+        }
+        
+        if not include_metadata:
+            # Remove metadata from conversation and messages
+            export_data["conversation"].pop("metadata", None)
+            for msg in export_data["messages"]:
+                msg.pop("metadata", None)
+        
+        return export_data
+    
+    async def _stream_conversation_as_text(self, export_data: Dict[str, Any]) -> AsyncIterator[str]:
+        """Format conversation as plain text, yielding one chunk per line"""
         conversation = export_data["conversation"]
         messages = export_data["messages"]
         
-        text_lines = [
-            f"Conversation: {conversation['title']}",
-            f"Created: {conversation['created_at']}",
-            f"Participants: {', '.join(conversation['participants'])}",
-            "-" * 50,
-            ""
-        ]
+        yield (
+            f"Conversation: {conversation['title']}\n"
+            f"Created: {conversation['created_at']}\n"
+            f"Participants: {', '.join(conversation['participants'])}\n"
+            + "-" * 50 + "\n"
+        )
         
         for msg in messages:
             timestamp = msg["created_at"]
             sender = msg["sender_id"]
             content = msg["content"]
             
-            text_lines.append(f"[{timestamp}] {sender}: {content}")
-        
-        return "\n".join(text_lines)
+            yield f"\n[{timestamp}] {sender}: {content}"
 
 # Global chat service instance
 chat_service = ChatService()
\ No newline at end of file
@@ -3,27 +3,135 @@ Embedding service for generating vector embeddings
 """
 import asyncio
 import hashlib
-from typing import List, Optional, Dict, Any
+import random
+import struct
+import sys
+from array import array
+from typing import List, Optional, Dict, Any, Tuple
+import httpx
 import openai
+from app.core.cache import LRUCache
 from app.core.config import settings
 from app.services.redis_service import redis_service
 
 import logging
 logger = logging.getLogger(__name__)
 
+# Version prefixes for packed embeddings in the cache
+EMBEDDING_FORMAT_FLOAT32 = b"\x01"
+EMBEDDING_FORMAT_INT8 = b"\x02"
+EMBEDDING_FORMAT_FLOAT16 = b"\x03"
+
+
+def _to_little_endian(vector: array) -> array:
+    if sys.byteorder != "little":
+        vector.byteswap()
+    return vector
+
+
+def pack_embedding(embedding: List[float], quantize: bool = False) -> bytes:
+    """
+    Pack an embedding into the binary cache format
+    
+    Float32 keeps full cache precision; int8 stores a float32 scale followed
+    by symmetric int8 values, a quarter of the size for similarity-only use.
+    """
+    if not quantize:
+        return EMBEDDING_FORMAT_FLOAT32 + _to_little_endian(array("f", embedding)).tobytes()
+    
+    max_abs = max((abs(value) for value in embedding), default=0.0)
+    scale = max_abs / 127 if max_abs else 1.0
+    quantized = array("b", (max(-127, min(127, round(value / scale))) for value in embedding))
+    return (
+        EMBEDDING_FORMAT_INT8
+        + _to_little_endian(array("f", [scale])).tobytes()
+        + quantized.tobytes()
+    )
+
+
+def unpack_embedding(blob: Optional[bytes]) -> Optional[List[float]]:
+    """Unpack a cached embedding, returning None for unknown formats"""
+    if not blob:
+        return None
+    
+    fmt = blob[:1]
+    if fmt == EMBEDDING_FORMAT_FLOAT32:
+        vector = array("f")
+        vector.frombytes(blob[1:])
+        return _to_little_endian(vector).tolist()
+    
+    if fmt == EMBEDDING_FORMAT_INT8:
+        scale = array("f")
+        scale.frombytes(blob[1:5])
+        scale = _to_little_endian(scale)[0]
+        quantized = array("b")
+        quantized.frombytes(blob[5:])
+        return [value * scale for value in quantized]
+    
+    if fmt == EMBEDDING_FORMAT_FLOAT16:
+        return list(struct.unpack(f"<{(len(blob) - 1) // 2}e", blob[1:]))
+    
+    return None
+
 
 class EmbeddingService:
     """Service for generating text embeddings"""
     
     def __init__(self):
-        if hasattr(settings, 'OPENAI_API_KEY') and settings.OPENAI_API_KEY:
-            self.openai_client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
-            self.openai_client = None
+        self.api_key = getattr(settings, 'OPENAI_API_KEY', None)
+        if not self.api_key:
             logger.warning("OPENAI_API_KEY not configured for embeddings")
         
+        # Created lazily on first use and shared by all requests on the same event loop
+        self.openai_client: Optional[openai.AsyncOpenAI] = None
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         self.model = "text-embedding-3-small"
+        self.dimensions = settings.EMBEDDING_DIMENSIONS
         self.max_retries = 3
+        self.retry_base_delay = 1.0
+        self.retry_max_delay = 60.0
+        # int8 cache entries trade a little precision for 4x smaller payloads
+        self.quantize_cache = settings.EMBEDDING_CACHE_QUANTIZE
+        
+        # In-process cache of packed float32 embeddings, checked before Redis
+        self._l1_cache = LRUCache(settings.EMBEDDING_L1_CACHE_SIZE)
+        
+        # In-flight requests keyed by cache key so concurrent callers share one API call
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Bounds batches scheduled ahead of need by generate_batch_embeddings_nowait
+        self.max_prefetch_batches = 2
+        self._prefetch_semaphore = asyncio.Semaphore(self.max_prefetch_batches)
+    
+    @property
+    def is_configured(self) -> bool:
+        """Whether an API key is available for embedding requests"""
+        return bool(self.api_key)
+    
+    def _client(self) -> openai.AsyncOpenAI:
+        """Return the shared async client, creating it for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self.openai_client is None or self._client_loop is not loop:
+            if self._http_client is not None:
+                # Its loop ended without close(); the pool can no longer be released
+                logger.warning("Embedding HTTP client from a finished event loop was never closed")
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(max_keepalive_connections=64, max_connections=256),
+                timeout=30
+            )
+            self.openai_client = openai.AsyncOpenAI(api_key=self.api_key, http_client=self._http_client)
+            self._client_loop = loop
+        return self.openai_client
+    
+    async def close(self) -> None:
+        """Release pooled HTTP connections"""
+        client, self._http_client = self._http_client, None
+        self.openai_client = None
+        self._client_loop = None
+        if client is not None:
+            await client.aclose()
     
     async def generate_embedding(self, text: str, cache_ttl: int = 86400) -> List[float]:
         """
@@ -36,23 +144,96 @@ class EmbeddingService:
         Returns:
             List of float values representing the embedding
         """
-        if not self.openai_client:
+        # Nothing to embed; skip hashing, cache and API round trips
+        if not text or not text.strip():
+            return [0.0] * self.dimensions
+        
+        if not self.is_configured:
             raise Exception("OpenAI client not configured")
         
-        # Create cache key
-        text_hash = hashlib.md5(text.encode()).hexdigest()
-        cache_key = f"embedding:{self.model}:{text_hash}"
+        cache_key = self._cache_key(text)
         
         # Check cache first
-        cached_embedding = await redis_service.get(cache_key)
+        cached_embedding = await self._get_cached_embedding(cache_key)
         if cached_embedding:
             return cached_embedding
         
-        # Generate new embedding
+        # Join an identical request that is already in flight
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[cache_key] = future
+        try:
+            embedding = await self._request_embedding(text, cache_key, cache_ttl)
+        except BaseException as e:
+            self._fail_inflight(future, e)
+            raise
+        else:
+            future.set_result(embedding)
+            return embedding
+        finally:
+            del self._inflight[cache_key]
+    
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Exponential backoff with jitter, honoring Retry-After on rate limits"""
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+            try:
+                return min(self.retry_max_delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+        
+        base_delay = self.retry_base_delay
+        if isinstance(error, openai.APIConnectionError):
+            # Connection blips usually clear quickly
+            base_delay /= 4
+        
+        delay = min(self.retry_max_delay, base_delay * (2 ** attempt))
+        return delay * (0.5 + random.random())
+    
+    def _cache_key(self, text: str) -> str:
+        """Build the cache key for a text"""
+        return self._cache_key_bytes(text.encode("utf-8"))
+    
+    def _cache_key_bytes(self, data: bytes) -> str:
+        """Build the cache key for already-encoded UTF-8 text"""
+        return f"embedding:{self.model}:{hashlib.blake2b(data, digest_size=16).hexdigest()}"
+    
+    async def _get_cached_embedding(self, cache_key: str) -> Optional[List[float]]:
+        """Read an embedding from the in-process cache, falling back to Redis"""
+        packed = self._l1_cache.get(cache_key)
+        if packed is not None:
+            return unpack_embedding(packed)
+        
+        embedding = unpack_embedding(await redis_service.get_bytes(cache_key))
+        if embedding:
+            self._l1_cache.set(cache_key, pack_embedding(embedding))
+        return embedding
+    
+    async def _cache_embedding(self, cache_key: str, embedding: List[float], cache_ttl: int) -> None:
+        """Write an embedding to the in-process cache and Redis"""
+        self._l1_cache.set(cache_key, pack_embedding(embedding))
+        await redis_service.set_bytes(cache_key, pack_embedding(embedding, self.quantize_cache), cache_ttl)
+    
+    @staticmethod
+    def _fail_inflight(future: asyncio.Future, error: BaseException) -> None:
+        """Propagate a failure to callers waiting on an in-flight request"""
+        if future.done():
+            return
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+            return
+        future.set_exception(error)
+        # Mark the exception as retrieved in case nobody else is waiting
+        future.exception()
+    
+    async def _request_embedding(self, text: str, cache_key: str, cache_ttl: int) -> List[float]:
+        """Call the embeddings API with retries and cache the result"""
         for attempt in range(self.max_retries):
             try:
-                response = await asyncio.to_thread(
-                    self.openai_client.embeddings.create,
+                response = await self._client().embeddings.create(
                     model=self.model,
                     input=text,
                     encoding_format="float"
@@ -61,14 +242,15 @@ class EmbeddingService:
                 embedding = response.data[0].embedding
                 
                 # Cache the result
-                await redis_service.set(cache_key, embedding, cache_ttl)
+                await self._cache_embedding(cache_key, embedding, cache_ttl)
                 
                 return embedding
                 
             except Exception as e:
                 if attempt < self.max_retries - 1:
-                    logger.info(f"Embedding generation failed (attempt {attempt + 1}): {e}")
-                    await asyncio.sleep(1 * (attempt + 1))
+                    delay = self._retry_delay(attempt, e)
+                    logger.info(f"Embedding generation failed (attempt {attempt + 1}): {e}, retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
                     continue
                 else:
                     raise Exception(f"Failed to generate embedding after {self.max_retries} attempts: {e}")
@@ -87,49 +269,114 @@ class EmbeddingService:
         if not texts:
             return []
         
-        # Check cache for each text
-        embeddings = []
+        # Empty texts get a zero vector without any I/O
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+        cache_keys: List[Optional[str]] = [None] * len(texts)
+        lookup_indices = []
+        
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                embeddings[i] = [0.0] * self.dimensions
+                continue
+            cache_keys[i] = self._cache_key(text)
+            lookup_indices.append(i)
+        
+        # Check cache for remaining texts concurrently
+        cached = await asyncio.gather(*(self._get_cached_embedding(cache_keys[i]) for i in lookup_indices))
+        
         uncached_texts = []
         uncached_indices = []
         
-        for i, text in enumerate(texts):
-            text_hash = hashlib.md5(text.encode()).hexdigest()
-            cache_key = f"embedding:{self.model}:{text_hash}"
-            cached_embedding = await redis_service.get(cache_key)
-            
+        for i, cached_embedding in zip(lookup_indices, cached):
             if cached_embedding:
-                embeddings.append(cached_embedding)
+                embeddings[i] = cached_embedding
             else:
-                embeddings.append(None)  # Placeholder
-                uncached_texts.append(text)
+                uncached_texts.append(texts[i])
                 uncached_indices.append(i)
         
         # Generate embeddings for uncached texts
         if uncached_texts:
-            try:
-                response = await asyncio.to_thread(
-                    self.openai_client.embeddings.create,
-                    model=self.model,
-                    input=uncached_texts,
-                    encoding_format="float"
-                )
+            loop = asyncio.get_running_loop()
+            owned: Dict[str, asyncio.Future] = {}
+            joined: Dict[int, asyncio.Future] = {}
+            # Unique texts to send, mapped to every position they fill in the output
+            unique_uncached: Dict[str, Tuple[str, List[int]]] = {}
+            
+            for text, index in zip(uncached_texts, uncached_indices):
+                cache_key = cache_keys[index]
+                
+                if cache_key in unique_uncached:
+                    unique_uncached[cache_key][1].append(index)
+                    continue
+                
+                # Another caller is already embedding this text
+                inflight = self._inflight.get(cache_key)
+                if inflight is not None:
+                    joined[index] = inflight
+                    continue
                 
-                # Cache and store results
-                for i, embedding_data in enumerate(response.data):
-                    embedding = embedding_data.embedding
-                    original_index = uncached_indices[i]
-                    embeddings[original_index] = embedding
+                owned[cache_key] = loop.create_future()
+                self._inflight[cache_key] = owned[cache_key]
+                unique_uncached[cache_key] = (text, [index])
+            
+            try:
+                if unique_uncached:
+                    request_keys = list(unique_uncached)
+                    response = await self._client().embeddings.create(
+                        model=self.model,
+                        input=[unique_uncached[key][0] for key in request_keys],
+                        encoding_format="float"
+                    )
                     
-                    # Cache the result
-                    text = uncached_texts[i]
-                    text_hash = hashlib.md5(text.encode()).hexdigest()
-                    cache_key = f"embedding:{self.model}:{text_hash}"
-                    await redis_service.set(cache_key, embedding, cache_ttl)
+                    # Cache and store results
+                    for cache_key, embedding_data in zip(request_keys, response.data):
+                        embedding = embedding_data.embedding
+                        for original_index in unique_uncached[cache_key][1]:
+                            embeddings[original_index] = embedding
+                        
+                        future = owned[cache_key]
+                        if not future.done():
+                            future.set_result(embedding)
+                        
+                        # Cache the result
+                        await self._cache_embedding(cache_key, embedding, cache_ttl)
                 
-            except Exception as e:
-                raise Exception(f"Batch embedding generation failed: {e}")
+            except BaseException as e:
+                for future in owned.values():
+                    self._fail_inflight(future, e)
+                if isinstance(e, Exception):
+                    raise Exception(f"Batch embedding generation failed: {e}")
+                raise
+            finally:
+                for cache_key, future in owned.items():
+                    if self._inflight.get(cache_key) is future:
+                        del self._inflight[cache_key]
+            
+            for index, future in joined.items():
+                embeddings[index] = await asyncio.shield(future)
         
         return embeddings
+    
+    def generate_batch_embeddings_nowait(self, texts: List[str], cache_ttl: int = 86400) -> asyncio.Task:
+        """
+        Schedule batch embedding generation without waiting for it
+        
+        Lets callers prefetch embeddings for the next page of work while they
+        process the current one. Await the returned task when the embeddings
+        are needed; at most max_prefetch_batches run at once.
+        
+        Args:
+            texts: List of texts to embed
+            cache_ttl: Cache time-to-live in seconds
+            
+        Returns:
+            Task resolving to the list of embeddings
+        """
+        async def prefetch() -> List[List[float]]:
+            async with self._prefetch_semaphore:
+                return await self.generate_batch_embeddings(texts, cache_ttl)
+        
+        return asyncio.create_task(prefetch())
 
 # Global embedding service instance
 embedding_service = EmbeddingService()
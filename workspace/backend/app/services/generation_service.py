@@ -4,15 +4,20 @@ Orchestrates the complete thumbnail generation pipeline
 """
 import asyncio
 import json
+import random
+import time
+from dataclasses import asdict, dataclass, field
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from enum import Enum
 import uuid
+from pydantic import TypeAdapter, ValidationError
+from app.core.cache import LRUCache
 from app.core.config import settings
 from app.services.template_service import template_service, TemplateServiceError
 from app.services.midjourney_service import midjourney_service, MidjourneyServiceError
 from app.services.ai_service import vision_ai_service, embedding_service, AIServiceError
-from app.services.redis_service import redis_service
+from app.services.redis_service import redis_service, RedisPipeline
 from app.workers.generation_tasks import generate_thumbnail_with_midjourney
 
 import logging
@@ -31,10 +36,51 @@ class GenerationStatus(str, Enum):
     FAILED = "failed"
     CANCELLED = "cancelled"
 
+@dataclass(slots=True)
+class GenerationRequest:
+    """In-flight generation request; converted to a dict only when cached or queued"""
+    id: str
+    user_id: str
+    prompt: str
+    template_id: Optional[str]
+    user_face_url: Optional[str]
+    user_logo_url: Optional[str]
+    custom_text: Optional[str]
+    aspect_ratio: str
+    model: str
+    priority: str
+    status: str
+    progress: int
+    created_at: str
+    updated_at: str
+    estimated_completion: str
+    created_at_ts: float
+    estimated_completion_ts: float
+    credits_cost: int
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    pipeline_task_id: Optional[str] = None
+
+# Statuses after which a generation no longer changes
+_TERMINAL_STATUSES = frozenset({
+    GenerationStatus.COMPLETED.value,
+    GenerationStatus.FAILED.value,
+    GenerationStatus.CANCELLED.value
+})
+
 class GenerationServiceError(Exception):
     """Custom exception for generation service errors"""
     pass
 
+# Compiled once; validates and coerces cached records and task payloads
+_generation_request_validator = TypeAdapter(GenerationRequest)
+
+def validate_generation_request(data: Dict[str, Any]) -> GenerationRequest:
+    """Validate a generation request dict, ignoring fields added after creation"""
+    try:
+        return _generation_request_validator.validate_python(data)
+    except ValidationError as e:
+        raise GenerationServiceError(f"Invalid generation request: {e}")
+
 class GenerationService:
     """Complete generation pipeline orchestration service"""
     
@@ -48,11 +94,35 @@ class GenerationService:
         # Cache configuration
         self.cache_ttl = 86400  # 24 hours
         self.progress_ttl = 3600  # 1 hour for progress tracking
+        self.task_progress_ttl = 1  # Seconds pollers share one result backend read
+        self.result_cache_ttl = 3600  # 1 hour for assembled results
+        self.analytics_ttl = 86400 * 30  # 30 days
         
         # Credit costs
         self.generation_cost = 1
         self.upscale_cost = 1
         self.premium_generation_cost = 2
+        # Per-priority overrides; other priorities pay generation_cost
+        self._priority_cost = {"high": self.premium_generation_cost}
+        
+        # Bounds concurrent upscale calls to the Midjourney provider
+        self.max_concurrent_upscales = settings.MAX_CONCURRENT_UPSCALES
+        self._upscale_semaphore = asyncio.Semaphore(self.max_concurrent_upscales)
+        
+        # Fetches shared by concurrent status/result requests, keyed by generation ID
+        self._inflight_status: Dict[str, asyncio.Future] = {}
+        self._inflight_results: Dict[str, asyncio.Future] = {}
+        
+        # Reused Celery AsyncResult handles for tasks still being polled
+        self._task_results = LRUCache(1024)
+        
+        # Analytics events are batched by a background flusher while the API runs;
+        # without it (e.g. in Celery workers) each event is written directly
+        self.analytics_queue_size = 10000
+        self.analytics_batch_size = 256
+        self.analytics_flush_interval = 0.2  # seconds
+        self._analytics_queue: Optional[asyncio.Queue] = None
+        self._analytics_flusher: Optional[asyncio.Task] = None
         
     async def create_generation(
         self,
@@ -92,42 +162,60 @@ class GenerationService:
             # Validate user credits
             await self._validate_user_credits(user_id, priority)
             
+            now = datetime.now(timezone.utc)
+            now_iso = now.isoformat()
+            
             # Create generation request
-            generation_request = {
-                "id": generation_id,
-                "user_id": user_id,
-                "prompt": prompt,
-                "template_id": template_id,
-                "user_face_url": user_face_url,
-                "user_logo_url": user_logo_url,
-                "custom_text": custom_text,
-                "aspect_ratio": aspect_ratio,
-                "model": model,
-                "priority": priority,
-                "status": GenerationStatus.PENDING,
-                "progress": 0,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-                "estimated_completion": (datetime.now(timezone.utc) + timedelta(minutes=10)).isoformat(),
-                "credits_cost": self._calculate_credits_cost(priority),
-                "metadata": {
+            generation = GenerationRequest(
+                id=generation_id,
+                user_id=user_id,
+                prompt=prompt,
+                template_id=template_id,
+                user_face_url=user_face_url,
+                user_logo_url=user_logo_url,
+                custom_text=custom_text,
+                aspect_ratio=aspect_ratio,
+                model=model,
+                priority=priority,
+                status=GenerationStatus.PENDING.value,
+                progress=0,
+                created_at=now_iso,
+                updated_at=now_iso,
+                estimated_completion=(now + timedelta(minutes=10)).isoformat(),
+                # Epoch copies spare status polls from parsing ISO timestamps
+                created_at_ts=now.timestamp(),
+                estimated_completion_ts=now.timestamp() + 600,
+                credits_cost=self._calculate_credits_cost(priority),
+                metadata={
                     "pipeline_version": "1.0",
                     "ai_services_used": []
                 }
-            }
+            )
             
-            # Cache generation request
-            await self._cache_generation_data(generation_id, generation_request)
+            generation_request = asdict(generation)
             
-            # Start generation pipeline
-            pipeline_task_id = await self._start_generation_pipeline(generation_request)
-            generation_request["pipeline_task_id"] = pipeline_task_id
+            # Cache and index the request before queueing; the worker loads it first
+            await self._save_generation(generation_id, generation_request)
+            
+            # Start generation pipeline while recording the creation event
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    pipeline_task = tg.create_task(self._start_generation_pipeline(generation_request))
+                    tg.create_task(self._track_generation_event(generation_id, "created", user_id))
+            except ExceptionGroup as eg:
+                failed = {
+                    "status": GenerationStatus.FAILED.value,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                }
+                generation_request.update(failed)
+                await self._save_generation(generation_id, generation_request, changed=failed)
+                raise eg.exceptions[0]
             
-            # Update cache with task ID
-            await self._cache_generation_data(generation_id, generation_request)
+            pipeline_task_id = pipeline_task.result()
+            generation_request["pipeline_task_id"] = pipeline_task_id
             
-            # Track generation start
-            await self._track_generation_event(generation_id, "created", user_id)
+            # Only the task ID is patched; the worker may already be updating the record
+            await self._record_pipeline_task(generation_id, pipeline_task_id)
             
             logger.info(f"Generation request created: {generation_id}")
             
@@ -137,7 +225,7 @@ class GenerationService:
             }
             
         except Exception as e:
-            logger.info(f"Generation creation failed: {e}")
+            logger.exception(f"Generation creation failed: {e}")
             raise GenerationServiceError(f"Failed to create generation: {str(e)}")
     
     async def get_generation_status(
@@ -156,22 +244,21 @@ class GenerationService:
             Generation status and progress data
         """
         try:
-            # Get generation data
-            generation_data = await self._get_cached_generation_data(generation_id)
+            # Concurrent polls for the same generation share one fetch
+            status_data = await self._coalesce(
+                self._inflight_status, generation_id,
+                lambda: self._fetch_generation_status(generation_id)
+            )
             
-            if not generation_data:
+            if not status_data:
                 raise GenerationServiceError(f"Generation not found: {generation_id}")
             
             # Validate ownership if user_id provided
-            if user_id and generation_data.get("user_id") != user_id:
+            if user_id and status_data.get("user_id") != user_id:
                 raise GenerationServiceError("Access denied")
             
-            # Get real-time progress from Celery task
-            pipeline_task_id = generation_data.get("pipeline_task_id")
-            if pipeline_task_id:
-                task_progress = await self._get_task_progress(pipeline_task_id)
-                if task_progress:
-                    generation_data.update(task_progress)
+            # Copy so per-caller fields do not leak into the shared result
+            generation_data = dict(status_data)
             
             # Calculate time estimates
             generation_data["time_estimates"] = self._calculate_time_estimates(generation_data)
@@ -179,7 +266,7 @@ class GenerationService:
             return generation_data
             
         except Exception as e:
-            logger.info(f"Failed to get generation status {generation_id}: {e}")
+            logger.exception(f"Failed to get generation status {generation_id}: {e}")
             raise GenerationServiceError(f"Failed to get status: {str(e)}")
     
     async def get_generation_result(
@@ -198,47 +285,33 @@ class GenerationService:
             Final generation result with image URLs
         """
         try:
-            # Get generation data
-            generation_data = await self._get_cached_generation_data(generation_id)
+            # Concurrent requests for the same generation share one fetch
+            result_entry = await self._coalesce(
+                self._inflight_results, generation_id,
+                lambda: self._fetch_generation_result(generation_id)
+            )
             
-            if not generation_data:
+            if not result_entry:
                 raise GenerationServiceError(f"Generation not found: {generation_id}")
             
             # Validate ownership
-            if user_id and generation_data.get("user_id") != user_id:
+            if user_id and result_entry.get("user_id") != user_id:
                 raise GenerationServiceError("Access denied")
             
-            # Check if generation is completed
-            if generation_data.get("status") != GenerationStatus.COMPLETED:
-                raise GenerationServiceError(f"Generation not completed. Status: {generation_data.get('status')}")
-            
-            # Get result data
-            result_data = generation_data.get("result", {})
-            
-            if not result_data.get("image_url"):
+            if result_entry["result"] is None:
+                status = result_entry.get("status")
+                # Check if generation is completed
+                if status != GenerationStatus.COMPLETED:
+                    raise GenerationServiceError(f"Generation not completed. Status: {status}")
                 raise GenerationServiceError("No image result available")
             
             # Track result access
             await self._track_generation_event(generation_id, "result_accessed", user_id)
             
-            # Prepare enhanced result
-            enhanced_result = {
-                "generation_id": generation_id,
-                "status": generation_data["status"],
-                "image_url": result_data["image_url"],
-                "generation_metadata": result_data.get("generation_metadata", {}),
-                "template_used": generation_data.get("template_used"),
-                "style_analysis": generation_data.get("style_analysis"),
-                "credits_used": generation_data.get("credits_cost", 0),
-                "generation_time": result_data.get("generation_time", 0),
-                "quality_score": result_data.get("generation_metadata", {}).get("quality_score", 0.8),
-                "completed_at": generation_data.get("completed_at")
-            }
-            
-            return enhanced_result
+            return result_entry["result"]
             
         except Exception as e:
-            logger.info(f"Failed to get generation result {generation_id}: {e}")
+            logger.exception(f"Failed to get generation result {generation_id}: {e}")
             raise GenerationServiceError(f"Failed to get result: {str(e)}")
     
     async def upscale_generation(
@@ -288,14 +361,15 @@ class GenerationService:
             
             # Create upscale request
             upscale_id = self._generate_id()
+            now_iso = datetime.now(timezone.utc).isoformat()
             upscale_request = {
                 "id": upscale_id,
                 "original_generation_id": generation_id,
                 "user_id": user_id,
                 "upscale_index": upscale_index,
-                "status": GenerationStatus.PENDING,
+                "status": GenerationStatus.PENDING.value,
                 "progress": 0,
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "created_at": now_iso,
                 "credits_cost": self.upscale_cost,
                 "original_task_id": original_task_id,
                 "service": service_used
@@ -303,12 +377,13 @@ class GenerationService:
             
             # Start upscale process
             try:
-                upscale_result = await midjourney_service.upscale_image(
-                    original_task_id, upscale_index, service_used
-                )
+                async with self._upscale_semaphore:
+                    upscale_result = await midjourney_service.upscale_image(
+                        original_task_id, upscale_index, service_used
+                    )
                 
                 upscale_request.update({
-                    "status": GenerationStatus.COMPLETED,
+                    "status": GenerationStatus.COMPLETED.value,
                     "progress": 100,
                     "completed_at": datetime.now(timezone.utc).isoformat(),
                     "result": upscale_result
@@ -322,7 +397,7 @@ class GenerationService:
                 
             except MidjourneyServiceError as e:
                 upscale_request.update({
-                    "status": GenerationStatus.FAILED,
+                    "status": GenerationStatus.FAILED.value,
                     "error": str(e),
                     "failed_at": datetime.now(timezone.utc).isoformat()
                 })
@@ -339,7 +414,7 @@ class GenerationService:
             }
             
         except Exception as e:
-            logger.info(f"Upscale failed for generation {generation_id}: {e}")
+            logger.exception(f"Upscale failed for generation {generation_id}: {e}")
             raise GenerationServiceError(f"Upscale failed: {str(e)}")
     
     async def get_generation_history(
@@ -362,21 +437,25 @@ class GenerationService:
             User's generation history
         """
         try:
-            # Get user's generations (mock implementation)
-            generations = await self._get_user_generations(user_id, limit, offset, status_filter)
+            # Get user's generations from the history index
+            generations, total_count = await self._get_user_generations(user_id, limit, offset, status_filter)
             
-            # Calculate summary statistics
+            # Calculate summary statistics in a single pass
             total_generations = len(generations)
-            completed_generations = len([g for g in generations if g.get("status") == GenerationStatus.COMPLETED])
-            total_credits_used = sum(g.get("credits_cost", 0) for g in generations)
+            completed_generations = 0
+            total_credits_used = 0
+            for generation in generations:
+                total_credits_used += generation.get("credits_cost", 0)
+                if generation.get("status") == GenerationStatus.COMPLETED:
+                    completed_generations += 1
             
             history_data = {
                 "generations": generations,
                 "pagination": {
-                    "total": total_generations,
+                    "total": total_count,
                     "limit": limit,
                     "offset": offset,
-                    "has_more": total_generations == limit  # Simple check
+                    "has_more": offset + limit < total_count
                 },
                 "summary": {
                     "total_generations": total_generations,
@@ -389,7 +468,7 @@ class GenerationService:
             return history_data
             
         except Exception as e:
-            logger.info(f"Failed to get generation history for user {user_id}: {e}")
+            logger.exception(f"Failed to get generation history for user {user_id}: {e}")
             raise GenerationServiceError(f"Failed to get history: {str(e)}")
     
     async def cancel_generation(
@@ -420,7 +499,7 @@ class GenerationService:
             
             # Check if cancellable
             current_status = generation_data.get("status")
-            if current_status in [GenerationStatus.COMPLETED, GenerationStatus.FAILED, GenerationStatus.CANCELLED]:
+            if current_status in _TERMINAL_STATUSES:
                 raise GenerationServiceError(f"Cannot cancel generation with status: {current_status}")
             
             # Cancel Celery task if running
@@ -428,19 +507,21 @@ class GenerationService:
             if pipeline_task_id:
                 try:
                     from app.workers.celery_app import celery_app
-                    celery_app.control.revoke(pipeline_task_id, terminate=True)
+                    await asyncio.to_thread(celery_app.control.revoke, pipeline_task_id, terminate=True)
                 except Exception as e:
-                    logger.info(f"Failed to cancel Celery task {pipeline_task_id}: {e}")
+                    logger.warning(f"Failed to cancel Celery task {pipeline_task_id}: {e}")
             
             # Update generation status
-            generation_data.update({
-                "status": GenerationStatus.CANCELLED,
-                "cancelled_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            })
+            now_iso = datetime.now(timezone.utc).isoformat()
+            cancellation = {
+                "status": GenerationStatus.CANCELLED.value,
+                "cancelled_at": now_iso,
+                "updated_at": now_iso
+            }
+            generation_data.update(cancellation)
             
-            # Update cache
-            await self._cache_generation_data(generation_id, generation_data)
+            # Rewrite only the changed fields and refresh the history index
+            await self._save_generation(generation_id, generation_data, changed=cancellation)
             
             # Track cancellation
             await self._track_generation_event(generation_id, "cancelled", user_id)
@@ -452,14 +533,143 @@ class GenerationService:
             }
             
         except Exception as e:
-            logger.info(f"Failed to cancel generation {generation_id}: {e}")
+            logger.exception(f"Failed to cancel generation {generation_id}: {e}")
             raise GenerationServiceError(f"Cancellation failed: {str(e)}")
     
+    async def remove_from_history(self, user_id: str, generation_id: str) -> None:
+        """Remove a generation's record, result cache and user history index entries"""
+        pipeline = (
+            redis_service.pipeline()
+            .delete(
+                self._generation_key(generation_id),
+                self._legacy_generation_key(generation_id),
+                self._result_cache_key(generation_id)
+            )
+            .zrem(self._user_generations_key(user_id), generation_id)
+        )
+        for status in GenerationStatus:
+            pipeline.zrem(self._user_generations_key(user_id, status.value), generation_id)
+        await pipeline.execute()
+    
+    def start_analytics_flusher(self) -> None:
+        """Start batching analytics events on the running event loop"""
+        if self._analytics_flusher is not None and not self._analytics_flusher.done():
+            return
+        self._analytics_queue = asyncio.Queue(maxsize=self.analytics_queue_size)
+        self._analytics_flusher = asyncio.create_task(self._run_analytics_flusher())
+    
+    async def stop_analytics_flusher(self) -> None:
+        """Stop the analytics flusher and write any queued events"""
+        if self._analytics_flusher is None:
+            return
+        self._analytics_flusher.cancel()
+        try:
+            await self._analytics_flusher
+        except asyncio.CancelledError:
+            pass
+        self._analytics_flusher = None
+        
+        pending = []
+        while not self._analytics_queue.empty():
+            pending.append(self._analytics_queue.get_nowait())
+        if pending:
+            await self._flush_analytics_events(pending)
+    
     # Private helper methods
     
+    async def _coalesce(
+        self,
+        inflight: Dict[str, asyncio.Future],
+        key: str,
+        fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """Run fetch once for concurrent callers with the same key"""
+        future = inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        inflight[key] = future
+        try:
+            result = await fetch()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved in case nobody else is waiting
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del inflight[key]
+    
+    async def _fetch_generation_status(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """Load generation data merged with real-time task progress"""
+        # Get generation data and real-time task progress concurrently
+        generation_data, task_progress = await asyncio.gather(
+            self._get_cached_generation_data(generation_id),
+            self._get_task_progress_by_generation(generation_id)
+        )
+        if not generation_data:
+            return None
+        
+        # Records without a task ID key fall back to a sequential lookup
+        pipeline_task_id = generation_data.get("pipeline_task_id")
+        if task_progress is None and pipeline_task_id:
+            task_progress = await self._get_task_progress(pipeline_task_id)
+        if task_progress:
+            generation_data.update(task_progress)
+        
+        return generation_data
+    
+    async def _fetch_generation_result(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Load the assembled result of a generation
+        
+        Returns:
+            None if the generation does not exist, otherwise its owner and
+            result; result is None until the generation completes with an image
+        """
+        # Completed results never change, so serve the assembled copy when present
+        cached_result = await redis_service.get(self._result_cache_key(generation_id))
+        if cached_result:
+            return cached_result
+        
+        # Get generation data
+        generation_data = await self._get_cached_generation_data(generation_id)
+        if not generation_data:
+            return None
+        
+        status = generation_data.get("status")
+        result_data = generation_data.get("result") or {}
+        if status != GenerationStatus.COMPLETED or not result_data.get("image_url"):
+            return {"user_id": generation_data.get("user_id"), "status": status, "result": None}
+        
+        # Prepare enhanced result
+        enhanced_result = {
+            "generation_id": generation_id,
+            "status": generation_data["status"],
+            "image_url": result_data["image_url"],
+            "generation_metadata": result_data.get("generation_metadata", {}),
+            "template_used": generation_data.get("template_used"),
+            "style_analysis": generation_data.get("style_analysis"),
+            "credits_used": generation_data.get("credits_cost", 0),
+            "generation_time": result_data.get("generation_time", 0),
+            "quality_score": result_data.get("generation_metadata", {}).get("quality_score", 0.8),
+            "completed_at": generation_data.get("completed_at")
+        }
+        
+        result_entry = {"user_id": generation_data.get("user_id"), "result": enhanced_result}
+        await redis_service.set(self._result_cache_key(generation_id), result_entry, self.result_cache_ttl)
+        
+        return result_entry
+    
     def _generate_id(self) -> str:
         """Generate unique ID for generations"""
-        return f"gen_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}_{str(uuid.uuid4())[:8]}"
+        return f"gen_{uuid.uuid4().hex[:16]}"
     
     async def _validate_user_credits(self, user_id: str, priority: str, cost: Optional[int] = None) -> None:
         """Validate user has sufficient credits"""
@@ -473,15 +683,13 @@ class GenerationService:
     
     def _calculate_credits_cost(self, priority: str) -> int:
         """Calculate credits cost based on priority"""
-        if priority == "high":
-            return self.premium_generation_cost
-        return self.generation_cost
+        return self._priority_cost.get(priority, self.generation_cost)
     
     async def _start_generation_pipeline(self, generation_request: Dict[str, Any]) -> str:
         """Start the generation pipeline as background task"""
         try:
-            # Queue generation task
-            task = generate_thumbnail_with_midjourney.delay(generation_request)
+            # Queue generation task; publishing to the broker is blocking I/O
+            task = await asyncio.to_thread(generate_thumbnail_with_midjourney.delay, generation_request)
             
             logger.info(f"Generation pipeline started: {task.id}")
             return task.id
@@ -489,58 +697,272 @@ class GenerationService:
         except Exception as e:
             raise GenerationServiceError(f"Failed to start pipeline: {str(e)}")
     
+    @staticmethod
+    def _to_cacheable(data: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace top-level enum members with their plain values before caching"""
+        return {
+            key: value.value if isinstance(value, Enum) else value
+            for key, value in data.items()
+        }
+    
+    def _generation_key(self, generation_id: str) -> str:
+        """Hash holding a generation's top-level fields"""
+        return f"gen:record:{generation_id}"
+    
+    def _legacy_generation_key(self, generation_id: str) -> str:
+        """JSON string generations were cached under before they moved to hashes"""
+        return f"generation:{generation_id}"
+    
+    def _write_generation(self, pipeline: RedisPipeline, generation_id: str, data: Dict[str, Any]) -> None:
+        """Queue a full rewrite of a generation hash"""
+        cache_key = self._generation_key(generation_id)
+        pipeline.delete(cache_key).hset(cache_key, self._to_cacheable(data)).expire(cache_key, self.cache_ttl)
+    
     async def _cache_generation_data(self, generation_id: str, data: Dict[str, Any]) -> None:
         """Cache generation data"""
-        cache_key = f"generation:{generation_id}"
-        await redis_service.set(cache_key, data, self.cache_ttl)
+        pipeline = redis_service.pipeline(transaction=True)
+        self._write_generation(pipeline, generation_id, data)
+        await pipeline.execute()
     
     async def _get_cached_generation_data(self, generation_id: str) -> Optional[Dict[str, Any]]:
         """Get cached generation data"""
-        cache_key = f"generation:{generation_id}"
-        return await redis_service.get(cache_key)
+        data = await redis_service.hgetall(self._generation_key(generation_id))
+        if data.get("id"):
+            return data
+        # A patch landing after expiry, or before a legacy record moved, leaves a stub
+        return await self._migrate_legacy_generation(generation_id, data)
     
-    async def _track_generation_event(self, generation_id: str, event: str, user_id: str) -> None:
-        """Track generation analytics event"""
-        event_data = {
+    async def _migrate_legacy_generation(
+        self,
+        generation_id: str,
+        patched: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Move a generation cached as a JSON string into its hash
+        
+        Records written before the hash layout live under the legacy key until
+        they expire, so this fallback can go once cache_ttl has passed since
+        the rollout.
+        
+        Args:
+            generation_id: Generation ID
+            patched: Fields already written to the hash, newer than the legacy copy
+            
+        Returns:
+            The merged record, or None if there is no legacy record
+        """
+        legacy_key = self._legacy_generation_key(generation_id)
+        data = await redis_service.get(legacy_key)
+        if not isinstance(data, dict) or not data.get("id"):
+            return None
+        data.update(patched)
+        
+        cache_key = self._generation_key(generation_id)
+        await (
+            redis_service.pipeline(transaction=True)
+            .hset(cache_key, self._to_cacheable(data))
+            .expire(cache_key, self.cache_ttl)
+            .delete(legacy_key)
+            .execute()
+        )
+        return data
+    
+    async def _patch_generation_fields(self, generation_id: str, **fields: Any) -> None:
+        """Overwrite only the given top-level fields of a cached generation"""
+        cache_key = self._generation_key(generation_id)
+        await (
+            redis_service.pipeline(transaction=True)
+            .hset(cache_key, self._to_cacheable(fields))
+            .expire(cache_key, self.cache_ttl)
+            .execute()
+        )
+    
+    async def _record_pipeline_task(self, generation_id: str, pipeline_task_id: str) -> None:
+        """Store a generation's pipeline task ID without touching its other fields"""
+        cache_key = self._generation_key(generation_id)
+        await (
+            redis_service.pipeline(transaction=True)
+            .hset(cache_key, {"pipeline_task_id": pipeline_task_id})
+            .expire(cache_key, self.cache_ttl)
+            # Lets status polls look up task progress without reading the generation first
+            .set(f"gen:taskid:{generation_id}", pipeline_task_id, self.cache_ttl)
+            .execute()
+        )
+    
+    async def _save_generation(
+        self,
+        generation_id: str,
+        data: Dict[str, Any],
+        changed: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Cache generation data and refresh its user history index
+        
+        Args:
+            generation_id: Generation ID
+            data: Full generation data, used for the history index
+            changed: Fields updated since the last save; only these are written when given
+        """
+        pipeline = redis_service.pipeline(transaction=True)
+        if changed:
+            cache_key = self._generation_key(generation_id)
+            pipeline.hset(cache_key, self._to_cacheable(changed)).expire(cache_key, self.cache_ttl)
+        else:
+            self._write_generation(pipeline, generation_id, data)
+        self._index_generation(pipeline, generation_id, data)
+        await pipeline.execute()
+    
+    def _result_cache_key(self, generation_id: str) -> str:
+        """Cache key for an assembled generation result"""
+        return f"gen:result:{generation_id}"
+    
+    def _user_generations_key(self, user_id: str, status: Optional[str] = None) -> str:
+        """Sorted set of a user's generation IDs, optionally for one status"""
+        if status:
+            return f"user:{user_id}:generations:status:{status}"
+        return f"user:{user_id}:generations"
+    
+    def _index_generation(self, pipeline: RedisPipeline, generation_id: str, data: Dict[str, Any]) -> None:
+        """Queue index updates keeping the generation under its current status only"""
+        user_id = data["user_id"]
+        status = data["status"].value if isinstance(data["status"], Enum) else data["status"]
+        score = data.get("created_at_ts") or datetime.fromisoformat(data["created_at"]).timestamp()
+        # Cached generations expire after cache_ttl; drop index entries that outlived them
+        expired_before = datetime.now(timezone.utc).timestamp() - self.cache_ttl
+        
+        all_key = self._user_generations_key(user_id)
+        pipeline.zadd(all_key, {generation_id: score}).zremrangebyscore(all_key, 0, expired_before)
+        for other_status in GenerationStatus:
+            if other_status.value != status:
+                pipeline.zrem(self._user_generations_key(user_id, other_status.value), generation_id)
+        status_key = self._user_generations_key(user_id, status)
+        pipeline.zadd(status_key, {generation_id: score}).zremrangebyscore(status_key, 0, expired_before)
+    
+    def _build_event(self, generation_id: str, event: str, user_id: str) -> Dict[str, Any]:
+        """Build an analytics event payload"""
+        return {
             "generation_id": generation_id,
             "event": event,
             "user_id": user_id,
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
+    
+    async def _track_generation_event(self, generation_id: str, event: str, user_id: str) -> None:
+        """Track generation analytics event"""
+        event_data = self._build_event(generation_id, event, user_id)
+        
+        if self._analytics_flusher is not None and not self._analytics_flusher.done():
+            try:
+                self._analytics_queue.put_nowait((generation_id, event_data))
+                return
+            except asyncio.QueueFull:
+                pass
+        await self._flush_analytics_events([(generation_id, event_data)])
+    
+    async def _run_analytics_flusher(self) -> None:
+        """Drain queued analytics events in batches of up to analytics_batch_size"""
+        loop = asyncio.get_running_loop()
+        batch: List[Tuple[str, Dict[str, Any]]] = []
+        try:
+            while True:
+                batch.append(await self._analytics_queue.get())
+                deadline = loop.time() + self.analytics_flush_interval
+                while len(batch) < self.analytics_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._analytics_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                try:
+                    await self._flush_analytics_events(batch)
+                except Exception as e:
+                    logger.exception(f"Failed to flush {len(batch)} analytics events: {e}")
+                batch = []
+        except asyncio.CancelledError:
+            if batch:
+                await self._flush_analytics_events(batch)
+            raise
+    
+    async def _flush_analytics_events(self, events: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Write analytics events grouped by generation in one pipeline"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for generation_id, event_data in events:
+            grouped.setdefault(generation_id, []).append(event_data)
         
-        analytics_key = f"analytics:generation:{generation_id}"
-        await redis_service.lpush(analytics_key, event_data)
-        await redis_service.expire(analytics_key, 86400 * 30)  # 30 days
+        pipeline = redis_service.pipeline()
+        for generation_id, event_list in grouped.items():
+            analytics_key = f"analytics:generation:{generation_id}"
+            pipeline.lpush(analytics_key, *event_list).expire(analytics_key, self.analytics_ttl)
+        await pipeline.execute()
+    
+    async def _get_task_progress_by_generation(self, generation_id: str) -> Optional[Dict[str, Any]]:
+        """Get Celery task progress using the task ID stored for a generation"""
+        task_id = await redis_service.get(f"gen:taskid:{generation_id}")
+        if not task_id:
+            return None
+        return await self._get_task_progress(task_id)
     
     async def _get_task_progress(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """Get Celery task progress"""
+        """Get Celery task progress, shared across pollers for a short TTL"""
         try:
-            from app.workers.celery_app import celery_app
+            cache_key = f"taskprog:{task_id}"
+            cached_progress = await redis_service.get(cache_key)
+            if cached_progress:
+                return cached_progress
             
-            result = celery_app.AsyncResult(task_id)
+            # Result backend reads are blocking; keep them off the event loop
+            progress = await asyncio.to_thread(self._read_task_progress, self._task_result(task_id))
+            if progress["status"] in _TERMINAL_STATUSES:
+                self._task_results.pop(task_id)
             
-            if result.state == 'PENDING':
-                return {"status": GenerationStatus.PENDING, "progress": 0}
-            elif result.state == 'PROGRESS':
-                return {
-                    "status": result.info.get('status', GenerationStatus.GENERATING),
-                    "progress": result.info.get('progress', 0),
-                    "message": result.info.get('message', 'Processing...')
-                }
-            elif result.state == 'SUCCESS':
-                return {"status": GenerationStatus.COMPLETED, "progress": 100, "result": result.result}
-            else:  # FAILURE
-                return {"status": GenerationStatus.FAILED, "error": str(result.info)}
+            # Jitter the TTL so pollers of many generations do not expire in lockstep
+            ttl = self.task_progress_ttl + random.randint(0, 1)
+            await redis_service.set(cache_key, progress, ttl)
+            
+            return progress
                 
         except Exception as e:
-            logger.info(f"Failed to get task progress for {task_id}: {e}")
+            logger.exception(f"Failed to get task progress for {task_id}: {e}")
             return None
     
+    def _task_result(self, task_id: str) -> Any:
+        """Get the pooled Celery AsyncResult for a task, creating it on first use"""
+        result = self._task_results.get(task_id)
+        if result is None:
+            from app.workers.celery_app import celery_app
+            result = celery_app.AsyncResult(task_id)
+            self._task_results.set(task_id, result)
+        return result
+    
+    def _read_task_progress(self, result: Any) -> Dict[str, Any]:
+        """Read task progress from the Celery result backend (blocking)"""
+        state = result.state
+        
+        if state == 'PENDING':
+            return {"status": GenerationStatus.PENDING.value, "progress": 0}
+        elif state == 'PROGRESS':
+            info = result.info
+            return {
+                "status": info.get('status', GenerationStatus.GENERATING.value),
+                "progress": info.get('progress', 0),
+                "message": info.get('message', 'Processing...')
+            }
+        elif state == 'SUCCESS':
+            return {"status": GenerationStatus.COMPLETED.value, "progress": 100, "result": result.result}
+        else:  # FAILURE
+            return {"status": GenerationStatus.FAILED.value, "error": str(result.info)}
+    
     def _calculate_time_estimates(self, generation_data: Dict[str, Any]) -> Dict[str, Any]:
         """Calculate time estimates for generation"""
-        created_at = datetime.fromisoformat(generation_data["created_at"])
-        now = datetime.now(timezone.utc)
-        elapsed = (now - created_at).total_seconds()
+        now_ts = time.time()
+        created_at_ts = generation_data.get("created_at_ts")
+        if created_at_ts is None:
+            # Records cached before created_at_ts was stored
+            created_at_ts = datetime.fromisoformat(generation_data["created_at"]).timestamp()
+        elapsed = now_ts - created_at_ts
         
         # Estimate based on current progress
         progress = generation_data.get("progress", 0)
@@ -553,7 +975,7 @@ class GenerationService:
         return {
             "elapsed_seconds": int(elapsed),
             "estimated_remaining_seconds": int(remaining),
-            "estimated_completion": (now + timedelta(seconds=remaining)).isoformat()
+            "estimated_completion": datetime.fromtimestamp(now_ts + remaining, timezone.utc).isoformat()
         }
     
     async def _get_user_credits(self, user_id: str) -> int:
@@ -572,28 +994,37 @@ class GenerationService:
         limit: int,
         offset: int,
         status_filter: Optional[str]
-    ) -> List[Dict[str, Any]]:
-        """Get user's generations (mock implementation)"""
-        # Mock implementation - replace with actual database query
-        mock_generations = []
-        
-        for i in range(limit):
-            generation_id = f"gen_mock_{i + offset}"
-            mock_generations.append({
-                "id": generation_id,
-                "user_id": user_id,
-                "prompt": f"Mock generation prompt {i + offset}",
-                "status": GenerationStatus.COMPLETED if i % 3 == 0 else GenerationStatus.PENDING,
-                "created_at": (datetime.now(timezone.utc) - timedelta(hours=i)).isoformat(),
-                "credits_cost": self.generation_cost,
-                "progress": 100 if i % 3 == 0 else 50
-            })
-        
-        # Apply status filter
-        if status_filter:
-            mock_generations = [g for g in mock_generations if g["status"] == status_filter]
-        
-        return mock_generations
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """Get a page of the user's generations, newest first, and the total count"""
+        index_key = self._user_generations_key(user_id, status_filter)
+        
+        page = await (
+            redis_service.pipeline()
+            .zrevrange(index_key, offset, offset + limit - 1)
+            .zcard(index_key)
+            .execute()
+        )
+        if not page:
+            return [], 0
+        generation_ids, total_count = page
+        
+        # Fetch the whole page in one round trip; expired entries come back empty
+        pipeline = redis_service.pipeline()
+        for generation_id in generation_ids:
+            pipeline.hgetall(self._generation_key(generation_id))
+        cached = await pipeline.execute() if generation_ids else []
+        
+        # Generations from before the hash layout are moved over as they are read
+        legacy = [index for index, data in enumerate(cached) if not data.get("id")]
+        if legacy:
+            migrated = await asyncio.gather(*(
+                self._migrate_legacy_generation(generation_ids[index], cached[index]) for index in legacy
+            ))
+            for index, data in zip(legacy, migrated):
+                cached[index] = data or {}
+        generations = [data for data in cached if data.get("id")]
+        
+        return generations, total_count
 
 # Global generation service instance
 generation_service = GenerationService()
\ No newline at end of file
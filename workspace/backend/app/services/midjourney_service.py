@@ -3,22 +3,140 @@ Midjourney Service for Routix Platform
 Handles thumbnail generation via GoAPI.ai proxy service
 """
 import asyncio
+import bisect
+import hashlib
+import hmac
 import json
 import time
-from typing import Dict, List, Optional, Any, Union
+import uuid
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
 from datetime import datetime, timedelta, timezone
 import httpx
 from app.core.config import settings
-from app.services.redis_service import redis_service
+from app.services.redis_service import redis_service, loads
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
 
 import logging
 logger = logging.getLogger(__name__)
 
 
+# Energy level thresholds and the descriptions for the bands between them
+_ENERGY_THRESHOLDS = (4, 6, 8)
+_ENERGY_LABELS = ("calm, peaceful", "balanced energy", "energetic, vibrant", "high energy, dynamic")
+
+
+@lru_cache(maxsize=64)
+def _mj_params_suffix(aspect_ratio: str, model: str, stylize: int) -> str:
+    """Midjourney parameter tail for a prompt"""
+    mj_params = []
+    
+    # Aspect ratio
+    if aspect_ratio and aspect_ratio != "1:1":
+        mj_params.append(f"--ar {aspect_ratio}")
+    
+    # Model version
+    if model and model != "v6":
+        mj_params.append(f"--{model}")
+    
+    # Stylize parameter
+    mj_params.append(f"--stylize {stylize}")
+    
+    # Quality and style
+    mj_params.append("--style raw")
+    
+    return " ".join(mj_params)
+
+
+def _analysis_fingerprint(template_analysis: Dict[str, Any]) -> bytes:
+    """Canonical serialization of a template analysis, usable as a cache key"""
+    if orjson is not None:
+        return orjson.dumps(template_analysis, default=str, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(template_analysis, default=str, sort_keys=True).encode()
+
+
+@lru_cache(maxsize=2048)
+def _style_fragment(analysis_fingerprint: bytes) -> str:
+    """Prompt fragment describing a template's style, color and composition"""
+    template_analysis = loads(analysis_fingerprint)
+    style_parts = []
+    
+    # Extract style characteristics
+    style_chars = template_analysis.get("style_characteristics", {})
+    if style_chars:
+        design_style = style_chars.get("design_style")
+        mood = style_chars.get("mood")
+        energy_level = style_chars.get("energy_level", 5)
+        
+        if design_style:
+            style_parts.append(f"{design_style} style")
+        if mood:
+            style_parts.append(f"{mood} mood")
+        
+        # Convert energy level to descriptive terms
+        style_parts.append(_ENERGY_LABELS[bisect.bisect_right(_ENERGY_THRESHOLDS, energy_level)])
+    
+    # Extract color information
+    color_analysis = template_analysis.get("color_analysis", {})
+    if color_analysis:
+        color_temp = color_analysis.get("color_temperature")
+        contrast = color_analysis.get("contrast_level")
+        
+        if color_temp:
+            style_parts.append(f"{color_temp} colors")
+        if contrast:
+            style_parts.append(f"{contrast} contrast")
+    
+    # Extract composition info
+    composition = template_analysis.get("composition", {})
+    if composition:
+        layout = composition.get("layout_type")
+        if layout:
+            style_parts.append(f"{layout} composition")
+    
+    return ", ".join(style_parts)
+
+
 class MidjourneyServiceError(Exception):
     """Custom exception for Midjourney service errors"""
     pass
 
+class _CircuitBreaker:
+    """Skips a failing provider for a cooldown after consecutive failures"""
+    
+    def __init__(self, failure_threshold: int, cooldown: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._open_until = 0.0
+    
+    @property
+    def is_open(self) -> bool:
+        return self._failures >= self.failure_threshold and time.monotonic() < self._open_until
+    
+    def allow(self) -> bool:
+        """Whether a request may go to the provider"""
+        if self._failures < self.failure_threshold:
+            return True
+        now = time.monotonic()
+        if now < self._open_until:
+            return False
+        # Half-open: let one trial through and hold others for another cooldown
+        self._open_until = now + self.cooldown
+        return True
+    
+    def record_success(self) -> None:
+        self._failures = 0
+    
+    def record_failure(self) -> None:
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._open_until = time.monotonic() + self.cooldown
+
 class MidjourneyService:
     """Midjourney thumbnail generation service via GoAPI.ai"""
     
@@ -34,17 +152,84 @@ class MidjourneyService:
         # Service configuration
         self.max_retries = 3
         self.poll_interval = 10  # seconds
+        self.min_poll_interval = 2  # seconds, when polling by reported progress
         self.max_poll_time = 600  # 10 minutes
         self.timeout = 30  # HTTP timeout
+        self.result_cache_ttl = 86400  # 24 hours for results of identical requests
+        self.max_parallel_upscales = 4  # Concurrent actions per upscale_all call
+        
+        # Circuit breakers: skip a provider for 60s after 5 consecutive failures
+        self._goapi_breaker = _CircuitBreaker(failure_threshold=5, cooldown=60)
+        self._useapi_breaker = _CircuitBreaker(failure_threshold=5, cooldown=60)
+        
+        # Submitted jobs are recorded so they can be resumed after a restart; the
+        # process waiting on a job refreshes its heartbeat until it finishes
+        self.pending_jobs_key = "mj:pending"
+        self.heartbeat_interval = 30  # seconds
+        self.heartbeat_timeout = 90  # seconds without a heartbeat before a job is resumed
+        
+        # In-flight jobs keyed by result cache key so identical requests share one job
+        self._inflight: Dict[str, asyncio.Future] = {}
+        
+        # Webhook completion; falls back to polling when no public URL is configured
+        self.webhook_base_url = settings.PUBLIC_WEBHOOK_URL
+        self.webhook_wait_slice = 4  # seconds per blocking wait, below the Redis socket timeout
+        
+        # Shared HTTP/2 client, created lazily for the running event loop
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
         
         # Midjourney parameters
         self.default_aspect_ratio = "16:9"
         self.default_model = "v6"
         self.default_stylize = 750
         
+        # Request headers, built once per API key
+        self._goapi_headers = self._auth_headers(self.goapi_api_key)
+        self._useapi_headers = self._auth_headers(self.useapi_api_key)
+        
         if not self.goapi_api_key and not self.useapi_api_key:
             logger.warning("Neither GOAPI_API_KEY nor USEAPI_API_KEY configured")
     
+    @staticmethod
+    def _auth_headers(api_key: Optional[str]) -> Optional[Dict[str, str]]:
+        """Authorization headers for a provider API key"""
+        if not api_key:
+            return None
+        return {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    def _http(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._client_loop is not loop:
+            if self._http_client is not None:
+                logger.warning("Midjourney HTTP client from a finished event loop was never closed")
+            self._http_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=32, max_connections=64),
+                headers={"User-Agent": "routix/1.0"}
+            )
+            self._client_loop = loop
+        return self._http_client
+    
+    async def _submit(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST a job submission and decode the raw response body"""
+        async with self._http().stream("POST", url, headers=headers, json=payload) as response:
+            response.raise_for_status()
+            body = await response.aread()
+        return loads(body)
+    
+    async def close(self) -> None:
+        """Release pooled HTTP connections"""
+        client, self._http_client = self._http_client, None
+        self._client_loop = None
+        if client is not None:
+            await client.aclose()
+    
     async def generate_thumbnail(
         self,
         prompt: str,
@@ -78,27 +263,116 @@ class MidjourneyService:
                 prompt, template_analysis, custom_text, aspect_ratio, model
             )
             
+            # Identical requests reuse an earlier result instead of paying for a new job
+            cache_key = self._result_cache_key(enhanced_prompt, user_face_url, user_logo_url)
+            cached_result = await redis_service.get(cache_key)
+            if cached_result:
+                logger.info("Serving cached Midjourney result")
+                return cached_result
+            
+            # Concurrent identical requests in this process share one job
+            inflight = self._inflight.get(cache_key)
+            if inflight is not None:
+                return await asyncio.shield(inflight)
+            
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[cache_key] = future
+            try:
+                enhanced_result = await self._generate_once(
+                    cache_key, enhanced_prompt, template_analysis, user_face_url, user_logo_url
+                )
+            except BaseException as e:
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(e)
+                    # Mark the exception as retrieved in case nobody else is waiting
+                    future.exception()
+                raise
+            else:
+                future.set_result(enhanced_result)
+            finally:
+                del self._inflight[cache_key]
+            
+            logger.info(f"Midjourney generation completed successfully")
+            return enhanced_result
+            
+        except Exception as e:
+            logger.info(f"Midjourney generation failed: {e}")
+            raise MidjourneyServiceError(f"Generation failed: {str(e)}")
+    
+    async def generate_thumbnails_batch(
+        self,
+        requests: List[Dict[str, Any]],
+        concurrency: int = 4
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """
+        Generate several thumbnails concurrently
+        
+        Args:
+            requests: Keyword arguments for generate_thumbnail, one dict per thumbnail
+            concurrency: Maximum generations in flight at once
+            
+        Returns:
+            Results in request order; failed generations are returned as exceptions
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def generate_one(request: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                # Identical requests share one job through the in-flight map
+                return await self.generate_thumbnail(**request)
+        
+        return await asyncio.gather(
+            *(generate_one(request) for request in requests),
+            return_exceptions=True
+        )
+    
+    async def _generate_once(
+        self,
+        cache_key: str,
+        enhanced_prompt: str,
+        template_analysis: Optional[Dict[str, Any]],
+        user_face_url: Optional[str],
+        user_logo_url: Optional[str]
+    ) -> Dict[str, Any]:
+        """Run one provider job, first waiting out an identical job in another process"""
+        lock_key = f"{cache_key}:lock"
+        owns_lock = await redis_service.set_nx(lock_key, 1, self.max_poll_time)
+        if not owns_lock:
+            cached_result = await self._wait_for_cached_result(cache_key, lock_key)
+            if cached_result:
+                return cached_result
+            # The other job failed or expired; run our own
+            owns_lock = await redis_service.set_nx(lock_key, 1, self.max_poll_time)
+        
+        try:
             # Try GoAPI.ai first, fallback to UseAPI.net
             generation_result = None
             
-            if self.goapi_api_key:
+            # Providers with an open circuit are skipped until their cooldown ends
+            if self.goapi_api_key and self._goapi_breaker.allow():
                 try:
                     logger.info("Attempting generation with GoAPI.ai...")
                     generation_result = await self._generate_with_goapi(
-                        enhanced_prompt, user_face_url, user_logo_url
+                        enhanced_prompt, user_face_url, user_logo_url, cache_key
                     )
+                    self._goapi_breaker.record_success()
                 except Exception as e:
                     logger.info(f"GoAPI.ai generation failed: {e}")
+                    self._goapi_breaker.record_failure()
                     generation_result = None
             
-            if not generation_result and self.useapi_api_key:
+            if not generation_result and self.useapi_api_key and self._useapi_breaker.allow():
                 try:
                     logger.info("Falling back to UseAPI.net...")
                     generation_result = await self._generate_with_useapi(
-                        enhanced_prompt, user_face_url, user_logo_url
+                        enhanced_prompt, user_face_url, user_logo_url, cache_key
                     )
+                    self._useapi_breaker.record_success()
                 except Exception as e:
                     logger.info(f"UseAPI.net generation failed: {e}")
+                    self._useapi_breaker.record_failure()
                     raise MidjourneyServiceError(f"Both Midjourney services failed. Last error: {e}")
             
             if not generation_result:
@@ -109,56 +383,81 @@ class MidjourneyService:
                 generation_result, enhanced_prompt, template_analysis
             )
             
-            logger.info(f"Midjourney generation completed successfully")
+            # Only the small result dict is cached; images stay in provider storage
+            await redis_service.set(cache_key, enhanced_result, self.result_cache_ttl)
+            
             return enhanced_result
             
-        except Exception as e:
-            logger.info(f"Midjourney generation failed: {e}")
-            raise MidjourneyServiceError(f"Generation failed: {str(e)}")
+        finally:
+            if owns_lock:
+                await redis_service.delete(lock_key)
+    
+    async def _wait_for_cached_result(self, cache_key: str, lock_key: str) -> Optional[Dict[str, Any]]:
+        """Wait while another process holds the job lock, then return its cached result"""
+        start_time = time.monotonic()
+        while time.monotonic() - start_time < self.max_poll_time:
+            await asyncio.sleep(self.min_poll_interval)
+            cached_result = await redis_service.get(cache_key)
+            if cached_result:
+                return cached_result
+            if not await redis_service.exists(lock_key):
+                return None
+        return None
+    
+    def _result_cache_key(
+        self,
+        enhanced_prompt: str,
+        user_face_url: Optional[str],
+        user_logo_url: Optional[str]
+    ) -> str:
+        """Cache key identifying a generation by its prompt and reference images"""
+        content = "\0".join((enhanced_prompt, user_face_url or "", user_logo_url or ""))
+        return f"mj:result:{hashlib.sha256(content.encode()).hexdigest()}"
     
     async def _generate_with_goapi(
         self,
         prompt: str,
         user_face_url: Optional[str] = None,
-        user_logo_url: Optional[str] = None
+        user_logo_url: Optional[str] = None,
+        cache_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """Generate using GoAPI.ai service"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.goapi_api_key}",
-                "Content-Type": "application/json"
-            }
+            headers = self._goapi_headers
             
-            # Prepare request payload
+            # Prepare request payload; without a webhook we poll instead
+            callback_id = uuid.uuid4().hex if self.webhook_base_url else None
             payload = {
                 "prompt": prompt,
-                "webhook_url": None,  # We'll poll instead
-                "webhook_secret": None
+                "webhook_url": self._webhook_url(callback_id) if callback_id else None,
+                "webhook_secret": self._webhook_signature(callback_id) if callback_id else None
             }
             
             # Add image references if provided
             if user_face_url:
                 payload["image_url"] = user_face_url
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Submit generation request
-                response = await client.post(
-                    f"{self.goapi_base_url}/imagine",
-                    headers=headers,
-                    json=payload
+            # Submit generation request
+            submit_result = await self._submit(f"{self.goapi_base_url}/imagine", headers, payload)
+            task_id = submit_result.get("task_id")
+            
+            if not task_id:
+                raise MidjourneyServiceError("No task_id received from GoAPI.ai")
+            
+            logger.info(f"GoAPI.ai task submitted: {task_id}")
+            
+            # Record the paid job so another worker can finish it after a restart
+            await self._track_pending(task_id, "goapi", prompt, cache_key)
+            
+            # Wait for the completion callback, or poll when webhooks are off
+            if callback_id:
+                completion = self._wait_for_webhook(
+                    callback_id,
+                    lambda result, start_time: self._parse_goapi_result(result, task_id, start_time, 0)
                 )
-                response.raise_for_status()
-                
-                submit_result = response.json()
-                task_id = submit_result.get("task_id")
-                
-                if not task_id:
-                    raise MidjourneyServiceError("No task_id received from GoAPI.ai")
-                
-                logger.info(f"GoAPI.ai task submitted: {task_id}")
-                
-                # Poll for completion
-                return await self._poll_goapi_status(task_id, headers)
+            else:
+                completion = self._poll_goapi_status(task_id, headers)
+            return await self._await_pending(task_id, completion)
                 
         except Exception as e:
             raise MidjourneyServiceError(f"GoAPI.ai generation error: {e}")
@@ -167,167 +466,400 @@ class MidjourneyService:
         self,
         prompt: str,
         user_face_url: Optional[str] = None,
-        user_logo_url: Optional[str] = None
+        user_logo_url: Optional[str] = None,
+        cache_key: Optional[str] = None
     ) -> Dict[str, Any]:
         """Generate using UseAPI.net service"""
         try:
-            headers = {
-                "Authorization": f"Bearer {self.useapi_api_key}",
-                "Content-Type": "application/json"
-            }
+            headers = self._useapi_headers
             
-            # Prepare request payload
+            # Prepare request payload; without a webhook we poll instead
+            callback_id = uuid.uuid4().hex if self.webhook_base_url else None
             payload = {
                 "prompt": prompt,
-                "webhook_url": None
+                "webhook_url": self._webhook_url(callback_id) if callback_id else None
             }
             
             # Add image references if provided
             if user_face_url:
                 payload["image_url"] = user_face_url
             
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                # Submit generation request
-                response = await client.post(
-                    f"{self.useapi_base_url}/imagine",
-                    headers=headers,
-                    json=payload
+            # Submit generation request
+            submit_result = await self._submit(f"{self.useapi_base_url}/imagine", headers, payload)
+            job_id = submit_result.get("job_id") or submit_result.get("id")
+            
+            if not job_id:
+                raise MidjourneyServiceError("No job_id received from UseAPI.net")
+            
+            logger.info(f"UseAPI.net job submitted: {job_id}")
+            
+            # Record the paid job so another worker can finish it after a restart
+            await self._track_pending(job_id, "useapi", prompt, cache_key)
+            
+            # Wait for the completion callback, or poll when webhooks are off
+            if callback_id:
+                completion = self._wait_for_webhook(
+                    callback_id,
+                    lambda result, start_time: self._parse_useapi_result(result, job_id, start_time, 0)
                 )
-                response.raise_for_status()
-                
-                submit_result = response.json()
-                job_id = submit_result.get("job_id") or submit_result.get("id")
-                
-                if not job_id:
-                    raise MidjourneyServiceError("No job_id received from UseAPI.net")
-                
-                logger.info(f"UseAPI.net job submitted: {job_id}")
-                
-                # Poll for completion
-                return await self._poll_useapi_status(job_id, headers)
+            else:
+                completion = self._poll_useapi_status(job_id, headers)
+            return await self._await_pending(job_id, completion)
                 
         except Exception as e:
             raise MidjourneyServiceError(f"UseAPI.net generation error: {e}")
     
     async def _poll_goapi_status(self, task_id: str, headers: Dict[str, str]) -> Dict[str, Any]:
         """Poll GoAPI.ai for task completion"""
-        start_time = time.time()
+        start_time = time.monotonic()
         poll_count = 0
+        error_streak = 0  # consecutive failed polls
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            while time.time() - start_time < self.max_poll_time:
-                poll_count += 1
+        client = self._http()
+        while time.monotonic() - start_time < self.max_poll_time:
+            poll_count += 1
+            
+            try:
+                response = await client.get(
+                    f"{self.goapi_base_url}/task/{task_id}",
+                    headers=headers
+                )
+                response.raise_for_status()
+                error_streak = 0
                 
-                try:
-                    response = await client.get(
-                        f"{self.goapi_base_url}/task/{task_id}",
-                        headers=headers
-                    )
-                    response.raise_for_status()
-                    
-                    result = response.json()
-                    status = result.get("status", "").lower()
-                    
-                    logger.info(f"GoAPI.ai poll {poll_count}: {status}")
-                    
-                    if status in ["completed", "success"]:
-                        image_url = result.get("image_url") or result.get("result", {}).get("image_url")
-                        if image_url:
-                            return {
-                                "status": "completed",
-                                "image_url": image_url,
-                                "task_id": task_id,
-                                "service": "goapi",
-                                "poll_count": poll_count,
-                                "generation_time": time.time() - start_time
-                            }
-                        else:
-                            raise MidjourneyServiceError("Completed but no image URL received")
-                    
-                    elif status in ["failed", "error"]:
-                        error_msg = result.get("error", "Unknown error")
-                        raise MidjourneyServiceError(f"Generation failed: {error_msg}")
-                    
-                    elif status in ["pending", "processing", "in_progress"]:
-                        # Continue polling with exponential backoff
-                        wait_time = min(self.poll_interval * (1.5 ** min(poll_count - 1, 5)), 60)
-                        await asyncio.sleep(wait_time)
-                        continue
-                    
-                    else:
-                        logger.info(f"Unknown status: {status}, continuing...")
-                        await asyncio.sleep(self.poll_interval)
-                        continue
+                result = loads(response.content)
+                status = result.get("status", "").lower()
+                
+                logger.info(f"GoAPI.ai poll {poll_count}: {status}")
                 
-                except httpx.HTTPError as e:
-                    if poll_count >= self.max_retries:
-                        raise MidjourneyServiceError(f"Polling failed after {self.max_retries} retries: {e}")
-                    
-                    wait_time = self.poll_interval * (2 ** (poll_count - 1))
-                    logger.info(f"Poll error, retrying in {wait_time}s: {e}")
+                completed = self._parse_goapi_result(result, task_id, start_time, poll_count)
+                if completed:
+                    return completed
+                
+                elif status in ["pending", "processing", "in_progress"]:
+                    # Poll again near the expected completion time
+                    wait_time = self._next_poll_delay(result, time.monotonic() - start_time, poll_count)
                     await asyncio.sleep(wait_time)
                     continue
+                
+                else:
+                    logger.info(f"Unknown status: {status}, continuing...")
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+            
+            except httpx.HTTPError as e:
+                error_streak += 1
+                if error_streak >= self.max_retries:
+                    raise MidjourneyServiceError(f"Polling failed after {self.max_retries} retries: {e}")
+                
+                wait_time = self.poll_interval * (2 ** (error_streak - 1))
+                logger.info(f"Poll error, retrying in {wait_time}s: {e}")
+                await asyncio.sleep(wait_time)
+                continue
         
         raise MidjourneyServiceError(f"Generation timeout after {self.max_poll_time} seconds")
     
     async def _poll_useapi_status(self, job_id: str, headers: Dict[str, str]) -> Dict[str, Any]:
         """Poll UseAPI.net for job completion"""
-        start_time = time.time()
+        start_time = time.monotonic()
         poll_count = 0
+        error_streak = 0  # consecutive failed polls
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            while time.time() - start_time < self.max_poll_time:
-                poll_count += 1
+        client = self._http()
+        while time.monotonic() - start_time < self.max_poll_time:
+            poll_count += 1
+            
+            try:
+                response = await client.get(
+                    f"{self.useapi_base_url}/jobs/{job_id}",
+                    headers=headers
+                )
+                response.raise_for_status()
+                error_streak = 0
                 
-                try:
-                    response = await client.get(
-                        f"{self.useapi_base_url}/jobs/{job_id}",
-                        headers=headers
-                    )
-                    response.raise_for_status()
-                    
-                    result = response.json()
-                    status = result.get("status", "").lower()
-                    
-                    logger.info(f"UseAPI.net poll {poll_count}: {status}")
-                    
-                    if status in ["completed", "success"]:
-                        image_url = result.get("image_url") or result.get("attachments", [{}])[0].get("url")
-                        if image_url:
-                            return {
-                                "status": "completed",
-                                "image_url": image_url,
-                                "job_id": job_id,
-                                "service": "useapi",
-                                "poll_count": poll_count,
-                                "generation_time": time.time() - start_time
-                            }
-                        else:
-                            raise MidjourneyServiceError("Completed but no image URL received")
-                    
-                    elif status in ["failed", "error"]:
-                        error_msg = result.get("error", "Unknown error")
-                        raise MidjourneyServiceError(f"Generation failed: {error_msg}")
-                    
-                    elif status in ["pending", "processing", "in_progress", "queued"]:
-                        # Continue polling with exponential backoff
-                        wait_time = min(self.poll_interval * (1.5 ** min(poll_count - 1, 5)), 60)
-                        await asyncio.sleep(wait_time)
-                        continue
-                    
-                    else:
-                        logger.info(f"Unknown status: {status}, continuing...")
-                        await asyncio.sleep(self.poll_interval)
-                        continue
+                result = loads(response.content)
+                status = result.get("status", "").lower()
+                
+                logger.info(f"UseAPI.net poll {poll_count}: {status}")
+                
+                completed = self._parse_useapi_result(result, job_id, start_time, poll_count)
+                if completed:
+                    return completed
                 
-                except httpx.HTTPError as e:
-                    if poll_count >= self.max_retries:
-                        raise MidjourneyServiceError(f"Polling failed after {self.max_retries} retries: {e}")
-                    
-                    wait_time = self.poll_interval * (2 ** (poll_count - 1))
-                    logger.info(f"Poll error, retrying in {wait_time}s: {e}")
+                elif status in ["pending", "processing", "in_progress", "queued"]:
+                    # Poll again near the expected completion time
+                    wait_time = self._next_poll_delay(result, time.monotonic() - start_time, poll_count)
                     await asyncio.sleep(wait_time)
                     continue
+                
+                else:
+                    logger.info(f"Unknown status: {status}, continuing...")
+                    await asyncio.sleep(self.poll_interval)
+                    continue
+            
+            except httpx.HTTPError as e:
+                error_streak += 1
+                if error_streak >= self.max_retries:
+                    raise MidjourneyServiceError(f"Polling failed after {self.max_retries} retries: {e}")
+                
+                wait_time = self.poll_interval * (2 ** (error_streak - 1))
+                logger.info(f"Poll error, retrying in {wait_time}s: {e}")
+                await asyncio.sleep(wait_time)
+                continue
+        
+        raise MidjourneyServiceError(f"Generation timeout after {self.max_poll_time} seconds")
+    
+    # Pending job tracking
+    
+    def _pending_key(self, task_id: str) -> str:
+        """Hash describing a submitted job that has not finished yet"""
+        return f"mj:pending:{task_id}"
+    
+    async def _track_pending(
+        self,
+        task_id: str,
+        service: str,
+        prompt: str,
+        cache_key: Optional[str]
+    ) -> None:
+        """Record a submitted job until it completes"""
+        pending_key = self._pending_key(task_id)
+        await (
+            redis_service.pipeline()
+            .hset(pending_key, {
+                "service": service,
+                "prompt": prompt,
+                "submitted_at": time.time(),
+                "heartbeat_at": time.time(),
+                "cache_key": cache_key
+            })
+            .expire(pending_key, self.result_cache_ttl)
+            .sadd(self.pending_jobs_key, task_id)
+            .execute()
+        )
+    
+    async def _clear_pending(self, task_id: str) -> None:
+        """Forget a job once it completed or failed"""
+        await (
+            redis_service.pipeline()
+            .delete(self._pending_key(task_id), f"{self._pending_key(task_id)}:claim")
+            .srem(self.pending_jobs_key, task_id)
+            .execute()
+        )
+    
+    async def _heartbeat(self, task_id: str) -> None:
+        """Mark a pending job as owned by this process until cancelled"""
+        pending_key = self._pending_key(task_id)
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            await redis_service.hset(pending_key, "heartbeat_at", time.time())
+    
+    async def _await_pending(self, task_id: str, completion: Awaitable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Await a job's completion, heartbeating meanwhile, and clear its pending record unless interrupted"""
+        heartbeat = asyncio.create_task(self._heartbeat(task_id))
+        try:
+            result = await completion
+        except asyncio.CancelledError:
+            # Shutting down; the heartbeat lapses and resume_pending picks the job up
+            raise
+        except BaseException:
+            # Stop heartbeating first so a late beat cannot recreate the cleared record
+            heartbeat.cancel()
+            await self._clear_pending(task_id)
+            raise
+        finally:
+            heartbeat.cancel()
+        await self._clear_pending(task_id)
+        return result
+    
+    async def resume_pending(self) -> int:
+        """
+        Finish jobs whose owning process stopped heartbeating
+        
+        Jobs that are still heartbeating are left to their owner, and each
+        abandoned job is claimed by one resumer. Runs until the resumed jobs
+        complete, so it belongs in a worker task rather than a web process.
+        
+        Returns:
+            Number of jobs resumed
+        """
+        abandoned_before = time.time() - self.heartbeat_timeout
+        resumed = []
+        for task_id in await redis_service.smembers(self.pending_jobs_key):
+            job = await redis_service.hgetall(self._pending_key(task_id))
+            if not job:
+                await redis_service.srem(self.pending_jobs_key, task_id)
+                continue
+            if float(job.get("heartbeat_at") or job.get("submitted_at") or 0) > abandoned_before:
+                continue
+            
+            # The claim only has to last until the resumer's first heartbeat
+            claim_key = f"{self._pending_key(task_id)}:claim"
+            if not await redis_service.set_nx(claim_key, 1, self.heartbeat_timeout):
+                continue
+            resumed.append(self._resume_job(task_id, job))
+        
+        if resumed:
+            logger.info(f"Resuming {len(resumed)} abandoned Midjourney jobs")
+            await asyncio.gather(*resumed)
+        return len(resumed)
+    
+    async def _resume_job(self, task_id: str, job: Dict[str, Any]) -> None:
+        """Poll a resumed job to completion and cache its result"""
+        service = job.get("service")
+        headers = self._goapi_headers if service == "goapi" else self._useapi_headers
+        poll = self._poll_goapi_status if service == "goapi" else self._poll_useapi_status
+        
+        try:
+            result = await self._await_pending(task_id, poll(task_id, headers))
+            cache_key = job.get("cache_key")
+            if cache_key:
+                enhanced_result = self._enhance_generation_result(result, job.get("prompt", ""))
+                await redis_service.set(cache_key, enhanced_result, self.result_cache_ttl)
+            logger.info(f"Resumed Midjourney job completed: {task_id}")
+        except asyncio.CancelledError:
+            # Let the next process to start pick the job up again
+            await redis_service.delete(f"{self._pending_key(task_id)}:claim")
+            raise
+        except Exception as e:
+            logger.info(f"Resumed Midjourney job {task_id} failed: {e}")
+    
+    def _next_poll_delay(self, result: Dict[str, Any], elapsed: float, poll_count: int) -> float:
+        """Delay before the next poll, from the reported ETA or progress when available"""
+        remaining = None
+        
+        eta = result.get("eta")
+        if isinstance(eta, (int, float)):
+            remaining = eta
+        else:
+            progress = result.get("progress")
+            if isinstance(progress, str):
+                try:
+                    progress = float(progress.rstrip("%"))
+                except ValueError:
+                    progress = None
+            if isinstance(progress, (int, float)) and 0 < progress < 100:
+                remaining = elapsed * (100 - progress) / max(progress, 1)
+        
+        if remaining is None:
+            # No progress signal; fall back to exponential backoff
+            return min(self.poll_interval * (1.5 ** min(poll_count - 1, 5)), 60)
+        
+        # Aim slightly early so completion is picked up promptly
+        return max(self.min_poll_interval, min(remaining * 0.8, 60))
+    
+    def _parse_goapi_result(
+        self,
+        result: Dict[str, Any],
+        task_id: str,
+        start_time: float,
+        poll_count: int
+    ) -> Optional[Dict[str, Any]]:
+        """Return the completed GoAPI.ai result, None while running; raises on failure"""
+        status = result.get("status", "").lower()
+        
+        if status in ["completed", "success"]:
+            image_url = result.get("image_url") or result.get("result", {}).get("image_url")
+            if not image_url:
+                raise MidjourneyServiceError("Completed but no image URL received")
+            return {
+                "status": "completed",
+                "image_url": image_url,
+                "task_id": task_id,
+                "service": "goapi",
+                "poll_count": poll_count,
+                "generation_time": time.monotonic() - start_time
+            }
+        
+        if status in ["failed", "error"]:
+            error_msg = result.get("error", "Unknown error")
+            raise MidjourneyServiceError(f"Generation failed: {error_msg}")
+        
+        return None
+    
+    def _parse_useapi_result(
+        self,
+        result: Dict[str, Any],
+        job_id: str,
+        start_time: float,
+        poll_count: int
+    ) -> Optional[Dict[str, Any]]:
+        """Return the completed UseAPI.net result, None while running; raises on failure"""
+        status = result.get("status", "").lower()
+        
+        if status in ["completed", "success"]:
+            image_url = result.get("image_url") or result.get("attachments", [{}])[0].get("url")
+            if not image_url:
+                raise MidjourneyServiceError("Completed but no image URL received")
+            return {
+                "status": "completed",
+                "image_url": image_url,
+                "job_id": job_id,
+                "service": "useapi",
+                "poll_count": poll_count,
+                "generation_time": time.monotonic() - start_time
+            }
+        
+        if status in ["failed", "error"]:
+            error_msg = result.get("error", "Unknown error")
+            raise MidjourneyServiceError(f"Generation failed: {error_msg}")
+        
+        return None
+    
+    # Webhook completion
+    
+    def _webhook_signature(self, callback_id: str) -> str:
+        """Sign a callback ID so only URLs we issued are accepted"""
+        return hmac.new(
+            settings.SECRET_KEY.encode(), callback_id.encode(), hashlib.sha256
+        ).hexdigest()
+    
+    def verify_webhook_signature(self, callback_id: str, signature: str) -> bool:
+        """Check a webhook request's signature against its callback ID"""
+        return hmac.compare_digest(self._webhook_signature(callback_id), signature)
+    
+    def _webhook_url(self, callback_id: str) -> str:
+        """Build the signed callback URL handed to the provider"""
+        return (
+            f"{self.webhook_base_url.rstrip('/')}{settings.API_V1_STR}/webhooks/midjourney/"
+            f"{callback_id}?signature={self._webhook_signature(callback_id)}"
+        )
+    
+    def _webhook_key(self, callback_id: str) -> str:
+        """Redis list the webhook receiver pushes callback payloads onto"""
+        return f"mj:webhook:{callback_id}"
+    
+    async def deliver_webhook(self, callback_id: str, payload: Dict[str, Any]) -> None:
+        """Hand a provider callback to the process waiting on it"""
+        key = self._webhook_key(callback_id)
+        await redis_service.pipeline().lpush(key, payload).expire(key, self.max_poll_time).execute()
+    
+    async def _wait_for_webhook(
+        self,
+        callback_id: str,
+        parse_result: Callable[[Dict[str, Any], float], Optional[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Wait for provider callbacks until one reports completion
+        
+        The generation may run in a different process than the one receiving the
+        webhook, so callbacks are handed over through a Redis list.
+        """
+        key = self._webhook_key(callback_id)
+        start_time = time.monotonic()
+        
+        try:
+            while time.monotonic() - start_time < self.max_poll_time:
+                payload = await redis_service.blpop(key, self.webhook_wait_slice)
+                if payload is None:
+                    continue
+                
+                completed = parse_result(payload, start_time)
+                if completed:
+                    return completed
+                logger.info(f"Webhook {callback_id}: {payload.get('status', 'unknown')}")
+        finally:
+            await redis_service.delete(key)
         
         raise MidjourneyServiceError(f"Generation timeout after {self.max_poll_time} seconds")
     
@@ -347,75 +879,18 @@ class MidjourneyService:
         if custom_text and custom_text.strip():
             prompt_parts.append(f'with text "{custom_text}"')
         
-        # Add style characteristics from template analysis
+        # Add style characteristics from template analysis; the fragment is
+        # deterministic per analysis, so it is cached by content
         if template_analysis:
-            style_parts = []
-            
-            # Extract style characteristics
-            style_chars = template_analysis.get("style_characteristics", {})
-            if style_chars:
-                design_style = style_chars.get("design_style")
-                mood = style_chars.get("mood")
-                energy_level = style_chars.get("energy_level", 5)
-                
-                if design_style:
-                    style_parts.append(f"{design_style} style")
-                if mood:
-                    style_parts.append(f"{mood} mood")
-                
-                # Convert energy level to descriptive terms
-                if energy_level >= 8:
-                    style_parts.append("high energy, dynamic")
-                elif energy_level >= 6:
-                    style_parts.append("energetic, vibrant")
-                elif energy_level >= 4:
-                    style_parts.append("balanced energy")
-                else:
-                    style_parts.append("calm, peaceful")
-            
-            # Extract color information
-            color_analysis = template_analysis.get("color_analysis", {})
-            if color_analysis:
-                color_temp = color_analysis.get("color_temperature")
-                contrast = color_analysis.get("contrast_level")
-                
-                if color_temp:
-                    style_parts.append(f"{color_temp} colors")
-                if contrast:
-                    style_parts.append(f"{contrast} contrast")
-            
-            # Extract composition info
-            composition = template_analysis.get("composition", {})
-            if composition:
-                layout = composition.get("layout_type")
-                if layout:
-                    style_parts.append(f"{layout} composition")
-            
-            if style_parts:
-                prompt_parts.append(", ".join(style_parts))
+            style_fragment = _style_fragment(_analysis_fingerprint(template_analysis))
+            if style_fragment:
+                prompt_parts.append(style_fragment)
         
         # Build final prompt
         enhanced_prompt = ", ".join(prompt_parts)
         
         # Add Midjourney parameters
-        mj_params = []
-        
-        # Aspect ratio
-        if aspect_ratio and aspect_ratio != "1:1":
-            mj_params.append(f"--ar {aspect_ratio}")
-        
-        # Model version
-        if model and model != "v6":
-            mj_params.append(f"--{model}")
-        
-        # Stylize parameter
-        mj_params.append(f"--stylize {self.default_stylize}")
-        
-        # Quality and style
-        mj_params.append("--style raw")
-        
-        if mj_params:
-            enhanced_prompt += " " + " ".join(mj_params)
+        enhanced_prompt += " " + _mj_params_suffix(aspect_ratio, model, self.default_stylize)
         
         logger.info(f"Enhanced Midjourney prompt: {enhanced_prompt}")
         return enhanced_prompt
@@ -426,28 +901,26 @@ class MidjourneyService:
         prompt: str,
         template_analysis: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
-        """Enhance generation result with metadata"""
-        
-        enhanced = {
-            **result,
-            "metadata": {
-                "generated_at": datetime.now(timezone.utc).isoformat(),
-                "service_version": "1.0",
-                "prompt_used": prompt,
-                "midjourney_service": result.get("service", "unknown")
-            }
+        """Enhance generation result with metadata, in place"""
+        
+        metadata = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "service_version": "1.0",
+            "prompt_used": prompt,
+            "midjourney_service": result.get("service", "unknown")
         }
         
         # Add template analysis reference
         if template_analysis:
-            enhanced["metadata"]["template_analysis_used"] = True
-            enhanced["metadata"]["style_reference"] = {
-                "design_style": template_analysis.get("style_characteristics", {}).get("design_style"),
-                "energy_level": template_analysis.get("style_characteristics", {}).get("energy_level"),
-                "mood": template_analysis.get("style_characteristics", {}).get("mood")
+            style_chars = template_analysis.get("style_characteristics", {})
+            metadata["template_analysis_used"] = True
+            metadata["style_reference"] = {
+                "design_style": style_chars.get("design_style"),
+                "energy_level": style_chars.get("energy_level"),
+                "mood": style_chars.get("mood")
             }
         else:
-            enhanced["metadata"]["template_analysis_used"] = False
+            metadata["template_analysis_used"] = False
         
         # Calculate quality score based on generation time and poll count
         generation_time = result.get("generation_time", 0)
@@ -455,9 +928,11 @@ class MidjourneyService:
         
         # Lower generation time and fewer polls indicate better performance
         quality_score = max(0.5, min(1.0, 1.0 - (generation_time / 300) - (poll_count / 20)))
-        enhanced["metadata"]["quality_score"] = round(quality_score, 2)
+        metadata["quality_score"] = round(quality_score, 2)
         
-        return enhanced
+        # Provider results are built fresh per job, so annotate rather than copy
+        result["metadata"] = metadata
+        return result
     
     async def upscale_image(
         self,
@@ -490,63 +965,83 @@ class MidjourneyService:
             logger.info(f"Image upscale failed: {e}")
             raise MidjourneyServiceError(f"Upscale failed: {str(e)}")
     
+    async def upscale_all(
+        self,
+        task_id: str,
+        service: str = "goapi"
+    ) -> List[Union[Dict[str, Any], BaseException]]:
+        """
+        Upscale all four images of a generation concurrently
+        
+        Args:
+            task_id: Original generation task ID
+            service: Which service was used for original generation
+            
+        Returns:
+            Upscale results for U1-U4 in order; failed upscales are returned as exceptions
+        """
+        semaphore = asyncio.Semaphore(self.max_parallel_upscales)
+        
+        async def upscale_one(upscale_index: int) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.upscale_image(task_id, upscale_index, service)
+        
+        return await asyncio.gather(
+            *(upscale_one(index) for index in (1, 2, 3, 4)),
+            return_exceptions=True
+        )
+    
     async def _upscale_with_goapi(self, task_id: str, upscale_index: int) -> Dict[str, Any]:
         """Upscale using GoAPI.ai"""
-        headers = {
-            "Authorization": f"Bearer {self.goapi_api_key}",
-            "Content-Type": "application/json"
-        }
+        headers = self._goapi_headers
         
         payload = {
             "task_id": task_id,
             "action": f"U{upscale_index}"
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.goapi_base_url}/action",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            new_task_id = result.get("task_id")
-            
-            if not new_task_id:
-                raise MidjourneyServiceError("No task_id received for upscale")
-            
-            # Poll for upscale completion
-            return await self._poll_goapi_status(new_task_id, headers)
+        client = self._http()
+        response = await client.post(
+            f"{self.goapi_base_url}/action",
+            headers=headers,
+            json=payload
+        )
+        response.raise_for_status()
+        
+        result = loads(response.content)
+        new_task_id = result.get("task_id")
+        
+        if not new_task_id:
+            raise MidjourneyServiceError("No task_id received for upscale")
+        
+        # Poll for upscale completion
+        return await self._poll_goapi_status(new_task_id, headers)
     
     async def _upscale_with_useapi(self, job_id: str, upscale_index: int) -> Dict[str, Any]:
         """Upscale using UseAPI.net"""
-        headers = {
-            "Authorization": f"Bearer {self.useapi_api_key}",
-            "Content-Type": "application/json"
-        }
+        headers = self._useapi_headers
         
         payload = {
             "job_id": job_id,
             "action": f"upscale_{upscale_index}"
         }
         
-        async with httpx.AsyncClient(timeout=self.timeout) as client:
-            response = await client.post(
-                f"{self.useapi_base_url}/action",
-                headers=headers,
-                json=payload
-            )
-            response.raise_for_status()
-            
-            result = response.json()
-            new_job_id = result.get("job_id") or result.get("id")
-            
-            if not new_job_id:
-                raise MidjourneyServiceError("No job_id received for upscale")
-            
-            # Poll for upscale completion
-            return await self._poll_useapi_status(new_job_id, headers)
+        client = self._http()
+        response = await client.post(
+            f"{self.useapi_base_url}/action",
+            headers=headers,
+            json=payload
+        )
+        response.raise_for_status()
+        
+        result = loads(response.content)
+        new_job_id = result.get("job_id") or result.get("id")
+        
+        if not new_job_id:
+            raise MidjourneyServiceError("No job_id received for upscale")
+        
+        # Poll for upscale completion
+        return await self._poll_useapi_status(new_job_id, headers)
     
     async def get_service_stats(self) -> Dict[str, Any]:
         """Get Midjourney service statistics"""
@@ -554,6 +1049,8 @@ class MidjourneyService:
             stats = {
                 "goapi_available": self.goapi_api_key is not None,
                 "useapi_available": self.useapi_api_key is not None,
+                "goapi_circuit_open": self._goapi_breaker.is_open,
+                "useapi_circuit_open": self._useapi_breaker.is_open,
                 "poll_interval": self.poll_interval,
                 "max_poll_time": self.max_poll_time,
                 "default_model": self.default_model,
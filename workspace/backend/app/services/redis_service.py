@@ -1,16 +1,148 @@
 """
 Redis service for caching and pub/sub operations
 """
+import asyncio
 import json
 import redis
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
 from datetime import datetime, timedelta, timezone
 from app.core.config import settings
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
 import logging
 logger = logging.getLogger(__name__)
 
 
+def dumps(value: Any) -> Union[str, bytes]:
+    """Serialize a cache value, using orjson when available"""
+    if orjson is not None:
+        return orjson.dumps(
+            value,
+            default=str,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+    return json.dumps(value, default=str)
+
+
+def loads(value: Union[str, bytes]) -> Any:
+    """Deserialize a cache value, using orjson when available"""
+    if orjson is not None:
+        return orjson.loads(value)
+    return json.loads(value)
+
+
+def _load_hash(hash_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Deserialize every field of a hash reply"""
+    return {k: loads(v) for k, v in hash_data.items()}
+
+
+def _load_members(members: Any) -> List[Any]:
+    """Deserialize every member of a set reply"""
+    return [loads(v) for v in members] if members else []
+
+
+class RedisPipeline:
+    """Batches commands into one round trip, serializing values like RedisService"""
+    
+    def __init__(self, pipeline: "redis.client.Pipeline"):
+        self._pipeline = pipeline
+        # Reply decoders keyed by command position
+        self._decoders: Dict[int, Callable[[Any], Any]] = {}
+    
+    def set(self, key: str, value: Any, ttl: int) -> "RedisPipeline":
+        self._pipeline.setex(key, ttl, dumps(value))
+        return self
+    
+    def set_bytes(self, key: str, value: bytes, ttl: int) -> "RedisPipeline":
+        self._pipeline.setex(key, ttl, value)
+        return self
+    
+    def delete(self, *keys: str) -> "RedisPipeline":
+        self._pipeline.delete(*keys)
+        return self
+    
+    def expire(self, key: str, seconds: int) -> "RedisPipeline":
+        self._pipeline.expire(key, seconds)
+        return self
+    
+    def lpush(self, name: str, *values: Any) -> "RedisPipeline":
+        self._pipeline.lpush(name, *(dumps(v) for v in values))
+        return self
+    
+    def hset(self, name: str, mapping: Dict[str, Any]) -> "RedisPipeline":
+        self._pipeline.hset(name, mapping={k: dumps(v) for k, v in mapping.items()})
+        return self
+    
+    def hgetall(self, name: str) -> "RedisPipeline":
+        self._decoders[len(self._pipeline)] = _load_hash
+        self._pipeline.hgetall(name)
+        return self
+    
+    def sadd(self, name: str, *values: Any) -> "RedisPipeline":
+        self._pipeline.sadd(name, *(dumps(v) for v in values))
+        return self
+    
+    def srem(self, name: str, *values: Any) -> "RedisPipeline":
+        self._pipeline.srem(name, *(dumps(v) for v in values))
+        return self
+    
+    def sinter(self, *names: str) -> "RedisPipeline":
+        self._decoders[len(self._pipeline)] = _load_members
+        self._pipeline.sinter(*names)
+        return self
+    
+    def sunionstore(self, dest: str, names: List[str]) -> "RedisPipeline":
+        self._pipeline.sunionstore(dest, names)
+        return self
+    
+    def zadd(self, name: str, mapping: Dict[str, float]) -> "RedisPipeline":
+        self._pipeline.zadd(name, mapping)
+        return self
+    
+    def zincrby(self, name: str, amount: float, member: str) -> "RedisPipeline":
+        self._pipeline.zincrby(name, amount, member)
+        return self
+    
+    def zunionstore(self, dest: str, keys: List[str]) -> "RedisPipeline":
+        self._pipeline.zunionstore(dest, keys)
+        return self
+    
+    def zmscore(self, name: str, members: List[str]) -> "RedisPipeline":
+        self._pipeline.zmscore(name, members)
+        return self
+    
+    def zrem(self, name: str, *members: str) -> "RedisPipeline":
+        self._pipeline.zrem(name, *members)
+        return self
+    
+    def zremrangebyscore(self, name: str, min_score: float, max_score: float) -> "RedisPipeline":
+        self._pipeline.zremrangebyscore(name, min_score, max_score)
+        return self
+    
+    def zrevrange(self, name: str, start: int, end: int) -> "RedisPipeline":
+        self._pipeline.zrevrange(name, start, end)
+        return self
+    
+    def zcard(self, name: str) -> "RedisPipeline":
+        self._pipeline.zcard(name)
+        return self
+    
+    async def execute(self) -> List[Any]:
+        """Send queued commands; returns an empty list on failure"""
+        try:
+            results = self._pipeline.execute()
+            for index, decode in self._decoders.items():
+                results[index] = decode(results[index])
+            return results
+        except Exception as e:
+            logger.info(f"Redis pipeline failed: {e}")
+            return []
+
+
 class RedisService:
     """Redis service for caching, sessions, and pub/sub"""
     
@@ -22,6 +154,14 @@ class RedisService:
             socket_timeout=5,
             retry_on_timeout=True
         )
+        # Separate client for raw binary values (no response decoding)
+        self.binary_client = redis.from_url(
+            settings.REDIS_URL,
+            decode_responses=False,
+            socket_connect_timeout=5,
+            socket_timeout=5,
+            retry_on_timeout=True
+        )
         self.default_ttl = 3600  # 1 hour
     
     async def ping(self) -> bool:
@@ -32,13 +172,17 @@ class RedisService:
             logger.info(f"Redis ping failed: {e}")
             return False
     
+    def pipeline(self, transaction: bool = False) -> RedisPipeline:
+        """Start a command pipeline"""
+        return RedisPipeline(self.redis_client.pipeline(transaction=transaction))
+    
     # Cache operations
     async def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
         try:
             value = self.redis_client.get(key)
             if value:
-                return json.loads(value)
+                return loads(value)
             return None
         except Exception as e:
             logger.info(f"Redis get failed for key {key}: {e}")
@@ -48,12 +192,59 @@ class RedisService:
         """Set value in cache with optional TTL"""
         try:
             ttl = ttl or self.default_ttl
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = dumps(value)
             return self.redis_client.setex(key, ttl, serialized_value)
         except Exception as e:
             logger.info(f"Redis set failed for key {key}: {e}")
             return False
     
+    async def set_nx(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set value only if key does not exist; returns whether it was set"""
+        try:
+            ttl = ttl or self.default_ttl
+            return bool(self.redis_client.set(key, dumps(value), ex=ttl, nx=True))
+        except Exception as e:
+            logger.info(f"Redis set_nx failed for key {key}: {e}")
+            return False
+    
+    async def get_bytes(self, key: str) -> Optional[bytes]:
+        """Get raw bytes from cache without deserialization"""
+        try:
+            return self.binary_client.get(key)
+        except Exception as e:
+            logger.info(f"Redis get_bytes failed for key {key}: {e}")
+            return None
+    
+    async def set_bytes(self, key: str, value: bytes, ttl: Optional[int] = None) -> bool:
+        """Set raw bytes in cache with optional TTL"""
+        try:
+            ttl = ttl or self.default_ttl
+            return self.binary_client.setex(key, ttl, value)
+        except Exception as e:
+            logger.info(f"Redis set_bytes failed for key {key}: {e}")
+            return False
+    
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get multiple values from cache in one round trip"""
+        if not keys:
+            return []
+        try:
+            values = self.redis_client.mget(keys)
+            return [loads(v) if v else None for v in values]
+        except Exception as e:
+            logger.info(f"Redis mget failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
+    async def mget_bytes(self, keys: List[str]) -> List[Optional[bytes]]:
+        """Get multiple raw byte values in one round trip"""
+        if not keys:
+            return []
+        try:
+            return self.binary_client.mget(keys)
+        except Exception as e:
+            logger.info(f"Redis mget_bytes failed for {len(keys)} keys: {e}")
+            return [None] * len(keys)
+    
     async def delete(self, key: str) -> bool:
         """Delete key from cache"""
         try:
@@ -70,6 +261,14 @@ class RedisService:
             logger.info(f"Redis exists check failed for key {key}: {e}")
             return False
     
+    async def scan_keys(self, pattern: str, count: int = 1000) -> List[str]:
+        """List keys matching a pattern without blocking the server like KEYS"""
+        try:
+            return list(self.redis_client.scan_iter(match=pattern, count=count))
+        except Exception as e:
+            logger.info(f"Redis scan failed for pattern {pattern}: {e}")
+            return []
+    
     async def incr(self, key: str, amount: int = 1) -> int:
         """Increment value of key"""
         try:
@@ -92,7 +291,7 @@ class RedisService:
         try:
             value = self.redis_client.hget(name, key)
             if value:
-                return json.loads(value)
+                return loads(value)
             return None
         except Exception as e:
             logger.info(f"Redis hget failed for {name}.{key}: {e}")
@@ -101,17 +300,26 @@ class RedisService:
     async def hset(self, name: str, key: str, value: Any) -> bool:
         """Set field in hash"""
         try:
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = dumps(value)
             return bool(self.redis_client.hset(name, key, serialized_value))
         except Exception as e:
             logger.info(f"Redis hset failed for {name}.{key}: {e}")
             return False
     
+    async def hset_mapping(self, name: str, mapping: Dict[str, Any]) -> bool:
+        """Set several fields in hash"""
+        try:
+            serialized_mapping = {k: dumps(v) for k, v in mapping.items()}
+            return bool(self.redis_client.hset(name, mapping=serialized_mapping))
+        except Exception as e:
+            logger.info(f"Redis hset_mapping failed for {name}: {e}")
+            return False
+    
     async def hgetall(self, name: str) -> Dict[str, Any]:
         """Get all fields from hash"""
         try:
             hash_data = self.redis_client.hgetall(name)
-            return {k: json.loads(v) for k, v in hash_data.items()}
+            return _load_hash(hash_data)
         except Exception as e:
             logger.info(f"Redis hgetall failed for {name}: {e}")
             return {}
@@ -120,18 +328,32 @@ class RedisService:
     async def lpush(self, name: str, *values: Any) -> int:
         """Push values to left of list"""
         try:
-            serialized_values = [json.dumps(v, default=str) for v in values]
+            serialized_values = [dumps(v) for v in values]
             return self.redis_client.lpush(name, *serialized_values)
         except Exception as e:
             logger.info(f"Redis lpush failed for {name}: {e}")
             return 0
     
+    async def blpop(self, name: str, timeout: int) -> Optional[Any]:
+        """Pop value from left of list, waiting up to timeout seconds for one
+        
+        Keep timeout below the client socket timeout (5s); loop for longer waits.
+        """
+        try:
+            item = await asyncio.to_thread(self.redis_client.blpop, [name], timeout)
+            if item:
+                return loads(item[1])
+            return None
+        except Exception as e:
+            logger.info(f"Redis blpop failed for {name}: {e}")
+            return None
+    
     async def rpop(self, name: str) -> Optional[Any]:
         """Pop value from right of list"""
         try:
             value = self.redis_client.rpop(name)
             if value:
-                return json.loads(value)
+                return loads(value)
             return None
         except Exception as e:
             logger.info(f"Redis rpop failed for {name}: {e}")
@@ -149,7 +371,7 @@ class RedisService:
         """Get range of elements from list"""
         try:
             values = self.redis_client.lrange(name, start, end)
-            return [json.loads(v) for v in values] if values else []
+            return [loads(v) for v in values] if values else []
         except Exception as e:
             logger.info(f"Redis lrange failed for {name}: {e}")
             return []
@@ -157,7 +379,7 @@ class RedisService:
     async def lrem(self, name: str, value: Any, count: int = 0) -> int:
         """Remove elements from list"""
         try:
-            serialized_value = json.dumps(value, default=str)
+            serialized_value = dumps(value)
             return self.redis_client.lrem(name, count, serialized_value)
         except Exception as e:
             logger.info(f"Redis lrem failed for {name}: {e}")
@@ -167,7 +389,7 @@ class RedisService:
     async def sadd(self, name: str, *values: Any) -> int:
         """Add values to set"""
         try:
-            serialized_values = [json.dumps(v, default=str) for v in values]
+            serialized_values = [dumps(v) for v in values]
             return self.redis_client.sadd(name, *serialized_values)
         except Exception as e:
             logger.info(f"Redis sadd failed for {name}: {e}")
@@ -176,7 +398,7 @@ class RedisService:
     async def srem(self, name: str, *values: Any) -> int:
         """Remove values from set"""
         try:
-            serialized_values = [json.dumps(v, default=str) for v in values]
+            serialized_values = [dumps(v) for v in values]
             return self.redis_client.srem(name, *serialized_values)
         except Exception as e:
             logger.info(f"Redis srem failed for {name}: {e}")
@@ -186,16 +408,83 @@ class RedisService:
         """Get all members of set"""
         try:
             values = self.redis_client.smembers(name)
-            return [json.loads(v) for v in values] if values else []
+            return [loads(v) for v in values] if values else []
         except Exception as e:
             logger.info(f"Redis smembers failed for {name}: {e}")
             return []
     
+    async def sinter(self, *names: str) -> List[Any]:
+        """Get members present in every given set"""
+        try:
+            return _load_members(self.redis_client.sinter(*names))
+        except Exception as e:
+            logger.info(f"Redis sinter failed for {names}: {e}")
+            return []
+    
+    # Server-side scripts
+    def register_script(self, script: str) -> "redis.commands.core.Script":
+        """Register a Lua script; calls go through EVALSHA and reload it if the server lost it"""
+        return self.redis_client.register_script(script)
+    
+    async def run_script(
+        self,
+        script: "redis.commands.core.Script",
+        keys: List[str],
+        args: List[Any]
+    ) -> Optional[Any]:
+        """Run a registered script, returning None on failure"""
+        try:
+            return script(keys=keys, args=args)
+        except Exception as e:
+            logger.info(f"Redis script failed: {e}")
+            return None
+    
+    # Sorted set operations (members are plain strings, e.g. IDs)
+    async def zadd(self, name: str, mapping: Dict[str, float]) -> int:
+        """Add members with scores to sorted set"""
+        try:
+            return self.redis_client.zadd(name, mapping)
+        except Exception as e:
+            logger.info(f"Redis zadd failed for {name}: {e}")
+            return 0
+    
+    async def zrem(self, name: str, *members: str) -> int:
+        """Remove members from sorted set"""
+        try:
+            return self.redis_client.zrem(name, *members)
+        except Exception as e:
+            logger.info(f"Redis zrem failed for {name}: {e}")
+            return 0
+    
+    async def zrevrange(self, name: str, start: int, end: int) -> List[str]:
+        """Get members of sorted set by rank, highest score first"""
+        try:
+            return self.redis_client.zrevrange(name, start, end)
+        except Exception as e:
+            logger.info(f"Redis zrevrange failed for {name}: {e}")
+            return []
+    
+    async def zrevrange_withscores(self, name: str, start: int, end: int) -> List[Tuple[str, float]]:
+        """Get (member, score) pairs of sorted set by rank, highest score first"""
+        try:
+            return self.redis_client.zrevrange(name, start, end, withscores=True)
+        except Exception as e:
+            logger.info(f"Redis zrevrange failed for {name}: {e}")
+            return []
+    
+    async def zcard(self, name: str) -> int:
+        """Get number of members in sorted set"""
+        try:
+            return self.redis_client.zcard(name)
+        except Exception as e:
+            logger.info(f"Redis zcard failed for {name}: {e}")
+            return 0
+    
     # Pub/Sub operations
     async def publish(self, channel: str, message: Dict[str, Any]) -> int:
         """Publish message to channel"""
         try:
-            serialized_message = json.dumps(message, default=str)
+            serialized_message = dumps(message)
             return self.redis_client.publish(channel, serialized_message)
         except Exception as e:
             logger.info(f"Redis publish failed for channel {channel}: {e}")
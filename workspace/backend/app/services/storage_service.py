@@ -2,25 +2,204 @@
 Professional Storage Service for Routix Platform
 Supports local storage, AWS S3, and Cloudflare R2
 """
+import asyncio
 import os
+import re
 import uuid
 import hashlib
+import io
+import json
 import mimetypes
+import mmap
+import stat
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, asynccontextmanager, contextmanager
 from pathlib import Path
-from typing import Optional, Dict, Any, BinaryIO, Union
-from datetime import datetime, timezone
+from typing import Optional, Dict, Any, AsyncIterator, Awaitable, BinaryIO, Callable, Iterator, List, Tuple, Union
+from datetime import datetime, timedelta, timezone
 import httpx
 from io import BytesIO
 
+from app.core.cache import LRUCache, TTLCache
+from app.services.redis_service import redis_service, dumps
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
 import logging
 logger = logging.getLogger(__name__)
 
+# Bytes read per iteration when streaming uploads
+_CHUNK_SIZE = 1 << 20
+
+# Part size for S3/R2 multipart uploads; smaller objects go up in one request
+_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+if getattr(hashlib.sha256, '__name__', '') != 'openssl_sha256':
+    logger.warning("hashlib is not backed by OpenSSL; upload hashing will be slow")
+
+
+# URL downloads larger than this are staged in a temp file instead of memory
+_LARGE_DOWNLOAD_SIZE = 32 * 1024 * 1024
+
+# Parallel range requests per large URL download
+_RANGE_CONCURRENCY = 8
+
+# sendfile() between regular files is only supported on Linux
+_HAS_FILE_SENDFILE = sys.platform.startswith('linux') and hasattr(os, 'sendfile')
+
+# Upload payloads: in-memory data is used as-is, anything else is read as a stream
+_BYTES_TYPES = (bytes, bytearray, memoryview)
+FileSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+# Content-addressed keys: folder/ab/cd/<64 hex digest><ext>, fanned out by the digest's first bytes
+_CONTENT_KEY_RE = re.compile(r"/([0-9a-f]{2})/([0-9a-f]{2})/\1\2[0-9a-f]{60}(\.[^/]*)?$")
+
+# Redis counters of the uploads sharing a content-addressed key, and the lock that
+# orders deleting a key's last reference against new uploads of the same bytes
+_REFS_PREFIX = "storage:refs:"
+_LOCK_PREFIX = "storage:lock:"
+
+# Drop one reference, removing the counter with the last; returns the references left
+_RELEASE_REF_LUA = """
+local remaining = redis.call('DECR', KEYS[1])
+if remaining <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return remaining
+"""
+
+# Delete a reference lock only while it still holds our token; once its TTL has
+# run out it may belong to another worker
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Extend the reference locks that still hold our tokens; returns how many were extended
+_EXTEND_LOCKS_LUA = """
+local extended = 0
+for i, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[i + 1] then
+        redis.call('EXPIRE', key, ARGV[1])
+        extended = extended + 1
+    end
+end
+return extended
+"""
+
+# Reusable streaming buffers; each is lent to one copy at a time
+_BUFFER_POOL: "deque[bytearray]" = deque()
+_BUFFER_POOL_LOCK = threading.Lock()
+_BUFFER_POOL_MAX = 64
+
+
+@contextmanager
+def borrow_buffer() -> Iterator[memoryview]:
+    """Lend a _CHUNK_SIZE buffer from the pool, returning it afterwards"""
+    with _BUFFER_POOL_LOCK:
+        buffer = _BUFFER_POOL.pop() if _BUFFER_POOL else None
+    if buffer is None:
+        buffer = bytearray(_CHUNK_SIZE)
+    
+    view = memoryview(buffer)
+    try:
+        yield view
+    finally:
+        view.release()
+        with _BUFFER_POOL_LOCK:
+            if len(_BUFFER_POOL) < _BUFFER_POOL_MAX:
+                _BUFFER_POOL.append(buffer)
+
+
+def _file_extension(filename: str) -> str:
+    """Extension of the last path component, like PurePath.suffix without the parsing"""
+    name = filename[filename.rfind('/') + 1:]
+    dot = name.rfind('.')
+    return name[dot:] if 0 < dot < len(name) - 1 else ''
+
+
+# Extension -> MIME type, built once instead of consulting mimetypes per call
+mimetypes.init()
+_MIME_TYPES = {ext.lower(): mime for ext, mime in mimetypes.types_map.items()}
+
+
+def _guess_content_type(filename: str) -> Optional[str]:
+    """MIME type for a filename's extension, or None when unknown"""
+    return _MIME_TYPES.get(_file_extension(filename).lower())
+
+
+def _read_file(path: str) -> bytes:
+    """Read a whole file with a single unbuffered handle"""
+    with open(path, 'rb', buffering=0) as f:
+        return f.readall()
+
 
 class StorageServiceError(Exception):
     """Custom exception for storage service errors"""
     pass
 
 
+class _ChunkReader(io.RawIOBase):
+    """Seekable read-only stream over a list of byte chunks, without joining them"""
+    
+    def __init__(self, chunks: List[bytes]):
+        self._chunks = [memoryview(chunk) for chunk in chunks if chunk]
+        self._size = sum(len(chunk) for chunk in self._chunks)
+        self._pos = 0
+        self._index = 0
+        self._offset = 0
+    
+    def readable(self) -> bool:
+        return True
+    
+    def seekable(self) -> bool:
+        return True
+    
+    def tell(self) -> int:
+        return self._pos
+    
+    def seek(self, pos: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            pos += self._pos
+        elif whence == io.SEEK_END:
+            pos += self._size
+        if pos < 0:
+            raise ValueError(f"negative seek position {pos}")
+        
+        self._pos = pos
+        self._index = 0
+        self._offset = pos
+        while self._index < len(self._chunks) and self._offset >= len(self._chunks[self._index]):
+            self._offset -= len(self._chunks[self._index])
+            self._index += 1
+        return pos
+    
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(view) and self._index < len(self._chunks):
+            chunk = self._chunks[self._index]
+            n = min(len(chunk) - self._offset, len(view) - written)
+            view[written:written + n] = chunk[self._offset:self._offset + n]
+            written += n
+            self._offset += n
+            if self._offset == len(chunk):
+                self._index += 1
+                self._offset = 0
+        self._pos += written
+        return written
+
+
 class StorageService:
     """
     Unified storage service supporting multiple backends:
@@ -39,6 +218,41 @@ class StorageService:
         self.config = config or {}
         self.storage_type = self.config.get('STORAGE_TYPE', 'local').lower()
         
+        # Uploads share content-addressed objects; references are counted in Redis
+        self._release_ref_script = redis_service.register_script(_RELEASE_REF_LUA)
+        self._unlock_script = redis_service.register_script(_UNLOCK_LUA)
+        self._extend_locks_script = redis_service.register_script(_EXTEND_LOCKS_LUA)
+        self.key_lock_ttl = 30  # seconds a reference lock outlives a holder that stops refreshing it
+        
+        # Short-lived S3/R2 HEAD results; concurrent misses for one key share a request
+        self._file_info_cache = TTLCache(10_000, 60)
+        self._inflight_file_info: Dict[str, asyncio.Future] = {}
+        
+        # Recent S3/R2 404s; kept briefly so new uploads from elsewhere show up quickly
+        self._missing_keys = TTLCache(10_000, 5)
+        
+        # Presigned GET URLs keyed by signing window; stale windows age out of the LRU
+        self._presign_cache = LRUCache(10_000)
+        
+        self.max_parallel_uploads = int(self.config.get('MAX_PARALLEL_UPLOADS') or 16)
+        
+        # Content hash for dedup keys; BLAKE3 is much faster where SHA-256 lacks CPU support
+        self.hash_alg = (self.config.get('HASH_ALG') or 'sha256').lower()
+        if self.hash_alg == 'blake3':
+            if blake3 is None:
+                raise StorageServiceError(
+                    "blake3 is required for HASH_ALG=blake3. Install with: pip install blake3"
+                )
+            self._hash_label = 'b3:'
+        elif self.hash_alg == 'sha256':
+            self._hash_label = ''
+        else:
+            raise StorageServiceError(f"Unsupported hash algorithm: {self.hash_alg}")
+        
+        # Pooled client for upload_from_url; workers close it with their task loop
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        
         if self.storage_type == 'local':
             self._init_local_storage()
         elif self.storage_type == 's3':
@@ -50,6 +264,27 @@ class StorageService:
         
         logger.info(f"Storage service initialized with backend: {self.storage_type}")
     
+    def _http(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it for the running event loop"""
+        loop = asyncio.get_running_loop()
+        if self._http_client is None or self._client_loop is not loop:
+            if self._http_client is not None:
+                logger.warning("Storage HTTP client from a finished event loop was never closed")
+            self._http_client = httpx.AsyncClient(
+                timeout=60,
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+            )
+            self._client_loop = loop
+        return self._http_client
+    
+    async def close(self) -> None:
+        """Release pooled HTTP connections"""
+        client, self._http_client = self._http_client, None
+        self._client_loop = None
+        if client is not None:
+            await client.aclose()
+    
     def _init_local_storage(self):
         """Initialize local filesystem storage"""
         self.upload_dir = Path(self.config.get('UPLOAD_DIR', './uploads'))
@@ -60,12 +295,17 @@ class StorageService:
         (self.upload_dir / 'user_assets').mkdir(exist_ok=True)
         (self.upload_dir / 'temp').mkdir(exist_ok=True)
         
+        # Plain string paths for the per-request hot paths
+        self._upload_dir_str = str(self.upload_dir)
+        self._temp_dir_str = os.path.join(self._upload_dir_str, 'temp')
+        
         logger.info(f"Local storage initialized at: {self.upload_dir}")
     
     def _init_s3_storage(self):
         """Initialize AWS S3 storage"""
         try:
             import boto3
+            from boto3.s3.transfer import TransferConfig
             from botocore.config import Config
         except ImportError:
             raise StorageServiceError(
@@ -90,9 +330,16 @@ class StorageService:
             region_name=aws_region,
             config=Config(
                 signature_version='s3v4',
-                retries={'max_attempts': 3, 'mode': 'adaptive'}
+                retries={'max_attempts': 3, 'mode': 'adaptive'},
+                max_pool_connections=32
             )
         )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=_MULTIPART_CHUNK_SIZE,
+            max_concurrency=8,
+            use_threads=True
+        )
         
         try:
             self.s3_client.head_bucket(Bucket=self.s3_bucket)
@@ -104,6 +351,7 @@ class StorageService:
         """Initialize Cloudflare R2 storage"""
         try:
             import boto3
+            from boto3.s3.transfer import TransferConfig
             from botocore.config import Config
         except ImportError:
             raise StorageServiceError(
@@ -132,9 +380,16 @@ class StorageService:
             region_name='auto',
             config=Config(
                 signature_version='s3v4',
-                retries={'max_attempts': 3, 'mode': 'adaptive'}
+                retries={'max_attempts': 3, 'mode': 'adaptive'},
+                max_pool_connections=32
             )
         )
+        self._transfer_config = TransferConfig(
+            multipart_threshold=_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=_MULTIPART_CHUNK_SIZE,
+            max_concurrency=8,
+            use_threads=True
+        )
         
         try:
             self.s3_client.head_bucket(Bucket=self.r2_bucket)
@@ -144,7 +399,7 @@ class StorageService:
     
     async def upload_file(
         self,
-        file_data: Union[bytes, BinaryIO],
+        file_data: FileSource,
         filename: str,
         folder: str = 'uploads',
         content_type: Optional[str] = None,
@@ -153,6 +408,10 @@ class StorageService:
         """
         Upload a file to storage
         
+        Files are stored under a key derived from their content hash, so uploading
+        bytes that already exist returns the stored object without writing it again.
+        Each upload holds a reference on the shared object until it is deleted.
+        
         Args:
             file_data: File data as bytes or file-like object
             filename: Original filename
@@ -164,37 +423,32 @@ class StorageService:
             Dict containing file info (url, key, size, etc.)
         """
         try:
-            file_ext = Path(filename).suffix
-            unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-            file_key = f"{folder}/{unique_filename}"
-            
-            if isinstance(file_data, bytes):
-                data = file_data
-            else:
-                data = file_data.read()
-            
+            file_ext = _file_extension(filename)
             if not content_type:
-                content_type = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
-            
-            file_hash = hashlib.sha256(data).hexdigest()
-            file_size = len(data)
+                content_type = _guess_content_type(filename) or 'application/octet-stream'
             
             if self.storage_type == 'local':
-                result = await self._upload_local(file_key, data, content_type, metadata)
+                result = await self._upload_local(folder, file_ext, file_data, content_type, metadata)
             elif self.storage_type in ['s3', 'cloudflare_r2']:
-                result = await self._upload_s3(file_key, data, content_type, metadata)
+                result = await self._upload_s3(folder, file_ext, file_data, content_type, metadata)
             else:
                 raise StorageServiceError(f"Unsupported storage type: {self.storage_type}")
             
+            file_key = result['key']
+            if not result['deduplicated']:
+                self._file_info_cache.pop(file_key)
+            self._missing_keys.pop(file_key)
+            
             return {
                 'success': True,
                 'key': file_key,
-                'url': result['url'],
-                'filename': unique_filename,
+                'url': self._public_url(file_key),
+                'filename': file_key.rsplit('/', 1)[-1],
                 'original_filename': filename,
-                'size': file_size,
+                'size': result['size'],
                 'content_type': content_type,
-                'hash': file_hash,
+                'hash': self._hash_label + result['hash'],
+                'deduplicated': result['deduplicated'],
                 'storage_type': self.storage_type,
                 'uploaded_at': datetime.now(timezone.utc).isoformat()
             }
@@ -203,57 +457,409 @@ class StorageService:
             logger.error(f"File upload failed: {e}")
             raise StorageServiceError(f"Failed to upload file: {str(e)}")
     
+    async def upload_many(self, files: List[Dict[str, Any]]) -> List[Union[Dict[str, Any], Exception]]:
+        """
+        Upload several files concurrently
+        
+        Args:
+            files: upload_file keyword arguments, one dict per file
+            
+        Returns:
+            One upload_file result per file, in order, or the exception it raised
+        """
+        semaphore = asyncio.Semaphore(self.max_parallel_uploads)
+        
+        async def upload_one(file_args: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.upload_file(**file_args)
+        
+        return await asyncio.gather(
+            *(upload_one(file_args) for file_args in files),
+            return_exceptions=True
+        )
+    
+    def _new_hasher(self):
+        """Fresh hash object for the configured HASH_ALG"""
+        if self.hash_alg == 'blake3':
+            return blake3(max_threads=blake3.AUTO)
+        return hashlib.sha256()
+    
+    @staticmethod
+    def _content_key(folder: str, file_hash: str, file_ext: str) -> str:
+        """Content-addressed key, fanned out by the first hash bytes"""
+        return f"{folder}/{file_hash[:2]}/{file_hash[2:4]}/{file_hash}{file_ext}"
+    
+    @asynccontextmanager
+    async def _reference_lock(self, file_key: str) -> AsyncIterator[str]:
+        """
+        Hold the Redis lock ordering a key's last-reference delete against new references
+        
+        Yields the token stored in the lock; only a holder with the token can
+        extend or release it.
+        """
+        lock_key = _LOCK_PREFIX + file_key
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.key_lock_ttl
+        while not await redis_service.set_nx(lock_key, token, self.key_lock_ttl):
+            if time.monotonic() >= deadline:
+                raise StorageServiceError(f"Timed out waiting for the reference lock on {file_key}")
+            await asyncio.sleep(0.05)
+        try:
+            yield token
+        finally:
+            await redis_service.run_script(self._unlock_script, keys=[lock_key], args=[dumps(token)])
+    
+    async def _refresh_locks(self, file_keys: List[str], tokens: List[str]) -> None:
+        """Extend held reference locks every third of their TTL until cancelled"""
+        lock_keys = [_LOCK_PREFIX + file_key for file_key in file_keys]
+        args = [self.key_lock_ttl, *(dumps(token) for token in tokens)]
+        while True:
+            await asyncio.sleep(self.key_lock_ttl / 3)
+            extended = await redis_service.run_script(self._extend_locks_script, keys=lock_keys, args=args)
+            if extended is not None and extended < len(lock_keys):
+                logger.warning(f"Lost {len(lock_keys) - extended} reference locks while deleting")
+    
+    async def _reference_key(
+        self,
+        folder: str,
+        file_hash: str,
+        file_ext: str,
+        exists: Callable[[str], Awaitable[bool]]
+    ) -> Tuple[str, bool]:
+        """
+        Take a reference on the content-addressed key for an upload
+        
+        Args:
+            folder: Folder/prefix for the file
+            file_hash: Hex digest of the content
+            file_ext: File extension including the dot
+            exists: Uncached existence check for a key
+            
+        Returns:
+            The key to store under and whether its object is already stored. When
+            references cannot be counted the upload gets a key of its own, so a
+            later delete of the shared object cannot remove it.
+        """
+        file_key = self._content_key(folder, file_hash, file_ext)
+        if not await redis_service.incr(_REFS_PREFIX + file_key):
+            logger.warning(f"Could not reference {file_key}; storing the upload unshared")
+            return f"{folder}/{uuid.uuid4().hex}{file_ext}", False
+        
+        try:
+            # A delete of the last reference finishes before the check below
+            async with self._reference_lock(file_key):
+                return file_key, await exists(file_key)
+        except BaseException:
+            await self._release_reference(file_key)
+            raise
+    
+    async def _release_reference(self, file_key: str) -> Optional[int]:
+        """Drop one reference on a content-addressed key; returns those left, or None on failure"""
+        return await redis_service.run_script(
+            self._release_ref_script, keys=[_REFS_PREFIX + file_key], args=[]
+        )
+    
+    @asynccontextmanager
+    async def _releasing(self, file_keys: List[str]) -> AsyncIterator[List[str]]:
+        """
+        Release one reference per key and yield the keys whose objects can be deleted
+        
+        Content-addressed objects are kept while other uploads reference them.
+        Locks on the rest are held until the caller has deleted them, so a
+        concurrent upload of the same bytes waits and then stores them again.
+        """
+        released = set()
+        for file_key in file_keys:
+            if not _CONTENT_KEY_RE.search(file_key):
+                continue
+            remaining = await self._release_reference(file_key)
+            if remaining is None:
+                logger.warning(f"Keeping {file_key}: its reference could not be released")
+            elif remaining <= 0:
+                released.add(file_key)
+        
+        async with AsyncExitStack() as stack:
+            # Sorted so concurrent bulk deletes take the locks in the same order
+            released = sorted(released)
+            tokens = [await stack.enter_async_context(self._reference_lock(file_key)) for file_key in released]
+            if released:
+                # Bulk deletes can outlast the lock TTL; stop refreshing before the locks are released
+                refresher = asyncio.create_task(self._refresh_locks(released, tokens))
+                stack.callback(refresher.cancel)
+            
+            # An upload may have taken a new reference before the lock was held
+            counts = await redis_service.mget([_REFS_PREFIX + key for key in released])
+            orphaned = {key for key, count in zip(released, counts) if not count}
+            
+            yield [
+                file_key for file_key in file_keys
+                if not _CONTENT_KEY_RE.search(file_key) or file_key in orphaned
+            ]
+    
+    @staticmethod
+    def _copy_stream(source: BinaryIO, out: Optional[BinaryIO], hasher: "hashlib._Hash") -> int:
+        """
+        Hash a stream through reusable buffers, copying it to out if given
+        
+        Once a stream spans more than one buffer, writes move to a helper thread
+        so each chunk is hashed while it is being written and the next one read;
+        hashlib and file I/O both release the GIL on large buffers.
+        """
+        readinto = getattr(source, 'readinto', None)
+        writer = None
+        pending = None
+        size = 0
+        index = 0
+        
+        with borrow_buffer() as first, borrow_buffer() as second:
+            buffers = (first, second)
+            try:
+                while True:
+                    # The previous write from this buffer finished before the last submit
+                    buffer = buffers[index & 1]
+                    if readinto is not None:
+                        n = readinto(buffer)
+                    else:
+                        chunk = source.read(_CHUNK_SIZE)
+                        n = len(chunk)
+                        buffer[:n] = chunk
+                    if not n:
+                        break
+                    view = buffer[:n]
+                    
+                    if out is not None:
+                        if index == 0:
+                            out.write(view)
+                        else:
+                            if writer is None:
+                                writer = ThreadPoolExecutor(max_workers=1)
+                            if pending is not None:
+                                pending.result()
+                            pending = writer.submit(out.write, view)
+                    
+                    hasher.update(view)
+                    size += n
+                    index += 1
+                
+                if pending is not None:
+                    pending.result()
+            finally:
+                if writer is not None:
+                    writer.shutdown(wait=True)
+        
+        return size
+    
+    @staticmethod
+    def _regular_file_fd(source: FileSource) -> Optional[int]:
+        """Descriptor of a source backed by a regular on-disk file, if any"""
+        # Only real file objects; fileno() on a SpooledTemporaryFile forces it to disk
+        if not isinstance(source, (io.FileIO, io.BufferedReader, io.BufferedRandom)):
+            return None
+        try:
+            source.flush()
+            fd = source.fileno()
+        except (OSError, ValueError):
+            return None
+        return fd if stat.S_ISREG(os.fstat(fd).st_mode) else None
+    
+    def _hash_fd(self, fd: int, offset: int, size: int) -> str:
+        """Digest of a byte range of a file, read through mmap without copying"""
+        hasher = self._new_hasher()
+        if size:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped:
+                with memoryview(mapped)[offset:offset + size] as view:
+                    hasher.update(view)
+        return hasher.hexdigest()
+    
+    def _upload_local_from_fd(self, file_path: str, src_fd: int, offset: int, size: int) -> str:
+        """Copy a byte range of an open file to file_path in the kernel, returning its digest"""
+        file_hash = self._hash_fd(src_fd, offset, size)
+        
+        dst_fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            sent = 0
+            while sent < size:
+                n = os.sendfile(dst_fd, src_fd, offset + sent, size - sent)
+                if not n:
+                    raise StorageServiceError("Source file shrank during upload")
+                sent += n
+        finally:
+            os.close(dst_fd)
+        
+        return file_hash
+    
+    def _stream_to_file(self, file_path: str, source: FileSource) -> Tuple[str, int]:
+        """Copy a stream to disk, returning its digest and size"""
+        if isinstance(source, _BYTES_TYPES):
+            with open(file_path, 'wb', buffering=0) as out:
+                out.write(source)
+            hasher = self._new_hasher()
+            hasher.update(source)
+            return hasher.hexdigest(), len(source)
+        
+        src_fd = self._regular_file_fd(source) if _HAS_FILE_SENDFILE else None
+        if src_fd is not None:
+            offset = source.tell()
+            size = max(os.fstat(src_fd).st_size - offset, 0)
+            file_hash = self._upload_local_from_fd(file_path, src_fd, offset, size)
+            source.seek(offset + size)
+            return file_hash, size
+        
+        hasher = self._new_hasher()
+        with open(file_path, 'wb', buffering=0) as out:
+            size = self._copy_stream(source, out, hasher)
+        return hasher.hexdigest(), size
+    
+    def _prehash(self, source: FileSource) -> Tuple[FileSource, str, int]:
+        """
+        Hash a stream ahead of upload and return a readable body positioned at its start
+        
+        In-memory data is hashed in place; seekable sources are rewound and
+        anything else is spooled to a temporary file.
+        """
+        if isinstance(source, _BYTES_TYPES):
+            hasher = self._new_hasher()
+            hasher.update(source)
+            return source, hasher.hexdigest(), len(source)
+        
+        hasher = self._new_hasher()
+        seekable = getattr(source, 'seekable', None)
+        
+        if seekable is not None and seekable():
+            start = source.tell()
+            src_fd = self._regular_file_fd(source)
+            if src_fd is not None:
+                size = max(os.fstat(src_fd).st_size - start, 0)
+                return source, self._hash_fd(src_fd, start, size), size
+            size = self._copy_stream(source, None, hasher)
+            source.seek(start)
+            return source, hasher.hexdigest(), size
+        
+        spool = tempfile.SpooledTemporaryFile(max_size=_MULTIPART_CHUNK_SIZE)
+        size = self._copy_stream(source, spool, hasher)
+        spool.seek(0)
+        return spool, hasher.hexdigest(), size
+    
     async def _upload_local(
         self,
-        file_key: str,
-        data: bytes,
+        folder: str,
+        file_ext: str,
+        source: FileSource,
         content_type: str,
         metadata: Optional[Dict[str, str]]
-    ) -> Dict[str, str]:
+    ) -> Dict[str, Any]:
         """Upload file to local storage"""
-        file_path = self.upload_dir / file_key
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        file_path.write_bytes(data)
-        
-        url = f"/uploads/{file_key}"
+        # Stream into a temp file first; the final key depends on the content hash
+        temp_path = os.path.join(self._temp_dir_str, f"{uuid.uuid4().hex}.part")
+        try:
+            file_hash, size = await asyncio.to_thread(self._stream_to_file, temp_path, source)
+            file_key, deduplicated = await self._reference_key(
+                folder, file_hash, file_ext, self._local_exists
+            )
+            if not deduplicated:
+                try:
+                    await asyncio.to_thread(self._move_into_place, temp_path, file_key)
+                except BaseException:
+                    if _CONTENT_KEY_RE.search(file_key):
+                        await self._release_reference(file_key)
+                    raise
+        finally:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
         
-        return {'url': url}
+        return {'key': file_key, 'hash': file_hash, 'size': size, 'deduplicated': deduplicated}
+    
+    async def _local_exists(self, file_key: str) -> bool:
+        """Whether a key is stored on disk"""
+        return await asyncio.to_thread(os.path.exists, os.path.join(self._upload_dir_str, file_key))
+    
+    def _move_into_place(self, temp_path: str, file_key: str) -> None:
+        """Rename a finished temp file to its key"""
+        file_path = os.path.join(self._upload_dir_str, file_key)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        os.replace(temp_path, file_path)
     
     async def _upload_s3(
         self,
-        file_key: str,
-        data: bytes,
+        folder: str,
+        file_ext: str,
+        source: FileSource,
         content_type: str,
         metadata: Optional[Dict[str, str]]
-    ) -> Dict[str, str]:
+    ) -> Dict[str, Any]:
         """Upload file to S3 or R2"""
-        import asyncio
-        
         bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
         
-        extra_args = {
-            'ContentType': content_type,
-            'ACL': 'public-read'
-        }
-        
-        if metadata:
-            extra_args['Metadata'] = metadata
-        
-        await asyncio.to_thread(
-            self.s3_client.put_object,
-            Bucket=bucket,
-            Key=file_key,
-            Body=data,
-            **extra_args
-        )
+        body, file_hash, size = await asyncio.to_thread(self._prehash, source)
+        shared = False
+        try:
+            if metadata:
+                # Metadata lives on the object, so uploads carrying it are never shared
+                file_key, deduplicated = f"{folder}/{uuid.uuid4().hex}{file_ext}", False
+            else:
+                file_key, deduplicated = await self._reference_key(
+                    folder, file_hash, file_ext, self._s3_object_exists
+                )
+                shared = _CONTENT_KEY_RE.search(file_key) is not None
+            
+            if not deduplicated:
+                extra_args = {
+                    'ContentType': content_type,
+                    'ACL': 'public-read'
+                }
+                
+                if metadata:
+                    extra_args['Metadata'] = metadata
+                
+                if isinstance(body, _BYTES_TYPES) and size < _MULTIPART_CHUNK_SIZE:
+                    # Small in-memory payloads go up in one request without a stream wrapper
+                    await asyncio.to_thread(
+                        self.s3_client.put_object,
+                        Bucket=bucket,
+                        Key=file_key,
+                        Body=body,
+                        **extra_args
+                    )
+                else:
+                    await asyncio.to_thread(
+                        self.s3_client.upload_fileobj,
+                        BytesIO(body) if isinstance(body, _BYTES_TYPES) else body,
+                        bucket,
+                        file_key,
+                        ExtraArgs=extra_args,
+                        Config=self._transfer_config
+                    )
+        except BaseException:
+            if shared and not deduplicated:
+                await self._release_reference(file_key)
+            raise
+        finally:
+            if body is not source:
+                body.close()
         
+        return {'key': file_key, 'hash': file_hash, 'size': size, 'deduplicated': deduplicated}
+    
+    async def _s3_object_exists(self, file_key: str) -> bool:
+        """Uncached HEAD; errors count as missing so the upload writes the object"""
+        try:
+            await self._get_s3_file_info(file_key)
+            return True
+        except Exception as e:
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            if code not in ('404', 'NoSuchKey', 'NotFound'):
+                logger.warning(f"Existence check failed for {file_key}, uploading anyway: {e}")
+            return False
+    
+    def _public_url(self, file_key: str) -> str:
+        """Public URL of an object in the configured backend"""
+        if self.storage_type == 'local':
+            return f"/uploads/{file_key}"
         if self.storage_type == 'cloudflare_r2' and self.r2_public_url:
-            url = f"{self.r2_public_url}/{file_key}"
-        else:
-            url = f"https://{bucket}.s3.amazonaws.com/{file_key}"
-        
-        return {'url': url}
+            return f"{self.r2_public_url}/{file_key}"
+        bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
+        return f"https://{bucket}.s3.amazonaws.com/{file_key}"
     
     async def download_file(self, file_key: str) -> bytes:
         """
@@ -278,17 +884,15 @@ class StorageService:
     
     async def _download_local(self, file_key: str) -> bytes:
         """Download file from local storage"""
-        file_path = self.upload_dir / file_key
+        file_path = os.path.join(self._upload_dir_str, file_key)
         
-        if not file_path.exists():
+        try:
+            return await asyncio.to_thread(_read_file, file_path)
+        except FileNotFoundError:
             raise StorageServiceError(f"File not found: {file_key}")
-        
-        return file_path.read_bytes()
     
     async def _download_s3(self, file_key: str) -> bytes:
         """Download file from S3 or R2"""
-        import asyncio
-        
         bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
         
         response = await asyncio.to_thread(
@@ -303,36 +907,41 @@ class StorageService:
         """
         Delete a file from storage
         
+        Content-addressed objects are only removed with their last reference.
+        
         Args:
             file_key: File key/path in storage
             
         Returns:
             True if successful
         """
+        self._forget(file_key)
         try:
-            if self.storage_type == 'local':
-                return await self._delete_local(file_key)
-            elif self.storage_type in ['s3', 'cloudflare_r2']:
-                return await self._delete_s3(file_key)
-            else:
-                raise StorageServiceError(f"Unsupported storage type: {self.storage_type}")
+            async with self._releasing([file_key]) as deletable:
+                if not deletable:
+                    return True
+                if self.storage_type == 'local':
+                    return await self._delete_local(file_key)
+                elif self.storage_type in ['s3', 'cloudflare_r2']:
+                    return await self._delete_s3(file_key)
+                else:
+                    raise StorageServiceError(f"Unsupported storage type: {self.storage_type}")
         except Exception as e:
             logger.error(f"File deletion failed: {e}")
             raise StorageServiceError(f"Failed to delete file: {str(e)}")
     
     async def _delete_local(self, file_key: str) -> bool:
         """Delete file from local storage"""
-        file_path = self.upload_dir / file_key
+        file_path = os.path.join(self._upload_dir_str, file_key)
         
-        if file_path.exists():
-            file_path.unlink()
+        try:
+            await asyncio.to_thread(os.unlink, file_path)
             return True
-        return False
+        except FileNotFoundError:
+            return False
     
     async def _delete_s3(self, file_key: str) -> bool:
         """Delete file from S3 or R2"""
-        import asyncio
-        
         bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
         
         await asyncio.to_thread(
@@ -343,6 +952,70 @@ class StorageService:
         
         return True
     
+    async def delete_many(self, file_keys: List[str]) -> Dict[str, Any]:
+        """
+        Delete many files from storage in batched requests
+        
+        Content-addressed objects are only removed with their last reference.
+        
+        Args:
+            file_keys: File keys/paths in storage
+            
+        Returns:
+            Dict with the number of deleted files and the keys that failed
+        """
+        for file_key in file_keys:
+            self._forget(file_key)
+        
+        try:
+            async with self._releasing(file_keys) as deletable:
+                if not deletable:
+                    failed = []
+                elif self.storage_type == 'local':
+                    failed = await self._delete_many_local(deletable)
+                elif self.storage_type in ['s3', 'cloudflare_r2']:
+                    failed = await self._delete_many_s3(deletable)
+                else:
+                    raise StorageServiceError(f"Unsupported storage type: {self.storage_type}")
+        except Exception as e:
+            logger.error(f"Bulk file deletion failed: {e}")
+            raise StorageServiceError(f"Failed to delete files: {str(e)}")
+        
+        return {'deleted': len(file_keys) - len(failed), 'failed': failed}
+    
+    async def _delete_many_local(self, file_keys: List[str]) -> List[str]:
+        """Delete files from local storage in one worker thread"""
+        def unlink_all() -> List[str]:
+            failed = []
+            for file_key in file_keys:
+                try:
+                    os.unlink(os.path.join(self._upload_dir_str, file_key))
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    failed.append(file_key)
+            return failed
+        
+        return await asyncio.to_thread(unlink_all)
+    
+    async def _delete_many_s3(self, file_keys: List[str]) -> List[str]:
+        """Delete files from S3 or R2, up to 1000 keys per request"""
+        bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
+        semaphore = asyncio.Semaphore(8)
+        
+        async def delete_batch(batch: List[str]) -> List[str]:
+            async with semaphore:
+                response = await asyncio.to_thread(
+                    self.s3_client.delete_objects,
+                    Bucket=bucket,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+            return [error['Key'] for error in response.get('Errors', [])]
+        
+        batches = [file_keys[i:i + 1000] for i in range(0, len(file_keys), 1000)]
+        results = await asyncio.gather(*(delete_batch(batch) for batch in batches))
+        return [key for failed in results for key in failed]
+    
     async def file_exists(self, file_key: str) -> bool:
         """
         Check if a file exists in storage
@@ -355,20 +1028,21 @@ class StorageService:
         """
         try:
             if self.storage_type == 'local':
-                return (self.upload_dir / file_key).exists()
+                return await asyncio.to_thread(os.path.exists, os.path.join(self._upload_dir_str, file_key))
             elif self.storage_type in ['s3', 'cloudflare_r2']:
-                import asyncio
-                bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
+                from botocore.exceptions import ClientError
                 
+                if file_key in self._missing_keys:
+                    return False
                 try:
-                    await asyncio.to_thread(
-                        self.s3_client.head_object,
-                        Bucket=bucket,
-                        Key=file_key
-                    )
+                    await self._cached_s3_file_info(file_key)
                     return True
-                except:
-                    return False
+                except ClientError as e:
+                    # Only a real 404 is remembered; throttling and 5xx are not cached
+                    if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                        self._missing_keys.set(file_key, True)
+                        return False
+                    raise
             return False
         except Exception as e:
             logger.error(f"File existence check failed: {e}")
@@ -388,7 +1062,7 @@ class StorageService:
             if self.storage_type == 'local':
                 return await self._get_local_file_info(file_key)
             elif self.storage_type in ['s3', 'cloudflare_r2']:
-                return await self._get_s3_file_info(file_key)
+                return dict(await self._cached_s3_file_info(file_key))
             else:
                 raise StorageServiceError(f"Unsupported storage type: {self.storage_type}")
         except Exception as e:
@@ -397,25 +1071,55 @@ class StorageService:
     
     async def _get_local_file_info(self, file_key: str) -> Dict[str, Any]:
         """Get file info from local storage"""
-        file_path = self.upload_dir / file_key
-        
-        if not file_path.exists():
+        try:
+            st = await asyncio.to_thread(os.stat, os.path.join(self._upload_dir_str, file_key))
+        except FileNotFoundError:
             raise StorageServiceError(f"File not found: {file_key}")
         
-        stat = file_path.stat()
-        
         return {
             'key': file_key,
-            'size': stat.st_size,
-            'modified': datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc).isoformat(),
-            'content_type': mimetypes.guess_type(file_path)[0],
+            'size': st.st_size,
+            'modified': datetime.fromtimestamp(st.st_mtime, tz=timezone.utc).isoformat(),
+            'content_type': _guess_content_type(file_key),
             'storage_type': 'local'
         }
     
+    async def _cached_s3_file_info(self, file_key: str) -> Dict[str, Any]:
+        """HEAD an object at most once per TTL window, sharing in-flight requests"""
+        info = self._file_info_cache.get(file_key)
+        if info is not None:
+            return info
+        
+        future = self._inflight_file_info.get(file_key)
+        if future is not None:
+            return await asyncio.shield(future)
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight_file_info[file_key] = future
+        try:
+            info = await self._get_s3_file_info(file_key)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Mark the exception as retrieved in case nobody else is waiting
+                future.exception()
+            raise
+        else:
+            self._file_info_cache.set(file_key, info)
+            future.set_result(info)
+            return info
+        finally:
+            del self._inflight_file_info[file_key]
+    
+    def _forget(self, file_key: str) -> None:
+        """Drop cached state for a key that was just written or deleted"""
+        self._file_info_cache.pop(file_key)
+        self._missing_keys.pop(file_key)
+    
     async def _get_s3_file_info(self, file_key: str) -> Dict[str, Any]:
         """Get file info from S3 or R2"""
-        import asyncio
-        
         bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
         
         response = await asyncio.to_thread(
@@ -429,6 +1133,7 @@ class StorageService:
             'size': response.get('ContentLength'),
             'modified': response.get('LastModified').isoformat() if response.get('LastModified') else None,
             'content_type': response.get('ContentType'),
+            'etag': (response.get('ETag') or '').strip('"') or None,
             'metadata': response.get('Metadata', {}),
             'storage_type': self.storage_type
         }
@@ -454,7 +1159,16 @@ class StorageService:
             return f"/uploads/{file_key}"
         
         elif self.storage_type in ['s3', 'cloudflare_r2']:
-            import asyncio
+            # Reuse a signature within a window of at most half its lifetime, so a
+            # cached URL always has at least half of its expiration left. Uploads
+            # are never cached.
+            cache_key = None
+            if operation != 'put_object':
+                window = max(min(300, expiration // 2), 1)
+                cache_key = (operation, file_key, expiration, int(time.time()) // window)
+                url = self._presign_cache.get(cache_key)
+                if url is not None:
+                    return url
             
             bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
             
@@ -465,11 +1179,262 @@ class StorageService:
                 ExpiresIn=expiration
             )
             
+            if cache_key is not None:
+                self._presign_cache.set(cache_key, url)
             return url
         
         else:
             raise StorageServiceError(f"Presigned URLs not supported for: {self.storage_type}")
     
+    async def create_upload_ticket(
+        self,
+        filename: str,
+        folder: str = 'uploads',
+        content_type: Optional[str] = None,
+        expiration: int = 900
+    ) -> Dict[str, Any]:
+        """
+        Issue a presigned PUT so a client can upload straight to object storage
+        
+        Args:
+            filename: Original filename
+            folder: Folder/prefix for the file
+            content_type: MIME type the client will send
+            expiration: URL expiration time in seconds
+            
+        Returns:
+            Dict with the upload url, the file key and the headers the client must send
+        """
+        if self.storage_type not in ['s3', 'cloudflare_r2']:
+            raise StorageServiceError(f"Direct uploads not supported for: {self.storage_type}")
+        
+        file_key = f"{folder}/{uuid.uuid4().hex}{_file_extension(filename)}"
+        
+        if not content_type:
+            content_type = _guess_content_type(filename) or 'application/octet-stream'
+        
+        return await self._presigned_put(file_key, content_type, expiration)
+    
+    async def _presigned_put(self, file_key: str, content_type: str, expiration: int) -> Dict[str, Any]:
+        """Sign a public-read PUT for file_key"""
+        bucket = self.r2_bucket if self.storage_type == 'cloudflare_r2' else self.s3_bucket
+        
+        url = await asyncio.to_thread(
+            self.s3_client.generate_presigned_url,
+            'put_object',
+            Params={
+                'Bucket': bucket,
+                'Key': file_key,
+                'ContentType': content_type,
+                'ACL': 'public-read'
+            },
+            ExpiresIn=expiration
+        )
+        
+        return {
+            'url': url,
+            'method': 'PUT',
+            'key': file_key,
+            'headers': {
+                'Content-Type': content_type,
+                'x-amz-acl': 'public-read'
+            },
+            'expires_in': expiration
+        }
+    
+    async def confirm_upload(self, file_key: str) -> Dict[str, Any]:
+        """
+        Confirm that a direct upload landed in storage
+        
+        Args:
+            file_key: Key returned by create_upload_ticket
+            
+        Returns:
+            Dict containing file metadata (size, content type, etag, ...)
+        """
+        info = await self.get_file_info(file_key)
+        info['url'] = self._public_url(file_key)
+        return info
+    
+    async def begin_upload_session(
+        self,
+        filenames: List[str],
+        folder: str = 'uploads',
+        user_id: Optional[str] = None,
+        expiration: int = 900
+    ) -> Dict[str, Any]:
+        """
+        Start a multi-file direct upload, recorded in the database before any URL is issued
+        
+        Args:
+            filenames: Original filenames, one presigned PUT is issued per file
+            folder: Folder/prefix for the files
+            user_id: Owner of the session
+            expiration: URL expiration time in seconds
+            
+        Returns:
+            Dict with the session id and one upload ticket per file
+        """
+        if self.storage_type not in ['s3', 'cloudflare_r2']:
+            raise StorageServiceError(f"Direct uploads not supported for: {self.storage_type}")
+        
+        from app.core.database import get_db_session
+        from app.models.asset import UploadSession
+        
+        session_id = str(uuid.uuid4())
+        file_keys = [
+            f"{folder}/sessions/{session_id}/{uuid.uuid4().hex}{_file_extension(filename)}"
+            for filename in filenames
+        ]
+        
+        # Persist the keys first so a crash after signing still leaves them cleanable
+        async with get_db_session() as db:
+            db.add(UploadSession(
+                id=session_id,
+                user_id=user_id,
+                state='pending',
+                file_keys=json.dumps(file_keys),
+                expires_at=datetime.now(timezone.utc) + timedelta(seconds=expiration)
+            ))
+            await db.commit()
+        
+        uploads = await asyncio.gather(*(
+            self._presigned_put(
+                file_key,
+                _guess_content_type(filename) or 'application/octet-stream',
+                expiration
+            )
+            for filename, file_key in zip(filenames, file_keys)
+        ))
+        for filename, upload in zip(filenames, uploads):
+            upload['filename'] = filename
+        
+        return {'session_id': session_id, 'state': 'pending', 'uploads': uploads}
+    
+    async def _transition_session(self, session_id: str, from_state: str, to_state: str) -> List[str]:
+        """Atomically move a session between states, returning its file keys"""
+        from sqlalchemy import select, update
+        from app.core.database import get_db_session
+        from app.models.asset import UploadSession
+        
+        async with get_db_session() as db:
+            result = await db.execute(
+                update(UploadSession)
+                .where(UploadSession.id == session_id, UploadSession.state == from_state)
+                .values(state=to_state)
+            )
+            if result.rowcount == 0:
+                state = await db.scalar(select(UploadSession.state).where(UploadSession.id == session_id))
+                if state is None:
+                    raise StorageServiceError(f"Upload session not found: {session_id}")
+                raise StorageServiceError(f"Upload session {session_id} is {state}, not {from_state}")
+            
+            file_keys = await db.scalar(select(UploadSession.file_keys).where(UploadSession.id == session_id))
+            await db.commit()
+        
+        return json.loads(file_keys)
+    
+    async def commit_session(self, session_id: str) -> Dict[str, Any]:
+        """
+        Commit an upload session once every file has landed in storage
+        
+        Args:
+            session_id: Id returned by begin_upload_session
+            
+        Returns:
+            Dict with the session state and metadata for each file
+        """
+        from sqlalchemy import select
+        from app.core.database import get_db_session
+        from app.models.asset import UploadSession
+        
+        async with get_db_session() as db:
+            file_keys = await db.scalar(select(UploadSession.file_keys).where(UploadSession.id == session_id))
+        if file_keys is None:
+            raise StorageServiceError(f"Upload session not found: {session_id}")
+        
+        # Raises if any file is missing, leaving the session pending for a retry
+        files = await asyncio.gather(*(self.confirm_upload(key) for key in json.loads(file_keys)))
+        
+        await self._transition_session(session_id, 'pending', 'committed')
+        return {'session_id': session_id, 'state': 'committed', 'files': files}
+    
+    async def abort_session(self, session_id: str) -> Dict[str, Any]:
+        """
+        Abort an upload session and delete whatever was uploaded for it
+        
+        Args:
+            session_id: Id returned by begin_upload_session
+            
+        Returns:
+            Dict with the session state and the bulk delete result
+        """
+        file_keys = await self._transition_session(session_id, 'pending', 'aborted')
+        deleted = await self.delete_many(file_keys)
+        return {'session_id': session_id, 'state': 'aborted', **deleted}
+    
+    async def abort_expired_sessions(self) -> int:
+        """Abort pending sessions whose upload URLs have expired, returning the files deleted"""
+        from sqlalchemy import select
+        from app.core.database import get_db_session
+        from app.models.asset import UploadSession
+        
+        async with get_db_session() as db:
+            session_ids = (await db.scalars(
+                select(UploadSession.id).where(
+                    UploadSession.state == 'pending',
+                    UploadSession.expires_at < datetime.now(timezone.utc)
+                )
+            )).all()
+        
+        deleted = 0
+        for session_id in session_ids:
+            try:
+                result = await self.abort_session(session_id)
+                deleted += result['deleted']
+            except StorageServiceError as e:
+                logger.warning(f"Failed to abort upload session {session_id}: {e}")
+        
+        return deleted
+    
+    async def _download_ranges(self, url: str, size: int, body: BinaryIO) -> None:
+        """Fetch a body as concurrent byte ranges, writing each at its offset in body"""
+        fd = body.fileno()
+        await asyncio.to_thread(os.ftruncate, fd, size)
+        
+        loop = asyncio.get_running_loop()
+        writer = ThreadPoolExecutor(max_workers=_RANGE_CONCURRENCY)
+        semaphore = asyncio.Semaphore(_RANGE_CONCURRENCY)
+        
+        async def fetch_range(start: int, end: int) -> None:
+            async with semaphore:
+                headers = {'Range': f"bytes={start}-{end}"}
+                async with self._http().stream('GET', url, headers=headers) as response:
+                    if response.status_code != 206:
+                        raise StorageServiceError(
+                            f"Range request not honoured: HTTP {response.status_code}"
+                        )
+                    offset = start
+                    async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                        await loop.run_in_executor(writer, os.pwrite, fd, chunk, offset)
+                        offset += len(chunk)
+            if offset != end + 1:
+                raise StorageServiceError(f"Short range response for bytes {start}-{end}")
+        
+        try:
+            async with asyncio.TaskGroup() as group:
+                for start in range(0, size, _MULTIPART_CHUNK_SIZE):
+                    end = min(start + _MULTIPART_CHUNK_SIZE, size) - 1
+                    group.create_task(fetch_range(start, end))
+        except BaseExceptionGroup as eg:
+            raise eg.exceptions[0]
+        finally:
+            # A cancelled range may still have a write in flight; finish it before
+            # the caller closes the file
+            writer.shutdown(wait=True, cancel_futures=True)
+        
+        body.seek(0)
+    
     async def upload_from_url(
         self,
         url: str,
@@ -487,19 +1452,36 @@ class StorageService:
         Returns:
             Dict containing file info
         """
+        body = None
+        ranged_size = 0
         try:
-            async with httpx.AsyncClient(timeout=60) as client:
-                response = await client.get(url)
+            async with self._http().stream('GET', url) as response:
                 response.raise_for_status()
-                
-                file_data = response.content
                 content_type = response.headers.get('content-type')
+                content_length = int(response.headers.get('content-length') or 0)
                 
-                if not filename:
-                    filename = url.split('/')[-1].split('?')[0] or f"{uuid.uuid4().hex}.jpg"
+                if content_length > _LARGE_DOWNLOAD_SIZE:
+                    # Stage large bodies on disk; local storage then copies them in the kernel
+                    body = tempfile.TemporaryFile()
+                    if response.headers.get('accept-ranges') == 'bytes':
+                        # Drop this GET unread and fetch the body as parallel ranges below
+                        ranged_size = content_length
+                    else:
+                        async for chunk in response.aiter_bytes(_CHUNK_SIZE):
+                            await asyncio.to_thread(body.write, chunk)
+                        body.seek(0)
+                else:
+                    # Keep the body as received instead of joining it into one bytes object
+                    body = _ChunkReader([chunk async for chunk in response.aiter_bytes(65536)])
+            
+            if ranged_size:
+                await self._download_ranges(url, ranged_size, body)
+            
+            if not filename:
+                filename = url.split('/')[-1].split('?')[0] or f"{uuid.uuid4().hex}.jpg"
             
             return await self.upload_file(
-                file_data=file_data,
+                file_data=body,
                 filename=filename,
                 folder=folder,
                 content_type=content_type
@@ -508,6 +1490,9 @@ class StorageService:
         except Exception as e:
             logger.error(f"Failed to upload from URL: {e}")
             raise StorageServiceError(f"Failed to upload from URL: {str(e)}")
+        finally:
+            if body is not None:
+                body.close()
 
 
 def get_storage_service(config: Optional[Dict[str, Any]] = None) -> StorageService:
@@ -526,6 +1511,8 @@ def get_storage_service(config: Optional[Dict[str, Any]] = None) -> StorageServi
             'R2_SECRET_ACCESS_KEY': os.getenv('R2_SECRET_ACCESS_KEY'),
             'R2_BUCKET_NAME': os.getenv('R2_BUCKET_NAME'),
             'R2_PUBLIC_URL': os.getenv('R2_PUBLIC_URL'),
+            'MAX_PARALLEL_UPLOADS': os.getenv('MAX_PARALLEL_UPLOADS'),
+            'HASH_ALG': os.getenv('HASH_ALG'),
         }
     
     return StorageService(config)
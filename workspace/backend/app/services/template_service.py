@@ -4,23 +4,223 @@ Handles template upload, AI analysis, vector search, and CRUD operations
 """
 import asyncio
 import hashlib
-import json
+import heapq
+import itertools
 import os
+import time
+from dataclasses import asdict, dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional, Any, Union, Tuple
+from typing import Dict, List, Optional, Any, Set, Union, Tuple
+from io import BytesIO
+from operator import itemgetter
 from pathlib import Path
-import aiofiles
+import numpy as np
+from celery import group
 from PIL import Image
+from pydantic import TypeAdapter
 import httpx
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.vector_index import SemanticCache, VectorIndex
 from app.services.ai_service import vision_ai_service, embedding_service, AIServiceError
-from app.services.redis_service import redis_service
+from app.services.embedding_service import (
+    EMBEDDING_FORMAT_FLOAT16,
+    EMBEDDING_FORMAT_FLOAT32,
+    EMBEDDING_FORMAT_INT8,
+)
+from app.services.redis_service import redis_service, dumps, loads
 from app.workers.ai_tasks import analyze_template_task
 
+try:
+    from blake3 import blake3
+except ImportError:  # pragma: no cover - optional speedup
+    blake3 = None
+
 import logging
 logger = logging.getLogger(__name__)
 
 
+# Leading magic bytes per extension: alternatives, each a set of (offset, bytes) parts that must all match
+_IMAGE_SIGNATURES = {
+    ".png": (((0, b"\x89PNG\r\n\x1a\n"),),),
+    ".jpg": (((0, b"\xff\xd8\xff"),),),
+    ".jpeg": (((0, b"\xff\xd8\xff"),),),
+    ".gif": (((0, b"GIF87a"),), ((0, b"GIF89a"),)),
+    ".webp": (((0, b"RIFF"), (8, b"WEBP")),),
+}
+
+
+# Popularity weight and metric name for each tracked engagement event
+_POPULARITY_EVENTS = {
+    "viewed": (1, "views"),
+    "downloaded": (2, "downloads"),
+    "liked": (3, "likes"),
+}
+
+# Template record field mirroring each popularity metric's all-time count
+_ENGAGEMENT_COUNT_FIELDS = {"views": "view_count", "downloads": "download_count", "likes": "like_count"}
+
+# Days of daily popularity sets summed for each timeframe; anything else reads the all-time sets
+_POPULARITY_WINDOWS = {"day": 1, "week": 7, "month": 30}
+
+# Keep members in every all-of set (KEYS[1..n]) and, if any-of sets follow, in at least one of them.
+# ARGV: n, limit (0 for no limit), then optional candidates checked in order; without candidates
+# the smallest all-of set (or the union of the any-of sets) is walked instead.
+_MATCH_FILTERS_LUA = """
+local n = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+
+local function matches(member)
+    for i = 1, n do
+        if redis.call('SISMEMBER', KEYS[i], member) == 0 then
+            return false
+        end
+    end
+    if #KEYS == n then
+        return true
+    end
+    for i = n + 1, #KEYS do
+        if redis.call('SISMEMBER', KEYS[i], member) == 1 then
+            return true
+        end
+    end
+    return false
+end
+
+local candidates = {}
+if #ARGV > 2 then
+    for i = 3, #ARGV do
+        candidates[#candidates + 1] = ARGV[i]
+    end
+elseif n > 0 then
+    local base, size = KEYS[1], redis.call('SCARD', KEYS[1])
+    for i = 2, n do
+        local card = redis.call('SCARD', KEYS[i])
+        if card < size then
+            base, size = KEYS[i], card
+        end
+    end
+    candidates = redis.call('SMEMBERS', base)
+else
+    candidates = redis.call('SUNION', unpack(KEYS))
+end
+
+local matched = {}
+for _, member in ipairs(candidates) do
+    if matches(member) then
+        matched[#matched + 1] = member
+        if limit > 0 and #matched >= limit then
+            break
+        end
+    end
+end
+return matched
+"""
+
+
+_similarity_score = itemgetter("similarity_score")
+
+
+def _has_image_signature(header: bytes, file_ext: str) -> bool:
+    """Check leading bytes against the magic numbers for an extension; unknown extensions pass"""
+    signatures = _IMAGE_SIGNATURES.get(file_ext)
+    if signatures is None:
+        return True
+    return any(
+        all(header[offset:offset + len(magic)] == magic for offset, magic in signature)
+        for signature in signatures
+    )
+
+
+def _verify_image(file_content: bytes) -> None:
+    """Fully decode-check an image; CPU-bound, run off the event loop"""
+    with Image.open(BytesIO(file_content)) as image:
+        image.verify()
+
+
+def _content_hash(data: bytes) -> str:
+    """Hash file content for deduplication; BLAKE3 digests are labelled so they never collide with SHA-256 ones"""
+    if blake3 is not None:
+        return "b3:" + blake3(data).hexdigest()
+    return hashlib.sha256(data).hexdigest()
+
+
+def _unit_vector(embedding: Any) -> Optional[np.ndarray]:
+    """Return an embedding as an L2-normalized float32 array, or None if it has no direction"""
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if vector.ndim != 1 or not norm:
+        return None
+    return vector / norm
+
+
+def _pack_unit_vector(vector: np.ndarray, fmt: str = "float32") -> bytes:
+    """
+    Pack a unit-normalized embedding for storage
+    
+    float16 halves and int8 quarters the float32 payload; int8 uses the same
+    layout as the embedding cache (float32 scale followed by int8 values).
+    """
+    if fmt == "float16":
+        return EMBEDDING_FORMAT_FLOAT16 + vector.astype("<f2").tobytes()
+    if fmt == "int8":
+        scale = np.float32(np.abs(vector).max() / 127 or 1.0)
+        quantized = np.clip(np.rint(vector / scale), -127, 127).astype(np.int8)
+        return EMBEDDING_FORMAT_INT8 + scale.astype("<f4").tobytes() + quantized.tobytes()
+    return EMBEDDING_FORMAT_FLOAT32 + vector.astype("<f4").tobytes()
+
+
+def _unpack_unit_embedding(blob: Optional[bytes]) -> Optional[np.ndarray]:
+    """Unpack a stored embedding as unit float32; older JSON list entries are normalized on read"""
+    if not blob:
+        return None
+    fmt = blob[:1]
+    if fmt == EMBEDDING_FORMAT_FLOAT32:
+        return np.frombuffer(blob, dtype="<f4", offset=1)
+    if fmt == EMBEDDING_FORMAT_FLOAT16:
+        return _unit_vector(np.frombuffer(blob, dtype="<f2", offset=1))
+    if fmt == EMBEDDING_FORMAT_INT8:
+        scale = np.frombuffer(blob, dtype="<f4", count=1, offset=1)[0]
+        return _unit_vector(np.frombuffer(blob, dtype=np.int8, offset=5) * scale)
+    try:
+        return _unit_vector(loads(blob))
+    except (TypeError, ValueError):
+        return None
+
+
+@dataclass(slots=True)
+class TemplateRecord:
+    """Template metadata; converted to a dict only when cached or returned"""
+    id: str
+    user_id: str
+    title: str
+    description: str
+    category: str
+    tags: List[str]
+    filename: str
+    file_path: str
+    file_size: int
+    status: str
+    created_at: str
+    updated_at: str
+    analysis_status: str
+    content_hash: Optional[str] = None
+    view_count: int = 0
+    download_count: int = 0
+    like_count: int = 0
+    analysis_task_id: Optional[str] = None
+    analysis_error: Optional[str] = None
+    analysis_source: Optional[str] = None
+    deleted_at: Optional[str] = None
+    deleted_by: Optional[str] = None
+
+# Compiled once; validates cached records and applied updates
+_template_record_validator = TypeAdapter(TemplateRecord)
+
+# Fields owners may change through update_template
+_UPDATABLE_FIELDS = ("title", "description", "category", "tags")
+
+
 class TemplateServiceError(Exception):
     """Custom exception for template service errors"""
     pass
@@ -35,14 +235,49 @@ class TemplateService:
         
         self.max_file_size = settings.MAX_FILE_SIZE
         self.allowed_extensions = settings.ALLOWED_IMAGE_EXTENSIONS
+        # Full verify() walks the whole file; the default checks magic bytes and headers only
+        self.strict_image_validation = False
         
         # AI analysis configuration
         self.similarity_threshold = 0.85
         self.batch_size = 50
+        self.batch_concurrency = 32  # Per-template operations in flight during batch jobs
         self.cache_ttl = 86400  # 24 hours
+        self.embedding_format = settings.TEMPLATE_EMBEDDING_FORMAT  # Storage precision for search vectors
+        
+        # In-process cache of template records in front of Redis; short TTL bounds
+        # staleness from writes in other processes
+        self._template_l1 = TTLCache(maxsize=4096, ttl=60)
         
         # Performance tracking
         self.analytics_enabled = True
+        self.analytics_ttl = 86400 * 30  # 30 days
+        self.popularity_retention = 86400 * 31  # Daily popularity sets outlive the month window
+        self.popularity_rollup_ttl = 60  # Summed timeframe sets are reused for this long
+        self._stats = {"l1_hits": 0, "l1_misses": 0}
+        
+        # Analytics events are batched by a background flusher while the API runs;
+        # without it (e.g. in Celery workers) each event is written directly
+        self.analytics_queue_size = 10000
+        self.analytics_batch_size = 256
+        self.analytics_flush_interval = 0.2  # seconds
+        self._analytics_queue: Optional[asyncio.Queue] = None
+        self._analytics_flusher: Optional[asyncio.Task] = None
+        
+        # In-process ANN index over stored embeddings, rebuilt from Redis periodically
+        # so embeddings written by other processes become searchable
+        self._vector_index = VectorIndex()
+        self._vector_index_loaded_at: Optional[float] = None
+        self.vector_index_refresh = 300  # seconds
+        self.filter_overfetch = 10  # ANN neighbours fetched per result when filters are set
+        self._match_filters_script = redis_service.register_script(_MATCH_FILTERS_LUA)
+        
+        # Recent search results keyed by query embedding, so repeated or
+        # paraphrased queries skip the vector scan. Every template write bumps a
+        # shared generation that is part of the cache scope, so no process keeps
+        # serving results from before a write.
+        self._search_cache = SemanticCache(maxsize=1024, ttl=300, threshold=0.97)
+        self.search_generation_key = "template:search:generation"
         
     async def upload_template(
         self,
@@ -77,38 +312,62 @@ class TemplateService:
             # Validate file
             await self._validate_file(file_content, filename)
             
+            # Look up earlier uploads of the same bytes, keyed by uploader
+            content_hash = _content_hash(file_content)
+            content_key = f"template:bycontent:{content_hash}"
+            owners = await redis_service.hgetall(content_key)
+            own_template, shared_template = await self._find_content_duplicates(owners, user_id)
+            
+            if own_template:
+                # Re-upload by the same user: skip the disk write and analysis entirely
+                logger.info(f"Duplicate upload of {filename}, returning template {own_template['id']}")
+                return {
+                    "template": own_template,
+                    "analysis_task_id": own_template.get("analysis_task_id"),
+                    "message": "Template already uploaded",
+                    "deduplicated": True
+                }
+            
             # Generate unique template ID
             template_id = self._generate_template_id(user_id, filename)
             
             # Save file
             file_path = await self._save_file(file_content, template_id, filename)
             
-            # Create template metadata
-            template_data = {
-                "id": template_id,
-                "user_id": user_id,
-                "title": title,
-                "description": description or "",
-                "category": category or "uncategorized",
-                "tags": tags or [],
-                "filename": filename,
-                "file_path": str(file_path),
-                "file_size": len(file_content),
-                "status": "uploaded",
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-                "analysis_status": "pending" if auto_analyze else "skipped",
-                "view_count": 0,
-                "download_count": 0,
-                "like_count": 0
-            }
+            # Create template metadata; one timestamp serves both fields
+            now_iso = datetime.now(timezone.utc).isoformat()
+            template = TemplateRecord(
+                id=template_id,
+                user_id=user_id,
+                title=title,
+                description=description or "",
+                category=category or "uncategorized",
+                tags=tags or [],
+                filename=filename,
+                file_path=str(file_path),
+                file_size=len(file_content),
+                content_hash=content_hash,
+                status="uploaded",
+                created_at=now_iso,
+                updated_at=now_iso,
+                analysis_status="pending" if auto_analyze else "skipped"
+            )
             
             # Cache template data
-            await self._cache_template_data(template_id, template_data)
+            await self._cache_template_data(template_id, asdict(template))
             
-            # Queue AI analysis if requested
+            # Reuse analysis from another user's copy of the same image when available,
+            # otherwise queue AI analysis if requested
             analysis_task_id = None
-            if auto_analyze:
+            shared_analysis = None
+            if auto_analyze and shared_template:
+                shared_analysis = await self._get_template_analysis(shared_template["id"])
+            
+            if shared_analysis:
+                await redis_service.set(f"template:analysis:{template_id}", shared_analysis, self.cache_ttl)
+                template.analysis_status = "completed"
+                template.analysis_source = shared_template["id"]
+            elif auto_analyze:
                 try:
                     # Get file URL for analysis
                     file_url = f"file://{file_path}"
@@ -117,18 +376,26 @@ class TemplateService:
                     task = analyze_template_task.delay(template_id, file_url)
                     analysis_task_id = task.id
                     
-                    template_data["analysis_task_id"] = analysis_task_id
-                    template_data["analysis_status"] = "processing"
+                    template.analysis_task_id = analysis_task_id
+                    template.analysis_status = "processing"
                     
                     logger.info(f"AI analysis queued for template {template_id}: {analysis_task_id}")
                     
                 except Exception as e:
                     logger.info(f"Failed to queue AI analysis: {e}")
-                    template_data["analysis_status"] = "failed"
-                    template_data["analysis_error"] = str(e)
+                    template.analysis_status = "failed"
+                    template.analysis_error = str(e)
             
             # Update cache with analysis info
+            template_data = asdict(template)
             await self._cache_template_data(template_id, template_data)
+            await self._update_search_indexes(template_id, None, template_data)
+            await (
+                redis_service.pipeline()
+                .hset(content_key, {user_id: template_id})
+                .expire(content_key, self.cache_ttl)
+                .execute()
+            )
             
             # Track upload analytics
             if self.analytics_enabled:
@@ -169,11 +436,17 @@ class TemplateService:
             if analysis_data:
                 template_data["analysis"] = analysis_data
             
+            # Engagement counts come from the popularity sets rather than being
+            # rewritten into the cached record on every view
+            counts = await self._get_engagement_counts(template_id)
+            for field, count in counts.items():
+                # Records from before the popularity sets may hold larger counts
+                template_data[field] = max(template_data.get(field, 0), count)
+            
             # Track view analytics
             if self.analytics_enabled and user_id:
                 await self._track_template_event(template_id, "viewed", user_id)
                 template_data["view_count"] = template_data.get("view_count", 0) + 1
-                await self._cache_template_data(template_id, template_data)
             
             return template_data
             
@@ -209,44 +482,69 @@ class TemplateService:
         try:
             logger.info(f"Starting template search")
             
+            # Embed the query once; it keys the semantic cache and drives vector search
+            if query and not embedding:
+                try:
+                    embedding = await embedding_service.generate_embedding(query)
+                except Exception as e:
+                    logger.info(f"Query embedding failed: {e}")
+            
+            query_vector = _unit_vector(embedding) if embedding else None
+            cache_scope = None
+            if query_vector is not None:
+                generation = await redis_service.get(self.search_generation_key)
+                cache_scope = (
+                    generation, category, tuple(sorted(tags)) if tags else None,
+                    user_id, limit, similarity_threshold
+                )
+                cached = self._search_cache.get(query_vector, cache_scope)
+                if cached is not None:
+                    # Copies, so callers annotating results cannot change later hits
+                    return {
+                        "results": [dict(result) for result in cached["results"]],
+                        "metadata": {**cached["metadata"], "query": query, "cache_hit": True}
+                    }
+            
             results = []
             
+            # Both search paths evaluate the filters server-side against the index sets
+            filter_keys = self._filter_keys(category, tags, user_id)
+            
             # Vector similarity search
-            if query or embedding:
+            if query_vector is not None:
                 vector_results = await self._vector_search(
-                    query, embedding, limit * 2, similarity_threshold
+                    query, embedding, limit * 2, similarity_threshold, filter_keys
                 )
                 results.extend(vector_results)
             
             # Filter-based search
-            filter_results = await self._filter_search(category, tags, user_id, limit * 2)
-            
-            # Combine and deduplicate results
-            combined_results = self._combine_search_results(results, filter_results)
-            
-            # Apply final filters and sorting
-            filtered_results = self._apply_search_filters(
-                combined_results, category, tags, user_id
-            )
+            filter_results = await self._filter_search(filter_keys, limit * 2)
             
-            # Limit results
-            final_results = filtered_results[:limit]
+            # Combine, deduplicate and keep the top results in one pass
+            final_results, total_found = self._rank_results(results, filter_results, limit)
             
             # Enhance results with metadata
             enhanced_results = await self._enhance_search_results(final_results)
             
             search_metadata = {
                 "query": query,
-                "total_found": len(filtered_results),
-                "returned": len(final_results),
+                "total_found": total_found,
+                "returned": len(enhanced_results),
                 "similarity_threshold": similarity_threshold,
                 "search_time": datetime.now(timezone.utc).isoformat()
             }
             
-            return {
+            response = {
                 "results": enhanced_results,
                 "metadata": search_metadata
             }
+            if query_vector is not None:
+                self._search_cache.set(query_vector, cache_scope, {
+                    "results": [dict(result) for result in enhanced_results],
+                    "metadata": search_metadata
+                })
+            
+            return response
             
         except Exception as e:
             logger.info(f"Template search failed: {e}")
@@ -280,16 +578,18 @@ class TemplateService:
             if template_data.get("user_id") != user_id:
                 raise TemplateServiceError("Unauthorized to update this template")
             
-            # Apply updates
-            allowed_fields = ["title", "description", "category", "tags"]
-            for field in allowed_fields:
-                if field in updates:
-                    template_data[field] = updates[field]
-            
-            template_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+            # Apply updates; validating the merged record type-checks the new values
+            changes = {field: updates[field] for field in _UPDATABLE_FIELDS if field in updates}
+            template = _template_record_validator.validate_python({
+                **template_data,
+                **changes,
+                "updated_at": datetime.now(timezone.utc).isoformat()
+            })
+            previous_data, template_data = template_data, asdict(template)
             
             # Update cache
             await self._cache_template_data(template_id, template_data)
+            await self._update_search_indexes(template_id, previous_data, template_data)
             
             # Track update analytics
             if self.analytics_enabled:
@@ -329,10 +629,17 @@ class TemplateService:
             if template_data.get("user_id") != user_id:
                 raise TemplateServiceError("Unauthorized to delete this template")
             
+            # Both delete modes remove the template from search; without its stored
+            # embedding, index rebuilds cannot bring it back
+            await self._update_search_indexes(template_id, template_data, None)
+            await redis_service.delete(f"template:embedding:{template_id}")
+            self._vector_index.remove(template_id)
+            now_iso = datetime.now(timezone.utc).isoformat()
+            
             if soft_delete:
                 # Soft delete - mark as deleted
                 template_data["status"] = "deleted"
-                template_data["deleted_at"] = datetime.now(timezone.utc).isoformat()
+                template_data["deleted_at"] = now_iso
                 template_data["deleted_by"] = user_id
                 
                 await self._cache_template_data(template_id, template_data)
@@ -348,14 +655,16 @@ class TemplateService:
                 if file_path and os.path.exists(file_path):
                     os.remove(file_path)
                 
-                # Remove from cache
+                # Remove from cache and the search index
+                self._template_l1.pop(template_id)
                 await redis_service.delete(f"template:{template_id}")
+                await self._invalidate_search_cache()
                 await redis_service.delete(f"template:analysis:{template_id}")
                 
                 result = {
                     "template_id": template_id,
                     "action": "hard_deleted",
-                    "deleted_at": datetime.now(timezone.utc).isoformat()
+                    "deleted_at": now_iso
                 }
             
             # Track deletion analytics
@@ -368,6 +677,36 @@ class TemplateService:
             logger.info(f"Failed to delete template {template_id}: {e}")
             raise TemplateServiceError(f"Deletion failed: {str(e)}")
     
+    async def backfill_search_indexes(self, batch_size: int = 500) -> int:
+        """
+        Add every cached live template to the secondary index sets
+        
+        Templates written before the index sets existed are only indexed by
+        this; re-running it is harmless.
+        
+        Args:
+            batch_size: Records read per round trip
+            
+        Returns:
+            Number of templates indexed
+        """
+        keys = await redis_service.scan_keys("template:tpl_*")
+        indexed = 0
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            pipe = redis_service.pipeline()
+            for key, template_data in zip(batch, await redis_service.mget(batch)):
+                if not template_data or template_data.get("status") == "deleted":
+                    continue
+                template_id = key.removeprefix("template:")
+                for index_key in self._search_index_keys(template_data):
+                    pipe.sadd(index_key, template_id)
+                indexed += 1
+            await pipe.execute()
+        
+        logger.info(f"Backfilled search indexes for {indexed} templates")
+        return indexed
+    
     async def get_popular_templates(
         self,
         timeframe: str = "week",
@@ -386,29 +725,25 @@ class TemplateService:
             Popular templates with metrics
         """
         try:
-            # Calculate time range
-            now = datetime.now(timezone.utc)
-            if timeframe == "day":
-                start_time = now - timedelta(days=1)
-            elif timeframe == "week":
-                start_time = now - timedelta(weeks=1)
-            elif timeframe == "month":
-                start_time = now - timedelta(days=30)
-            else:  # all
-                start_time = datetime(2020, 1, 1)
-            
-            # Get analytics data (mock implementation)
-            popular_templates = await self._get_popular_templates_from_analytics(
-                start_time, category, limit
-            )
+            # Over-fetch when filtering by category, since rankings are not partitioned by it
+            fetch_limit = limit * 3 if category else limit
+            popular_templates = await self._get_popular_templates_from_analytics(timeframe, fetch_limit)
             
             # Enhance with template data
             enhanced_results = []
-            for template_info in popular_templates:
-                template_data = await self._get_cached_template_data(template_info["template_id"])
-                if template_data and template_data.get("status") != "deleted":
-                    template_data["popularity_metrics"] = template_info["metrics"]
-                    enhanced_results.append(template_data)
+            templates = await self._get_cached_templates(
+                [template_info["template_id"] for template_info in popular_templates]
+            )
+            for template_info, template_data in zip(popular_templates, templates):
+                if not template_data or template_data.get("status") == "deleted":
+                    continue
+                if category and template_data.get("category") != category:
+                    continue
+                template_data["popularity_metrics"] = template_info["metrics"]
+                template_data["popularity_score"] = template_info["popularity_score"]
+                enhanced_results.append(template_data)
+                if len(enhanced_results) == limit:
+                    break
             
             return {
                 "templates": enhanced_results,
@@ -444,69 +779,102 @@ class TemplateService:
             results = []
             
             if operation == "analyze":
-                # Batch AI analysis
-                for template_id in template_ids:
-                    try:
-                        template_data = await self._get_cached_template_data(template_id)
-                        if template_data:
-                            file_path = template_data.get("file_path")
-                            if file_path:
-                                task = analyze_template_task.delay(template_id, f"file://{file_path}")
-                                results.append({
-                                    "template_id": template_id,
-                                    "status": "queued",
-                                    "task_id": task.id
-                                })
-                            else:
-                                results.append({
-                                    "template_id": template_id,
-                                    "status": "failed",
-                                    "error": "No file path found"
-                                })
-                        else:
-                            results.append({
-                                "template_id": template_id,
-                                "status": "failed",
-                                "error": "Template not found"
-                            })
-                    except Exception as e:
+                # Batch AI analysis; template records are fetched in one round trip
+                templates = await self._get_cached_templates(template_ids)
+                queued = []
+                for template_id, template_data in zip(template_ids, templates):
+                    if not template_data:
                         results.append({
                             "template_id": template_id,
                             "status": "failed",
-                            "error": str(e)
+                            "error": "Template not found"
                         })
+                    elif not template_data.get("file_path"):
+                        results.append({
+                            "template_id": template_id,
+                            "status": "failed",
+                            "error": "No file path found"
+                        })
+                    else:
+                        result = {"template_id": template_id, "status": "queued"}
+                        queued.append((result, template_data["file_path"]))
+                        results.append(result)
+                
+                if queued:
+                    # Enqueue every task as one group over a single broker connection;
+                    # publishing is blocking I/O
+                    job = group(
+                        analyze_template_task.s(result["template_id"], f"file://{file_path}")
+                        for result, file_path in queued
+                    )
+                    try:
+                        group_result = await asyncio.to_thread(job.apply_async)
+                        for (result, _), task_result in zip(queued, group_result.results):
+                            result["task_id"] = task_result.id
+                    except Exception as e:
+                        for result, _ in queued:
+                            result["status"] = "failed"
+                            result["error"] = str(e)
             
             elif operation == "reindex":
-                # Batch reindexing for search
-                for template_id in template_ids:
+                # Batch reindexing for search; embeddings are generated concurrently
+                # and written in one pipeline
+                analyses = await redis_service.mget(
+                    [f"template:analysis:{template_id}" for template_id in template_ids]
+                )
+                semaphore = asyncio.Semaphore(self.batch_concurrency)
+                
+                async def embed_one(
+                    template_id: str,
+                    analysis_data: Optional[Dict[str, Any]]
+                ) -> Tuple[Dict[str, Any], Optional[np.ndarray]]:
+                    if not (analysis_data and analysis_data.get("searchable_text")):
+                        return {
+                            "template_id": template_id,
+                            "status": "skipped",
+                            "reason": "No analysis data"
+                        }, None
                     try:
-                        analysis_data = await self._get_template_analysis(template_id)
-                        if analysis_data and analysis_data.get("searchable_text"):
+                        async with semaphore:
                             embedding = await embedding_service.generate_embedding(
                                 analysis_data["searchable_text"]
                             )
-                            # Store embedding (in production, update database)
-                            await redis_service.set(
-                                f"template:embedding:{template_id}",
-                                embedding,
-                                self.cache_ttl
-                            )
-                            results.append({
-                                "template_id": template_id,
-                                "status": "reindexed"
-                            })
-                        else:
-                            results.append({
-                                "template_id": template_id,
-                                "status": "skipped",
-                                "reason": "No analysis data"
-                            })
+                        vector = _unit_vector(embedding)
+                        if vector is None:
+                            raise TemplateServiceError("Embedding has zero magnitude")
+                        return {"template_id": template_id, "status": "reindexed"}, vector
                     except Exception as e:
-                        results.append({
+                        return {
                             "template_id": template_id,
                             "status": "failed",
                             "error": str(e)
-                        })
+                        }, None
+                
+                embedded = await asyncio.gather(*(
+                    embed_one(template_id, analysis_data)
+                    for template_id, analysis_data in zip(template_ids, analyses)
+                ))
+                results = [result for result, _ in embedded]
+                reindexed = [(result, vector) for result, vector in embedded if vector is not None]
+                
+                if reindexed:
+                    # Store the unit-normalized embeddings (in production, update database)
+                    pipe = redis_service.pipeline()
+                    for result, vector in reindexed:
+                        pipe.set_bytes(
+                            f"template:embedding:{result['template_id']}",
+                            _pack_unit_vector(vector, self.embedding_format),
+                            self.cache_ttl
+                        )
+                    if await pipe.execute():
+                        self._vector_index.add_many(
+                            [result["template_id"] for result, _ in reindexed],
+                            np.vstack([vector for _, vector in reindexed])
+                        )
+                    else:
+                        for result, _ in reindexed:
+                            result["status"] = "failed"
+                            result["error"] = "Failed to store embedding"
             
             else:
                 raise TemplateServiceError(f"Unknown batch operation: {operation}")
@@ -528,6 +896,39 @@ class TemplateService:
             logger.info(f"Batch processing failed: {e}")
             raise TemplateServiceError(f"Batch processing failed: {str(e)}")
     
+    def start_analytics_flusher(self) -> None:
+        """Start batching analytics events on the running event loop"""
+        if self._analytics_flusher is not None and not self._analytics_flusher.done():
+            return
+        self._analytics_queue = asyncio.Queue(maxsize=self.analytics_queue_size)
+        self._analytics_flusher = asyncio.create_task(self._run_analytics_flusher())
+    
+    async def stop_analytics_flusher(self) -> None:
+        """Stop the analytics flusher and write any queued events"""
+        if self._analytics_flusher is None:
+            return
+        self._analytics_flusher.cancel()
+        try:
+            await self._analytics_flusher
+        except asyncio.CancelledError:
+            pass
+        self._analytics_flusher = None
+        
+        pending = []
+        while not self._analytics_queue.empty():
+            pending.append(self._analytics_queue.get_nowait())
+        if pending:
+            await self._flush_analytics_events(pending)
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """In-process template cache counters"""
+        lookups = self._stats["l1_hits"] + self._stats["l1_misses"]
+        return {
+            **self._stats,
+            "l1_size": len(self._template_l1),
+            "l1_hit_rate": self._stats["l1_hits"] / lookups if lookups else 0.0
+        }
+    
     # Private helper methods
     
     async def _validate_file(self, file_content: bytes, filename: str) -> None:
@@ -541,17 +942,31 @@ class TemplateService:
         if file_ext not in self.allowed_extensions:
             raise TemplateServiceError(f"Invalid file type: {file_ext} (allowed: {self.allowed_extensions})")
         
-        # Validate image content
+        # Cheap content check: magic bytes, then a header-only parse
+        if not _has_image_signature(file_content[:16], file_ext):
+            raise TemplateServiceError(f"Invalid image file: content does not match {file_ext}")
+        
         try:
-            image = Image.open(BytesIO(file_content))
-            image.verify()
+            with Image.open(BytesIO(file_content)) as image:
+                width, height = image.size
+            if not width or not height:
+                raise ValueError("image has no pixels")
+            if self.strict_image_validation:
+                await asyncio.to_thread(_verify_image, file_content)
         except Exception as e:
             raise TemplateServiceError(f"Invalid image file: {str(e)}")
     
     def _generate_template_id(self, user_id: str, filename: str) -> str:
         """Generate unique template ID"""
         timestamp = datetime.now(timezone.utc).strftime("%Y%m%d_%H%M%S")
-        content_hash = hashlib.md5(f"{user_id}_{filename}_{timestamp}".encode()).hexdigest()[:8]
+        # NUL separators keep field boundaries unambiguous without building a joined string
+        digest = hashlib.blake2b(digest_size=4)
+        digest.update(user_id.encode())
+        digest.update(b"\0")
+        digest.update(filename.encode())
+        digest.update(b"\0")
+        digest.update(timestamp.encode())
+        content_hash = digest.hexdigest()
         return f"tpl_{timestamp}_{content_hash}"
     
     async def _save_file(self, file_content: bytes, template_id: str, filename: str) -> Path:
@@ -559,20 +974,75 @@ class TemplateService:
         file_ext = Path(filename).suffix.lower()
         file_path = self.upload_dir / f"{template_id}{file_ext}"
         
-        async with aiofiles.open(file_path, 'wb') as f:
-            await f.write(file_content)
+        # One thread hop for the whole write rather than one per aiofiles call
+        await asyncio.to_thread(file_path.write_bytes, file_content)
         
         return file_path
     
     async def _cache_template_data(self, template_id: str, template_data: Dict[str, Any]) -> None:
         """Cache template data in Redis"""
         cache_key = f"template:{template_id}"
-        await redis_service.set(cache_key, template_data, self.cache_ttl)
+        self._template_l1.pop(template_id)
+        if await redis_service.set(cache_key, template_data, self.cache_ttl):
+            self._template_l1.set(template_id, dict(template_data))
+        await self._invalidate_search_cache()
+    
+    async def _invalidate_search_cache(self) -> None:
+        """Drop cached search results here and, via the shared generation, in other processes"""
+        self._search_cache.clear()
+        await redis_service.incr(self.search_generation_key)
     
     async def _get_cached_template_data(self, template_id: str) -> Optional[Dict[str, Any]]:
-        """Get template data from cache"""
-        cache_key = f"template:{template_id}"
-        return await redis_service.get(cache_key)
+        """Get template data from the in-process cache, falling back to Redis"""
+        return (await self._get_cached_templates([template_id]))[0]
+    
+    async def _get_cached_templates(self, template_ids: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get data for several templates, fetching in-process cache misses in one round trip"""
+        templates = [self._template_l1.get(template_id) for template_id in template_ids]
+        missing = [index for index, template_data in enumerate(templates) if template_data is None]
+        self._stats["l1_hits"] += len(templates) - len(missing)
+        self._stats["l1_misses"] += len(missing)
+        
+        if missing:
+            fetched = await redis_service.mget([f"template:{template_ids[index]}" for index in missing])
+            for index, template_data in zip(missing, fetched):
+                if template_data is not None:
+                    self._template_l1.set(template_ids[index], template_data)
+                    templates[index] = template_data
+        
+        # Callers annotate the returned dicts, so never hand out the cached objects
+        return [dict(template_data) if template_data is not None else None for template_data in templates]
+    
+    async def _find_content_duplicates(
+        self,
+        owners: Dict[str, str],
+        user_id: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """
+        Resolve earlier uploads of the same content
+        
+        Args:
+            owners: Content index entry mapping uploader ID to template ID
+            user_id: ID of the uploading user
+            
+        Returns:
+            The uploader's own live template and a live template from another user, either possibly None
+        """
+        if not owners:
+            return None, None
+        
+        owner_ids = list(owners)
+        templates = await self._get_cached_templates([owners[owner_id] for owner_id in owner_ids])
+        own_template = None
+        shared_template = None
+        for owner_id, template_data in zip(owner_ids, templates):
+            if not template_data or template_data.get("status") == "deleted":
+                continue
+            if owner_id == user_id:
+                own_template = template_data
+            elif shared_template is None:
+                shared_template = template_data
+        return own_template, shared_template
     
     async def _get_template_analysis(self, template_id: str) -> Optional[Dict[str, Any]]:
         """Get template analysis results"""
@@ -588,19 +1058,91 @@ class TemplateService:
             "timestamp": datetime.now(timezone.utc).isoformat()
         }
         
-        # Store in Redis list (in production, use proper analytics DB)
-        analytics_key = f"analytics:template:{template_id}"
-        await redis_service.lpush(analytics_key, event_data)
-        await redis_service.expire(analytics_key, 86400 * 30)  # 30 days
+        if self._analytics_flusher is not None and not self._analytics_flusher.done():
+            try:
+                self._analytics_queue.put_nowait(event_data)
+                return
+            except asyncio.QueueFull:
+                pass
+        await self._flush_analytics_events([event_data])
+    
+    async def _run_analytics_flusher(self) -> None:
+        """Drain queued analytics events in batches of up to analytics_batch_size"""
+        loop = asyncio.get_running_loop()
+        batch: List[Dict[str, Any]] = []
+        try:
+            while True:
+                batch.append(await self._analytics_queue.get())
+                deadline = loop.time() + self.analytics_flush_interval
+                while len(batch) < self.analytics_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._analytics_queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                try:
+                    await self._flush_analytics_events(batch)
+                except Exception as e:
+                    logger.exception(f"Failed to flush {len(batch)} template analytics events: {e}")
+                batch = []
+        except asyncio.CancelledError:
+            if batch:
+                await self._flush_analytics_events(batch)
+            raise
+    
+    async def _flush_analytics_events(self, events: List[Dict[str, Any]]) -> None:
+        """Write analytics events and popularity increments in one pipeline"""
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for event_data in events:
+            grouped.setdefault(event_data["template_id"], []).append(event_data)
+        
+        # Store in Redis lists (in production, use proper analytics DB)
+        pipe = redis_service.pipeline()
+        for template_id, event_list in grouped.items():
+            analytics_key = f"analytics:template:{template_id}"
+            pipe.lpush(analytics_key, *event_list).expire(analytics_key, self.analytics_ttl)
+        
+        # Engagement events also feed the popularity rankings: a weighted score and a
+        # per-metric count, both daily and all-time
+        for event_data in events:
+            popularity = _POPULARITY_EVENTS.get(event_data["event"])
+            if not popularity:
+                continue
+            weight, metric = popularity
+            template_id = event_data["template_id"]
+            day = event_data["timestamp"][:10].replace("-", "")
+            for key, amount in ((f"popularity:{day}", weight), (f"popularity:{metric}:{day}", 1)):
+                pipe.zincrby(key, amount, template_id).expire(key, self.popularity_retention)
+            pipe.zincrby("popularity:all", weight, template_id)
+            pipe.zincrby(f"popularity:{metric}:all", 1, template_id)
+        
+        await pipe.execute()
+    
+    async def _get_engagement_counts(self, template_id: str) -> Dict[str, int]:
+        """All-time view, download and like counts for a template in one round trip"""
+        pipe = redis_service.pipeline()
+        for metric in _ENGAGEMENT_COUNT_FIELDS:
+            pipe.zmscore(f"popularity:{metric}:all", [template_id])
+        replies = await pipe.execute()
+        if not replies:
+            return {}
+        return {
+            field: int(scores[0] or 0)
+            for field, scores in zip(_ENGAGEMENT_COUNT_FIELDS.values(), replies)
+        }
     
     async def _vector_search(
         self,
         query: Optional[str],
         embedding: Optional[List[float]],
         limit: int,
-        threshold: float
+        threshold: float,
+        filter_keys: Optional[Tuple[List[str], List[str]]] = None
     ) -> List[Dict[str, Any]]:
-        """Perform vector similarity search"""
+        """Perform vector similarity search, optionally restricted by filter index sets"""
         if not query and not embedding:
             return []
         
@@ -609,113 +1151,216 @@ class TemplateService:
             if query and not embedding:
                 embedding = await embedding_service.generate_embedding(query)
             
-            # In production, this would query the database with pgvector
-            # For now, simulate with cached embeddings
-            results = []
+            query_vector = _unit_vector(embedding)
+            if query_vector is None:
+                return []
             
-            # Mock similarity search (replace with actual database query)
-            template_ids = await self._get_all_template_ids()
+            # In production, this would query the database with pgvector
+            await self._ensure_vector_index()
+            if query_vector.shape[0] != self._vector_index.dim:
+                return []
             
-            for template_id in template_ids[:limit]:
-                cached_embedding = await redis_service.get(f"template:embedding:{template_id}")
-                if cached_embedding:
-                    # Calculate cosine similarity (simplified)
-                    similarity = self._calculate_similarity(embedding, cached_embedding)
-                    if similarity >= threshold:
-                        results.append({
-                            "template_id": template_id,
-                            "similarity_score": similarity,
-                            "search_type": "vector"
-                        })
+            if filter_keys is None:
+                matches = self._vector_index.search(query_vector, limit)
+            else:
+                # Over-fetch neighbours and let Redis drop those failing the filters
+                fetch = limit * self.filter_overfetch
+                matches = self._vector_index.search(query_vector, fetch)
+                allowed = set(await self._match_filters(
+                    filter_keys, [template_id for template_id, _ in matches]
+                ))
+                matches = [match for match in matches if match[0] in allowed][:limit]
+                if len(matches) < limit and len(self._vector_index) > fetch:
+                    # Selective filters: score the whole matching set exactly instead
+                    candidate_ids = await self._match_filters(filter_keys)
+                    matches = self._vector_index.search_subset(query_vector, candidate_ids, limit)
+            
+            results = [
+                {
+                    "template_id": template_id,
+                    "similarity_score": similarity,
+                    "search_type": "vector"
+                }
+                for template_id, similarity in matches
+                if similarity >= threshold
+            ]
             
-            # Sort by similarity
-            results.sort(key=lambda x: x["similarity_score"], reverse=True)
+            # Index matches are already ordered by similarity
             return results
             
         except Exception as e:
             logger.info(f"Vector search failed: {e}")
             return []
     
-    async def _filter_search(
+    async def _ensure_vector_index(self) -> None:
+        """Rebuild the in-process index from stored embeddings when it is missing or stale"""
+        now = time.monotonic()
+        if (
+            self._vector_index_loaded_at is not None
+            and now - self._vector_index_loaded_at < self.vector_index_refresh
+        ):
+            return
+        self._vector_index_loaded_at = now
+        
+        keys = await redis_service.scan_keys("template:embedding:*")
+        blobs = await redis_service.mget_bytes(keys)
+        
+        template_ids = []
+        vectors = []
+        for key, blob in zip(keys, blobs):
+            vector = _unpack_unit_embedding(blob)
+            if vector is not None and (not vectors or vector.shape == vectors[0].shape):
+                template_ids.append(key.removeprefix("template:embedding:"))
+                vectors.append(vector)
+        
+        index = VectorIndex()
+        if vectors:
+            index.add_many(template_ids, np.vstack(vectors))
+        self._vector_index = index
+        logger.info(f"Template vector index loaded with {len(vectors)} embeddings")
+    
+    def _filter_keys(
         self,
         category: Optional[str],
         tags: Optional[List[str]],
-        user_id: Optional[str],
+        user_id: Optional[str]
+    ) -> Optional[Tuple[List[str], List[str]]]:
+        """
+        Map search filters to secondary index sets
+        
+        Args:
+            category: Required category
+            tags: Tags of which at least one must match
+            user_id: Required owner
+            
+        Returns:
+            (all-of keys, any-of keys), or None when no filter is set
+        """
+        required = []
+        if category:
+            required.append(f"idx:category:{category}")
+        if user_id:
+            required.append(f"idx:user:{user_id}")
+        any_of = [f"idx:tag:{tag}" for tag in tags or []]
+        if not required and not any_of:
+            return None
+        return required, any_of
+    
+    async def _match_filters(
+        self,
+        filter_keys: Tuple[List[str], List[str]],
+        candidate_ids: Optional[List[str]] = None,
+        limit: int = 0
+    ) -> List[str]:
+        """
+        Evaluate filters inside Redis so only matching IDs come back
+        
+        Args:
+            filter_keys: Index sets from _filter_keys
+            candidate_ids: IDs to check in order; defaults to every indexed template
+            limit: Maximum IDs to return (0 for no limit)
+            
+        Returns:
+            Matching template IDs
+        """
+        if candidate_ids is not None and not candidate_ids:
+            return []
+        required, any_of = filter_keys
+        # Set members are stored encoded, so candidates are encoded the same way
+        args = [len(required), limit, *(dumps(template_id) for template_id in candidate_ids or ())]
+        members = await redis_service.run_script(
+            self._match_filters_script, keys=required + any_of, args=args
+        )
+        return [loads(member) for member in members or ()]
+    
+    async def _filter_search(
+        self,
+        filter_keys: Optional[Tuple[List[str], List[str]]],
         limit: int
     ) -> List[Dict[str, Any]]:
-        """Perform filter-based search"""
+        """Perform filter-based search over the index sets from _filter_keys"""
         results = []
         
-        # Mock filter search (replace with actual database query)
-        template_ids = await self._get_all_template_ids()
+        if filter_keys is None:
+            # No filters: the most engaged templates, in a stable order
+            template_ids = await redis_service.zrevrange("popularity:all", 0, limit - 1)
+        else:
+            template_ids = await self._match_filters(filter_keys, limit=limit)
+        templates = await self._get_cached_templates(template_ids)
         
-        for template_id in template_ids[:limit]:
-            template_data = await self._get_cached_template_data(template_id)
+        for template_id, template_data in zip(template_ids, templates):
             if template_data and template_data.get("status") != "deleted":
-                match = True
-                
-                if category and template_data.get("category") != category:
-                    match = False
-                
-                if tags and not any(tag in template_data.get("tags", []) for tag in tags):
-                    match = False
-                
-                if user_id and template_data.get("user_id") != user_id:
-                    match = False
-                
-                if match:
-                    results.append({
-                        "template_id": template_id,
-                        "similarity_score": 0.5,  # Default score for filter matches
-                        "search_type": "filter"
-                    })
+                results.append({
+                    "template_id": template_id,
+                    "similarity_score": 0.5,  # Default score for filter matches
+                    "search_type": "filter"
+                })
         
         return results
     
-    def _combine_search_results(
+    def _search_index_keys(self, template_data: Dict[str, Any]) -> Set[str]:
+        """Secondary index sets a live template belongs to"""
+        keys = {
+            f"idx:category:{template_data.get('category')}",
+            f"idx:user:{template_data.get('user_id')}"
+        }
+        keys.update(f"idx:tag:{tag}" for tag in template_data.get("tags") or [])
+        return keys
+    
+    async def _update_search_indexes(
         self,
-        vector_results: List[Dict[str, Any]],
-        filter_results: List[Dict[str, Any]]
-    ) -> List[Dict[str, Any]]:
-        """Combine and deduplicate search results"""
-        combined = {}
+        template_id: str,
+        previous_data: Optional[Dict[str, Any]],
+        template_data: Optional[Dict[str, Any]]
+    ) -> None:
+        """Move a template between secondary index sets after a create, update or delete"""
+        previous_keys = self._search_index_keys(previous_data) if previous_data else set()
+        current_keys = set()
+        if template_data and template_data.get("status") != "deleted":
+            current_keys = self._search_index_keys(template_data)
         
-        # Add vector results
-        for result in vector_results:
-            template_id = result["template_id"]
-            combined[template_id] = result
+        pipe = redis_service.pipeline()
+        for key in previous_keys - current_keys:
+            pipe.srem(key, template_id)
+        for key in current_keys - previous_keys:
+            pipe.sadd(key, template_id)
+        await pipe.execute()
+    
+    def _rank_results(
+        self,
+        vector_results: List[Dict[str, Any]],
+        filter_results: List[Dict[str, Any]],
+        limit: int
+    ) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Merge vector and filter results and select the best
         
-        # Add filter results (don't override higher similarity scores)
-        for result in filter_results:
+        Args:
+            vector_results: Results from vector search
+            filter_results: Results from filter search
+            limit: Maximum results to keep
+            
+        Returns:
+            Top results by similarity score, and the number of distinct templates found
+        """
+        combined = {}
+        for result in itertools.chain(vector_results, filter_results):
             template_id = result["template_id"]
-            if template_id not in combined:
+            current = combined.get(template_id)
+            # Keep the higher similarity score; vector results win ties
+            if current is None or result["similarity_score"] > current["similarity_score"]:
                 combined[template_id] = result
-            else:
-                # Keep higher similarity score
-                if result["similarity_score"] > combined[template_id]["similarity_score"]:
-                    combined[template_id] = result
         
-        return list(combined.values())
-    
-    def _apply_search_filters(
-        self,
-        results: List[Dict[str, Any]],
-        category: Optional[str],
-        tags: Optional[List[str]],
-        user_id: Optional[str]
-    ) -> List[Dict[str, Any]]:
-        """Apply additional filters to search results"""
-        # Sort by similarity score
-        results.sort(key=lambda x: x["similarity_score"], reverse=True)
-        return results
+        top = heapq.nlargest(limit, combined.values(), key=_similarity_score)
+        return top, len(combined)
     
     async def _enhance_search_results(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Enhance search results with full template data"""
         enhanced = []
+        templates = await self._get_cached_templates([result["template_id"] for result in results])
         
-        for result in results:
-            template_data = await self._get_cached_template_data(result["template_id"])
-            if template_data:
+        for result, template_data in zip(results, templates):
+            if template_data and template_data.get("status") != "deleted":
                 template_data["similarity_score"] = result["similarity_score"]
                 template_data["search_type"] = result["search_type"]
                 enhanced.append(template_data)
@@ -724,61 +1369,53 @@ class TemplateService:
     
     async def _get_popular_templates_from_analytics(
         self,
-        start_time: datetime,
-        category: Optional[str],
+        timeframe: str,
         limit: int
     ) -> List[Dict[str, Any]]:
-        """Get popular templates from analytics data"""
-        # Mock implementation (replace with actual analytics query)
-        template_ids = await self._get_all_template_ids()
-        
-        popular = []
-        for template_id in template_ids[:limit]:
-            # Mock popularity metrics
-            metrics = {
-                "views": 100 + hash(template_id) % 500,
-                "downloads": 20 + hash(template_id) % 100,
-                "likes": 10 + hash(template_id) % 50
-            }
-            
-            popular.append({
-                "template_id": template_id,
-                "metrics": metrics,
-                "popularity_score": metrics["views"] + metrics["downloads"] * 2 + metrics["likes"] * 3
-            })
+        """Get the top templates by weighted engagement from the popularity sorted sets"""
+        metrics = [metric for _, metric in _POPULARITY_EVENTS.values()]
+        days = _POPULARITY_WINDOWS.get(timeframe)
+        
+        if days is None:
+            score_key = "popularity:all"
+            metric_keys = [f"popularity:{metric}:all" for metric in metrics]
+        else:
+            today = datetime.now(timezone.utc).date()
+            day_keys = [(today - timedelta(days=offset)).strftime("%Y%m%d") for offset in range(days)]
+            score_key = f"popularity:{timeframe}:{day_keys[0]}"
+            metric_keys = [f"popularity:{metric}:{timeframe}:{day_keys[0]}" for metric in metrics]
+            
+            # Sum the daily sets into short-lived rollups shared by concurrent requests
+            if not await redis_service.exists(score_key):
+                pipe = redis_service.pipeline()
+                pipe.zunionstore(score_key, [f"popularity:{day}" for day in day_keys])
+                pipe.expire(score_key, self.popularity_rollup_ttl)
+                for metric, metric_key in zip(metrics, metric_keys):
+                    pipe.zunionstore(metric_key, [f"popularity:{metric}:{day}" for day in day_keys])
+                    pipe.expire(metric_key, self.popularity_rollup_ttl)
+                await pipe.execute()
+        
+        ranked = await redis_service.zrevrange_withscores(score_key, 0, limit - 1)
+        if not ranked:
+            return []
+        
+        template_ids = [template_id for template_id, _ in ranked]
+        pipe = redis_service.pipeline()
+        for metric_key in metric_keys:
+            pipe.zmscore(metric_key, template_ids)
+        metric_scores = await pipe.execute() or [[None] * len(template_ids)] * len(metric_keys)
         
-        # Sort by popularity score
-        popular.sort(key=lambda x: x["popularity_score"], reverse=True)
-        return popular
-    
-    async def _get_all_template_ids(self) -> List[str]:
-        """Get all template IDs (mock implementation)"""
-        # In production, this would query the database
-        # For now, return mock template IDs
         return [
-            "tpl_20241007_120000_abc12345",
-            "tpl_20241007_120001_def67890",
-            "tpl_20241007_120002_ghi11111"
+            {
+                "template_id": template_id,
+                "metrics": {
+                    metric: int(scores[position] or 0)
+                    for metric, scores in zip(metrics, metric_scores)
+                },
+                "popularity_score": score
+            }
+            for position, (template_id, score) in enumerate(ranked)
         ]
-    
-    def _calculate_similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        """Calculate cosine similarity between embeddings"""
-        try:
-            # Simple dot product similarity (replace with proper cosine similarity)
-            if len(embedding1) != len(embedding2):
-                return 0.0
-            
-            dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
-            magnitude1 = sum(a * a for a in embedding1) ** 0.5
-            magnitude2 = sum(b * b for b in embedding2) ** 0.5
-            
-            if magnitude1 == 0 or magnitude2 == 0:
-                return 0.0
-            
-            return dot_product / (magnitude1 * magnitude2)
-            
-        except Exception:
-            return 0.0
 
 # Global template service instance
 template_service = TemplateService()
\ No newline at end of file
@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from typing import Dict, Any
 from celery import current_task
 from app.workers.celery_app import celery_app
+from app.workers.event_loop import close_loop_clients
 from app.services.ai_service import vision_ai_service, AIServiceError
 from app.services.embedding_service import embedding_service
 import logging
@@ -75,6 +76,7 @@ def analyze_template_task(self, template_id: str, image_url: str) -> Dict[str, A
             return result
             
         finally:
+            loop.run_until_complete(close_loop_clients())
             loop.close()
         
     except AIServiceError as e:
@@ -132,6 +134,7 @@ def generate_embedding_task(text: str, cache_key: str = None) -> Dict[str, Any]:
             return result
             
         finally:
+            loop.run_until_complete(close_loop_clients())
             loop.close()
         
     except Exception as e:
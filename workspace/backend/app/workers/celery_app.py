@@ -23,10 +23,12 @@ celery_app.conf.task_routes = {
     'app.workers.template_analysis.analyze_template_task': {'queue': 'analysis'},
     'app.workers.template_analysis.batch_analyze_templates_task': {'queue': 'analysis'},
     'app.workers.template_analysis.monitor_batch_analysis_task': {'queue': 'analysis'},
+    'app.workers.template_analysis.backfill_template_search_indexes_task': {'queue': 'analysis'},
     
     # Generation Pipeline Queue
     'app.workers.generation_pipeline.generate_thumbnail_task': {'queue': 'generation'},
     'app.workers.generation_pipeline.batch_generate_thumbnails_task': {'queue': 'generation'},
+    'app.workers.generation_tasks.resume_pending_midjourney_jobs': {'queue': 'generation'},
     
     # Maintenance and Cleanup Queue
     'app.workers.cleanup_tasks.cleanup_old_generations': {'queue': 'maintenance'},
@@ -138,6 +140,13 @@ celery_app.conf.beat_schedule = {
         'options': {'queue': 'maintenance', 'priority': 4}
     },
     
+    # Resume Midjourney jobs abandoned by a stopped worker every 5 minutes
+    'resume-pending-midjourney-jobs': {
+        'task': 'app.workers.generation_tasks.resume_pending_midjourney_jobs',
+        'schedule': crontab(minute='*/5'),  # Every 5 minutes
+        'options': {'queue': 'generation', 'priority': 7}
+    },
+    
     # System health check every 6 hours
     'system-health-check': {
         'task': 'app.workers.cleanup_tasks.system_health_check',
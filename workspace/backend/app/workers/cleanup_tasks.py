@@ -2,14 +2,15 @@
 Cleanup & Maintenance Tasks for Routix Platform
 Scheduled system housekeeping operations with comprehensive logging
 """
-import asyncio
 import json
 import logging
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional
 from celery.schedules import crontab
 from app.workers.celery_app import celery_app
+from app.workers.event_loop import run_async
 from app.services.redis_service import redis_service
+from app.services.storage_service import storage_service
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -43,23 +44,23 @@ def cleanup_old_generations() -> Dict[str, Any]:
         }
         
         # Step 1: Clean up failed generations older than 7 days
-        failed_cleanup_result = asyncio.run(cleanup_failed_generations())
+        failed_cleanup_result = run_async(cleanup_failed_generations())
         cleanup_stats["failed_generations_deleted"] = failed_cleanup_result["deleted_count"]
         
         # Step 2: Clean up orphaned generation files
-        orphaned_cleanup_result = asyncio.run(cleanup_orphaned_files())
+        orphaned_cleanup_result = run_async(cleanup_orphaned_files())
         cleanup_stats["orphaned_files_cleaned"] = orphaned_cleanup_result["cleaned_count"]
         
         # Step 3: Clear expired cache entries
-        cache_cleanup_result = asyncio.run(cleanup_expired_cache())
+        cache_cleanup_result = run_async(cleanup_expired_cache())
         cleanup_stats["cache_entries_cleared"] = cache_cleanup_result["cleared_count"]
         
         # Step 4: Archive old analytics data
-        analytics_cleanup_result = asyncio.run(archive_old_analytics())
+        analytics_cleanup_result = run_async(archive_old_analytics())
         cleanup_stats["analytics_data_archived"] = analytics_cleanup_result["archived_count"]
         
         # Step 5: Clean up temporary files
-        temp_cleanup_result = asyncio.run(cleanup_temporary_files())
+        temp_cleanup_result = run_async(cleanup_temporary_files())
         cleanup_stats["temp_files_cleaned"] = temp_cleanup_result["cleaned_count"]
         
         # Calculate cleanup duration
@@ -70,7 +71,7 @@ def cleanup_old_generations() -> Dict[str, Any]:
         logger.info(f"Generation cleanup completed successfully: {cleanup_stats}")
         
         # Store cleanup report
-        asyncio.run(store_cleanup_report("generation_cleanup", cleanup_stats))
+        run_async(store_cleanup_report("generation_cleanup", cleanup_stats))
         
         return {
             "status": "completed",
@@ -84,7 +85,7 @@ def cleanup_old_generations() -> Dict[str, Any]:
         cleanup_stats["errors_encountered"] = 1
         
         # Store error report
-        asyncio.run(store_cleanup_report("generation_cleanup", {
+        run_async(store_cleanup_report("generation_cleanup", {
             **cleanup_stats,
             "error": str(e),
             "failed_at": datetime.now(timezone.utc).isoformat()
@@ -117,23 +118,23 @@ def cleanup_expired_tokens() -> Dict[str, Any]:
         }
         
         # Step 1: Remove expired JWT tokens from blacklist
-        blacklist_result = asyncio.run(cleanup_token_blacklist())
+        blacklist_result = run_async(cleanup_token_blacklist())
         token_stats["blacklisted_tokens_cleaned"] = blacklist_result["cleaned_count"]
         
         # Step 2: Purge expired refresh tokens
-        refresh_result = asyncio.run(cleanup_refresh_tokens())
+        refresh_result = run_async(cleanup_refresh_tokens())
         token_stats["refresh_tokens_purged"] = refresh_result["purged_count"]
         
         # Step 3: Clear expired verification tokens
-        verification_result = asyncio.run(cleanup_verification_tokens())
+        verification_result = run_async(cleanup_verification_tokens())
         token_stats["verification_tokens_cleared"] = verification_result["cleared_count"]
         
         # Step 4: Clear expired password reset tokens
-        reset_result = asyncio.run(cleanup_reset_tokens())
+        reset_result = run_async(cleanup_reset_tokens())
         token_stats["reset_tokens_cleared"] = reset_result["cleared_count"]
         
         # Step 5: Clean up session data
-        session_result = asyncio.run(cleanup_expired_sessions())
+        session_result = run_async(cleanup_expired_sessions())
         token_stats["expired_sessions_cleaned"] = session_result["cleaned_count"]
         
         # Calculate cleanup duration
@@ -144,7 +145,7 @@ def cleanup_expired_tokens() -> Dict[str, Any]:
         logger.info(f"Token cleanup completed successfully: {token_stats}")
         
         # Store token cleanup report
-        asyncio.run(store_cleanup_report("token_cleanup", token_stats))
+        run_async(store_cleanup_report("token_cleanup", token_stats))
         
         return {
             "status": "completed",
@@ -157,7 +158,7 @@ def cleanup_expired_tokens() -> Dict[str, Any]:
         logger.error(f"Token cleanup failed: {e}", exc_info=True)
         
         # Store error report
-        asyncio.run(store_cleanup_report("token_cleanup", {
+        run_async(store_cleanup_report("token_cleanup", {
             **token_stats,
             "error": str(e),
             "failed_at": datetime.now(timezone.utc).isoformat()
@@ -190,23 +191,23 @@ def aggregate_daily_analytics() -> Dict[str, Any]:
         }
         
         # Step 1: Aggregate template performance metrics
-        template_result = asyncio.run(aggregate_template_metrics())
+        template_result = run_async(aggregate_template_metrics())
         analytics_stats["template_metrics_aggregated"] = template_result["metrics_count"]
         
         # Step 2: Calculate user activity statistics
-        user_result = asyncio.run(aggregate_user_activity())
+        user_result = run_async(aggregate_user_activity())
         analytics_stats["user_activity_calculated"] = user_result["users_processed"]
         
         # Step 3: Compile generation statistics
-        generation_result = asyncio.run(aggregate_generation_stats())
+        generation_result = run_async(aggregate_generation_stats())
         analytics_stats["generation_stats_compiled"] = generation_result["generations_processed"]
         
         # Step 4: Compute system performance metrics
-        performance_result = asyncio.run(compute_performance_metrics())
+        performance_result = run_async(compute_performance_metrics())
         analytics_stats["performance_metrics_computed"] = performance_result["metrics_computed"]
         
         # Step 5: Generate daily reports
-        report_result = asyncio.run(generate_daily_reports())
+        report_result = run_async(generate_daily_reports())
         analytics_stats["reports_generated"] = report_result["reports_created"]
         
         # Calculate aggregation duration
@@ -217,7 +218,7 @@ def aggregate_daily_analytics() -> Dict[str, Any]:
         logger.info(f"Analytics aggregation completed successfully: {analytics_stats}")
         
         # Store analytics report
-        asyncio.run(store_cleanup_report("analytics_aggregation", analytics_stats))
+        run_async(store_cleanup_report("analytics_aggregation", analytics_stats))
         
         return {
             "status": "completed",
@@ -230,7 +231,7 @@ def aggregate_daily_analytics() -> Dict[str, Any]:
         logger.error(f"Analytics aggregation failed: {e}", exc_info=True)
         
         # Store error report
-        asyncio.run(store_cleanup_report("analytics_aggregation", {
+        run_async(store_cleanup_report("analytics_aggregation", {
             **analytics_stats,
             "error": str(e),
             "failed_at": datetime.now(timezone.utc).isoformat()
@@ -264,23 +265,23 @@ def system_health_check() -> Dict[str, Any]:
         }
         
         # Step 1: Check Redis connectivity and performance
-        redis_health = asyncio.run(check_redis_health())
+        redis_health = run_async(check_redis_health())
         health_results["redis_status"] = redis_health["status"]
         
         # Step 2: Check database connectivity and performance
-        db_health = asyncio.run(check_database_health())
+        db_health = run_async(check_database_health())
         health_results["database_status"] = db_health["status"]
         
         # Step 3: Check storage service health
-        storage_health = asyncio.run(check_storage_health())
+        storage_health = run_async(check_storage_health())
         health_results["storage_status"] = storage_health["status"]
         
         # Step 4: Check AI services availability
-        ai_health = asyncio.run(check_ai_services_health())
+        ai_health = run_async(check_ai_services_health())
         health_results["ai_services_status"] = ai_health["status"]
         
         # Step 5: Check Celery worker health
-        worker_health = asyncio.run(check_worker_health())
+        worker_health = run_async(check_worker_health())
         health_results["worker_status"] = worker_health["status"]
         
         # Determine overall health
@@ -294,7 +295,7 @@ def system_health_check() -> Dict[str, Any]:
         logger.info(f"System health check completed: {health_results}")
         
         # Store health report
-        asyncio.run(store_health_report(health_results))
+        run_async(store_health_report(health_results))
         
         return {
             "status": "completed",
@@ -307,7 +308,7 @@ def system_health_check() -> Dict[str, Any]:
         logger.error(f"System health check failed: {e}", exc_info=True)
         
         # Store error report
-        asyncio.run(store_cleanup_report("health_check", {
+        run_async(store_cleanup_report("health_check", {
             "error": str(e),
             "failed_at": datetime.now(timezone.utc).isoformat()
         }))
@@ -323,12 +324,12 @@ async def cleanup_failed_generations() -> Dict[str, Any]:
         deleted_count = 0
         
         # Get failed generation keys from Redis
-        pattern = "generation:*"
+        pattern = "gen:record:*"
         keys = await redis_service.keys(pattern)
         
         for key in keys:
             try:
-                generation_data = await redis_service.get(key)
+                generation_data = await redis_service.hgetall(key)
                 if generation_data:
                     created_at = datetime.fromisoformat(generation_data.get("created_at", ""))
                     status = generation_data.get("status", "")
@@ -351,10 +352,13 @@ async def cleanup_failed_generations() -> Dict[str, Any]:
 async def cleanup_orphaned_files() -> Dict[str, Any]:
     """Clean up orphaned generation files"""
     try:
-        # Mock implementation - in production, scan storage for orphaned files
+        # Direct uploads that were never committed leave objects behind; their
+        # sessions record the keys, so no storage scan is needed
         cleaned_count = 0
+        if storage_service.storage_type in ('s3', 'cloudflare_r2'):
+            cleaned_count = await storage_service.abort_expired_sessions()
         
-        # This would typically involve:
+        # Generation files orphaned by deleted generations still need a storage scan:
         # 1. List all files in storage
         # 2. Check if corresponding generation exists
         # 3. Delete orphaned files
@@ -0,0 +1,37 @@
+"""
+Event Loop Helpers for Routix Platform Workers
+Runs task coroutines on fresh loops and releases loop-bound clients
+"""
+import asyncio
+import logging
+from typing import Any, Coroutine, TypeVar
+from app.services.embedding_service import embedding_service
+from app.services.midjourney_service import midjourney_service
+from app.services.storage_service import storage_service
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Services whose pooled HTTP clients belong to the loop that created them
+_LOOP_BOUND_SERVICES = (embedding_service, midjourney_service, storage_service)
+
+
+async def close_loop_clients() -> None:
+    """Close pooled HTTP clients while the loop that owns them is still running"""
+    for service in _LOOP_BOUND_SERVICES:
+        try:
+            await service.close()
+        except Exception as e:
+            logger.warning(f"Failed to close {type(service).__name__} HTTP clients: {e}")
+
+
+def run_async(coro: Coroutine[Any, Any, T]) -> T:
+    """asyncio.run for task steps; pooled clients are closed before the loop ends"""
+    async def scoped() -> T:
+        try:
+            return await coro
+        finally:
+            await close_loop_clients()
+
+    return asyncio.run(scoped())
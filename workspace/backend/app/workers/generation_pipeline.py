@@ -10,7 +10,8 @@ from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
 from celery import current_task
 from app.workers.celery_app import celery_app
-from app.services.generation_service import generation_service, GenerationServiceError
+from app.workers.event_loop import run_async
+from app.services.generation_service import generation_service, GenerationServiceError, validate_generation_request
 from app.services.template_service import template_service, TemplateServiceError
 from app.services.ai_service import vision_ai_service, embedding_service, AIServiceError
 from app.services.midjourney_service import midjourney_service, MidjourneyServiceError
@@ -54,58 +55,58 @@ def generate_thumbnail_task(self, request_id: str) -> Dict[str, Any]:
         
         # Step 1: Load generation request (5%)
         logger.info(f"Step 1: Loading generation request {request_id}")
-        request_data = asyncio.run(load_generation_request(request_id))
-        asyncio.run(broadcast_progress(request_id, 5, "validating", "Loading request..."))
+        request_data = run_async(load_generation_request(request_id))
+        run_async(broadcast_progress(request_id, 5, "validating", "Loading request..."))
         
         # Step 2: Analyze user prompt with AI (15%)
         logger.info(f"Step 2: Analyzing user prompt with AI")
-        intent_analysis = asyncio.run(analyze_prompt_intent(request_data))
-        asyncio.run(broadcast_progress(request_id, 15, "analyzing", "Understanding your request..."))
+        intent_analysis = run_async(analyze_prompt_intent(request_data))
+        run_async(broadcast_progress(request_id, 15, "analyzing", "Understanding your request..."))
         
         # Step 3: Search matching templates (30%)
         logger.info(f"Step 3: Searching for matching templates")
-        best_template = asyncio.run(find_matching_template(request_data, intent_analysis))
-        asyncio.run(broadcast_progress(request_id, 30, "matching_templates", "Found perfect match..."))
+        best_template = run_async(find_matching_template(request_data, intent_analysis))
+        run_async(broadcast_progress(request_id, 30, "matching_templates", "Found perfect match..."))
         
         # Step 4: Extract template style DNA (45%)
         logger.info(f"Step 4: Extracting template style DNA")
-        style_data = asyncio.run(extract_style_dna(best_template))
-        asyncio.run(broadcast_progress(request_id, 45, "analyzing_style", "Extracting style DNA..."))
+        style_data = run_async(extract_style_dna(best_template))
+        run_async(broadcast_progress(request_id, 45, "analyzing_style", "Extracting style DNA..."))
         
         # Step 5: Compose Midjourney prompt (55%)
         logger.info(f"Step 5: Composing Midjourney prompt")
-        mj_prompt = asyncio.run(compose_midjourney_prompt(request_data, style_data, intent_analysis))
-        asyncio.run(broadcast_progress(request_id, 55, "generating", "Composing prompt..."))
+        mj_prompt = run_async(compose_midjourney_prompt(request_data, style_data, intent_analysis))
+        run_async(broadcast_progress(request_id, 55, "generating", "Composing prompt..."))
         
         # Step 6: Call Midjourney API (65%)
         logger.info(f"Step 6: Calling Midjourney API")
-        mj_result = asyncio.run(initiate_midjourney_generation(request_data, mj_prompt, style_data))
+        mj_result = run_async(initiate_midjourney_generation(request_data, mj_prompt, style_data))
         task_id = mj_result["task_id"]
         service_used = mj_result["service"]
-        asyncio.run(broadcast_progress(request_id, 65, "generating", "Starting AI generation..."))
+        run_async(broadcast_progress(request_id, 65, "generating", "Starting AI generation..."))
         
         # Step 7: Poll for completion with progress (65-95%)
         logger.info(f"Step 7: Polling Midjourney for completion")
-        generation_result = asyncio.run(poll_midjourney_completion(request_id, task_id, service_used))
+        generation_result = run_async(poll_midjourney_completion(request_id, task_id, service_used))
         
         # Step 8: Download result image (96%)
         logger.info(f"Step 8: Downloading result image")
-        image_data = asyncio.run(download_result_image(generation_result["image_url"]))
-        asyncio.run(broadcast_progress(request_id, 96, "processing", "Downloading result..."))
+        image_data = run_async(download_result_image(generation_result["image_url"]))
+        run_async(broadcast_progress(request_id, 96, "processing", "Downloading result..."))
         
         # Step 9: Upload to storage (98%)
         logger.info(f"Step 9: Uploading to storage")
-        final_url = asyncio.run(upload_to_storage(request_id, image_data))
-        asyncio.run(broadcast_progress(request_id, 98, "processing", "Storing result..."))
+        final_url = run_async(upload_to_storage(request_id, image_data))
+        run_async(broadcast_progress(request_id, 98, "processing", "Storing result..."))
         
         # Step 10: Update database & deduct credits (100%)
         logger.info(f"Step 10: Finalizing generation")
         processing_time = time.time() - start_time
-        final_result = asyncio.run(finalize_generation(
+        final_result = run_async(finalize_generation(
             request_id, request_data, final_url, processing_time, 
             best_template, generation_result
         ))
-        asyncio.run(broadcast_progress(request_id, 100, "completed", "Your thumbnail is ready! 🎉"))
+        run_async(broadcast_progress(request_id, 100, "completed", "Your thumbnail is ready! 🎉"))
         
         logger.info(f"[{datetime.now(timezone.utc)}] Generation pipeline completed successfully: {request_id}")
         
@@ -123,30 +124,30 @@ def generate_thumbnail_task(self, request_id: str) -> Dict[str, Any]:
         # Retry once with 10 second delay
         if self.request.retries < self.max_retries:
             logger.info(f"Retrying generation {request_id} due to timeout")
-            asyncio.run(broadcast_progress(request_id, 50, "retrying", "Retrying generation..."))
+            run_async(broadcast_progress(request_id, 50, "retrying", "Retrying generation..."))
             raise self.retry(countdown=10, exc=e)
         else:
-            asyncio.run(handle_generation_failure(request_id, f"Midjourney timeout: {str(e)}"))
+            run_async(handle_generation_failure(request_id, f"Midjourney timeout: {str(e)}"))
             raise GenerationPipelineError(f"Generation failed after retries: {str(e)}")
             
     except TemplateNotFoundError as e:
         logger.warning(f"Template not found for {request_id}: {e}")
         # Use fallback template
         try:
-            fallback_result = asyncio.run(use_fallback_template(request_id, request_data))
+            fallback_result = run_async(use_fallback_template(request_id, request_data))
             return fallback_result
         except Exception as fallback_error:
-            asyncio.run(handle_generation_failure(request_id, f"Template error: {str(e)}"))
+            run_async(handle_generation_failure(request_id, f"Template error: {str(e)}"))
             raise GenerationPipelineError(f"Template matching failed: {str(e)}")
             
     except CreditInsufficientError as e:
         logger.error(f"Insufficient credits for {request_id}: {e}")
-        asyncio.run(handle_credit_error(request_id, request_data, str(e)))
+        run_async(handle_credit_error(request_id, request_data, str(e)))
         raise GenerationPipelineError(f"Credit error: {str(e)}")
         
     except Exception as e:
         logger.error(f"Generation pipeline failed for {request_id}: {e}", exc_info=True)
-        asyncio.run(handle_generation_failure(request_id, str(e)))
+        run_async(handle_generation_failure(request_id, str(e)))
         raise GenerationPipelineError(f"Pipeline failed: {str(e)}")
 
 # Pipeline Step Functions
@@ -160,10 +161,7 @@ async def load_generation_request(request_id: str) -> Dict[str, Any]:
             raise GenerationPipelineError(f"Generation request not found: {request_id}")
         
         # Validate request data
-        required_fields = ["user_id", "prompt", "credits_cost"]
-        for field in required_fields:
-            if field not in request_data:
-                raise GenerationPipelineError(f"Missing required field: {field}")
+        validate_generation_request(request_data)
         
         return request_data
         
@@ -582,7 +580,7 @@ async def finalize_generation(
         
         # Update cached generation data
         request_data.update(update_data)
-        await generation_service._cache_generation_data(request_id, request_data)
+        await generation_service._save_generation(request_id, request_data, changed=update_data)
         
         # Deduct credits from user
         credits_cost = request_data.get("credits_cost", 1)
@@ -638,6 +636,14 @@ async def broadcast_progress(request_id: str, progress: int, status: str, messag
             300  # 5 minutes TTL
         )
         
+        # Keep the stored generation's progress current; status changes are
+        # saved with the history index on completion or failure
+        await generation_service._patch_generation_fields(
+            request_id,
+            progress=progress,
+            updated_at=progress_data["timestamp"]
+        )
+        
         logger.info(f"Progress broadcast: {request_id} - {progress}% - {message}")
         
     except Exception as e:
@@ -658,7 +664,7 @@ async def handle_generation_failure(request_id: str, error_message: str) -> None
         request_data = await generation_service._get_cached_generation_data(request_id)
         if request_data:
             request_data.update(failure_data)
-            await generation_service._cache_generation_data(request_id, request_data)
+            await generation_service._save_generation(request_id, request_data, changed=failure_data)
             
             # Track failure
             await generation_service._track_generation_event(
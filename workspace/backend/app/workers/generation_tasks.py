@@ -6,6 +6,7 @@ from datetime import datetime, timezone
 from typing import Dict, Any, Optional
 from celery import current_task
 from app.workers.celery_app import celery_app
+from app.workers.event_loop import close_loop_clients, run_async
 from app.services.midjourney_service import midjourney_service, MidjourneyServiceError
 from app.services.ai_service import vision_ai_service, embedding_service
 from app.services.redis_service import redis_service
@@ -114,6 +115,7 @@ def generate_thumbnail_with_midjourney(
             return final_result
             
         finally:
+            loop.run_until_complete(close_loop_clients())
             loop.close()
         
     except MidjourneyServiceError as e:
@@ -197,6 +199,7 @@ def upscale_thumbnail(
             return result
             
         finally:
+            loop.run_until_complete(close_loop_clients())
             loop.close()
         
     except MidjourneyServiceError as e:
@@ -287,3 +290,14 @@ def batch_generate_thumbnails(
     except Exception as e:
         logger.error(f"Batch Midjourney generation failed: {str(e)}")
         raise self.retry(exc=e, countdown=180, max_retries=2)
+
+@celery_app.task(name="app.workers.generation_tasks.resume_pending_midjourney_jobs")
+def resume_pending_midjourney_jobs() -> Dict[str, Any]:
+    """
+    Finish paid Midjourney jobs whose owning process stopped heartbeating
+    """
+    resumed = run_async(midjourney_service.resume_pending())
+    return {
+        'resumed': resumed,
+        'completed_at': datetime.now(timezone.utc).isoformat()
+    }
@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 from typing import Dict, Any, Optional, List
 from celery import current_task
 from app.workers.celery_app import celery_app
+from app.workers.event_loop import run_async
 from app.services.template_service import template_service, TemplateServiceError
 from app.services.ai_service import vision_ai_service, embedding_service, AIServiceError
 from app.services.redis_service import redis_service
@@ -52,42 +53,42 @@ def analyze_template_task(self, template_id: str, image_url: str) -> Dict[str, A
         
         # Step 1: Update status → "analyzing" (10%)
         logger.info(f"Step 1: Updating status to analyzing")
-        asyncio.run(update_template_status(template_id, "analyzing", 10, "Starting analysis..."))
+        run_async(update_template_status(template_id, "analyzing", 10, "Starting analysis..."))
         
         # Step 2: Download image from URL (20%)
         logger.info(f"Step 2: Downloading image from URL")
-        image_data = asyncio.run(download_template_image(template_id, image_url))
-        asyncio.run(broadcast_analysis_progress(template_id, 20, "analyzing", "Image downloaded successfully"))
+        image_data = run_async(download_template_image(template_id, image_url))
+        run_async(broadcast_analysis_progress(template_id, 20, "analyzing", "Image downloaded successfully"))
         
         # Step 3: Call Vision AI Service (Gemini) (30%)
         logger.info(f"Step 3: Calling Vision AI Service")
-        ai_analysis = asyncio.run(analyze_with_vision_ai(template_id, image_url))
-        asyncio.run(broadcast_analysis_progress(template_id, 30, "analyzing", "AI analysis in progress..."))
+        ai_analysis = run_async(analyze_with_vision_ai(template_id, image_url))
+        run_async(broadcast_analysis_progress(template_id, 30, "analyzing", "AI analysis in progress..."))
         
         # Step 4: Parse design DNA response (50%)
         logger.info(f"Step 4: Parsing design DNA response")
-        design_dna = asyncio.run(parse_design_dna(template_id, ai_analysis))
-        asyncio.run(broadcast_analysis_progress(template_id, 50, "analyzing", "Extracting design DNA..."))
+        design_dna = run_async(parse_design_dna(template_id, ai_analysis))
+        run_async(broadcast_analysis_progress(template_id, 50, "analyzing", "Extracting design DNA..."))
         
         # Step 5: Generate embedding vector (70%)
         logger.info(f"Step 5: Generating embedding vector")
-        embedding_data = asyncio.run(generate_template_embedding(template_id, design_dna))
-        asyncio.run(broadcast_analysis_progress(template_id, 70, "analyzing", "Generating embedding vector..."))
+        embedding_data = run_async(generate_template_embedding(template_id, design_dna))
+        run_async(broadcast_analysis_progress(template_id, 70, "analyzing", "Generating embedding vector..."))
         
         # Step 6: Update database with results (90%)
         logger.info(f"Step 6: Updating database with results")
-        await_result = asyncio.run(update_template_analysis_results(
+        await_result = run_async(update_template_analysis_results(
             template_id, design_dna, embedding_data, ai_analysis
         ))
-        asyncio.run(broadcast_analysis_progress(template_id, 90, "analyzing", "Saving analysis results..."))
+        run_async(broadcast_analysis_progress(template_id, 90, "analyzing", "Saving analysis results..."))
         
         # Step 7: Mark as "analyzed" (100%)
         logger.info(f"Step 7: Marking as analyzed")
-        asyncio.run(finalize_template_analysis(template_id, start_time))
+        run_async(finalize_template_analysis(template_id, start_time))
         
         # Step 8: Broadcast completion via Redis
         logger.info(f"Step 8: Broadcasting completion")
-        asyncio.run(broadcast_analysis_progress(template_id, 100, "analyzed", "Analysis completed successfully! 🎉"))
+        run_async(broadcast_analysis_progress(template_id, 100, "analyzed", "Analysis completed successfully! 🎉"))
         
         processing_time = time.time() - start_time
         logger.info(f"[{datetime.now(timezone.utc)}] Template analysis completed: {template_id} in {processing_time:.2f}s")
@@ -107,12 +108,12 @@ def analyze_template_task(self, template_id: str, image_url: str) -> Dict[str, A
         if self.request.retries < self.max_retries:
             retry_countdown = 30 * (2 ** self.request.retries)  # 30s, 60s, 120s
             logger.info(f"Retrying template analysis {template_id} in {retry_countdown}s")
-            asyncio.run(broadcast_analysis_progress(
+            run_async(broadcast_analysis_progress(
                 template_id, 25, "retrying", f"Retrying analysis in {retry_countdown}s..."
             ))
             raise self.retry(countdown=retry_countdown, exc=e)
         else:
-            asyncio.run(handle_analysis_failure(template_id, f"Vision AI timeout: {str(e)}"))
+            run_async(handle_analysis_failure(template_id, f"Vision AI timeout: {str(e)}"))
             raise TemplateAnalysisError(f"Analysis failed after retries: {str(e)}")
             
     except InvalidResponseError as e:
@@ -120,22 +121,22 @@ def analyze_template_task(self, template_id: str, image_url: str) -> Dict[str, A
         # Retry after 30 seconds
         if self.request.retries < self.max_retries:
             logger.info(f"Retrying template analysis {template_id} due to invalid response")
-            asyncio.run(broadcast_analysis_progress(
+            run_async(broadcast_analysis_progress(
                 template_id, 30, "retrying", "Retrying due to invalid response..."
             ))
             raise self.retry(countdown=30, exc=e)
         else:
-            asyncio.run(handle_analysis_failure(template_id, f"Invalid response: {str(e)}"))
+            run_async(handle_analysis_failure(template_id, f"Invalid response: {str(e)}"))
             raise TemplateAnalysisError(f"Invalid response after retries: {str(e)}")
             
     except DatabaseError as e:
         logger.error(f"Database error for {template_id}: {e}")
-        asyncio.run(handle_analysis_failure(template_id, f"Database error: {str(e)}"))
+        run_async(handle_analysis_failure(template_id, f"Database error: {str(e)}"))
         raise TemplateAnalysisError(f"Database error: {str(e)}")
         
     except Exception as e:
         logger.error(f"Template analysis failed for {template_id}: {e}", exc_info=True)
-        asyncio.run(handle_analysis_failure(template_id, str(e)))
+        run_async(handle_analysis_failure(template_id, str(e)))
         raise TemplateAnalysisError(f"Analysis failed: {str(e)}")
 
 @celery_app.task
@@ -155,7 +156,7 @@ def batch_analyze_templates_task(template_ids: List[str]) -> Dict[str, Any]:
         from celery import group
         
         # Get template URLs for analysis
-        template_urls = asyncio.run(get_template_urls_for_batch(template_ids))
+        template_urls = run_async(get_template_urls_for_batch(template_ids))
         
         # Create group of analysis tasks
         job = group(
@@ -169,7 +170,7 @@ def batch_analyze_templates_task(template_ids: List[str]) -> Dict[str, Any]:
         
         # Track batch progress
         batch_id = result.id
-        asyncio.run(track_batch_analysis(batch_id, template_ids))
+        run_async(track_batch_analysis(batch_id, template_ids))
         
         logger.info(f"Batch analysis started: {batch_id} with {len(template_ids)} templates")
         
@@ -190,6 +191,30 @@ def batch_analyze_templates_task(template_ids: List[str]) -> Dict[str, Any]:
             "failed_at": datetime.now(timezone.utc).isoformat()
         }
 
+@celery_app.task
+def backfill_template_search_indexes_task() -> Dict[str, Any]:
+    """
+    One-off backfill of the template search index sets for existing templates
+    
+    Returns:
+        Number of templates indexed
+    """
+    try:
+        indexed = run_async(template_service.backfill_search_indexes())
+        return {
+            "status": "completed",
+            "indexed": indexed,
+            "completed_at": datetime.now(timezone.utc).isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Template search index backfill failed: {e}", exc_info=True)
+        return {
+            "status": "failed",
+            "error": str(e),
+            "failed_at": datetime.now(timezone.utc).isoformat()
+        }
+
 # Pipeline Step Functions
 
 async def update_template_status(template_id: str, status: str, progress: int, message: str) -> None:
@@ -224,6 +224,20 @@ async def test_template(test_session: AsyncSession, test_admin, test_template_da
     return template
 
 
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Point the Redis service at an in-memory server with Lua scripting"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    from app.services.redis_service import redis_service
+
+    server = fakeredis.FakeServer()
+    client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    monkeypatch.setattr(redis_service, "redis_client", client)
+    monkeypatch.setattr(redis_service, "binary_client", fakeredis.FakeRedis(server=server))
+    return client
+
+
 @pytest.fixture
 def auth_headers(test_user):
     """Generate authentication headers for test user"""
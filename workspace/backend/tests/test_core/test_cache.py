@@ -0,0 +1,113 @@
+"""
+In-Process Cache Tests
+"""
+import pytest
+
+from app.core import cache
+from app.core.cache import LRUCache, TTLCache
+
+
+@pytest.mark.unit
+def test_lru_evicts_least_recently_used():
+    """Reading a key protects it from the next eviction"""
+    lru = LRUCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1
+
+    lru.set("c", 3)
+
+    assert "a" in lru
+    assert "b" not in lru
+    assert lru.get("c") == 3
+    assert len(lru) == 2
+
+
+@pytest.mark.unit
+def test_lru_set_refreshes_existing_key():
+    """Overwriting a key updates its value without growing the cache"""
+    lru = LRUCache(2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    lru.set("a", 10)
+    lru.set("c", 3)
+
+    assert lru.get("a") == 10
+    assert "b" not in lru
+
+
+@pytest.mark.unit
+def test_lru_zero_size_stores_nothing():
+    """A cache with maxsize 0 is disabled"""
+    lru = LRUCache(0)
+    lru.set("a", 1)
+
+    assert lru.get("a") is None
+    assert len(lru) == 0
+
+
+@pytest.mark.unit
+def test_lru_pop_and_default():
+    """pop removes entries and both get and pop honour defaults"""
+    lru = LRUCache(4)
+    lru.set("a", 1)
+
+    assert lru.pop("a") == 1
+    assert lru.pop("a", "missing") == "missing"
+    assert lru.get("a", "missing") == "missing"
+
+
+@pytest.mark.unit
+def test_ttl_entries_expire(monkeypatch):
+    """Entries are dropped once their ttl has elapsed"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl = TTLCache(4, ttl=10)
+    ttl.set("a", 1)
+
+    now[0] += 9
+    assert ttl.get("a") == 1
+    assert "a" in ttl
+
+    now[0] += 1
+    assert ttl.get("a") is None
+    assert "a" not in ttl
+    assert len(ttl) == 0
+
+
+@pytest.mark.unit
+def test_ttl_set_renews_expiry(monkeypatch):
+    """Setting a key again restarts its ttl"""
+    now = [1000.0]
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now[0])
+    ttl = TTLCache(4, ttl=10)
+    ttl.set("a", 1)
+    now[0] += 8
+    ttl.set("a", 2)
+    now[0] += 8
+
+    assert ttl.get("a") == 2
+
+
+@pytest.mark.unit
+def test_ttl_caches_falsy_values():
+    """Falsy values are cached and distinguished from missing keys"""
+    ttl = TTLCache(4, ttl=60)
+    ttl.set("a", None)
+    ttl.set("b", 0)
+
+    assert "a" in ttl
+    assert ttl.get("b", "missing") == 0
+    assert ttl.pop("b") == 0
+    assert ttl.pop("b", "missing") == "missing"
+
+
+@pytest.mark.unit
+def test_ttl_respects_maxsize():
+    """TTLCache keeps the LRU bound of its base class"""
+    ttl = TTLCache(2, ttl=60)
+    for key in ("a", "b", "c"):
+        ttl.set(key, key)
+
+    assert "a" not in ttl
+    assert len(ttl) == 2
@@ -0,0 +1,156 @@
+"""
+Vector Index and Semantic Cache Tests
+"""
+import numpy as np
+import pytest
+
+from app.core import vector_index
+from app.core.vector_index import SemanticCache, VectorIndex
+
+
+def _unit(*values: float) -> np.ndarray:
+    vector = np.asarray(values, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@pytest.mark.unit
+def test_search_orders_by_similarity():
+    """Exact search returns the closest vectors first"""
+    index = VectorIndex(exact=True)
+    index.add("x", _unit(1, 0, 0))
+    index.add("xy", _unit(1, 1, 0))
+    index.add("z", _unit(0, 0, 1))
+
+    results = index.search(_unit(1, 0.1, 0), 2)
+
+    assert [key for key, _ in results] == ["x", "xy"]
+    assert results[0][1] == pytest.approx(float(_unit(1, 0.1, 0) @ _unit(1, 0, 0)), abs=1e-6)
+
+
+@pytest.mark.unit
+def test_add_replaces_existing_key():
+    """Re-adding a key moves it instead of duplicating it"""
+    index = VectorIndex(exact=True)
+    index.add("a", _unit(1, 0))
+    index.add("b", _unit(0, 1))
+    index.add("a", _unit(0, 1))
+
+    results = index.search(_unit(0, 1), 5)
+
+    assert len(index) == 2
+    assert sorted(key for key, _ in results) == ["a", "b"]
+
+
+@pytest.mark.unit
+def test_add_many_keeps_last_duplicate():
+    """Within one batch the last vector for a key wins"""
+    index = VectorIndex(exact=True)
+    index.add_many(["a", "a"], np.stack([_unit(1, 0), _unit(0, 1)]))
+
+    assert len(index) == 1
+    assert index.search(_unit(0, 1), 1)[0][1] == pytest.approx(1.0)
+
+
+@pytest.mark.unit
+def test_remove_and_compaction():
+    """Removed keys never come back, including after compaction"""
+    index = VectorIndex(exact=True)
+    keys = [f"k{i}" for i in range(6)]
+    index.add_many(keys, np.stack([_unit(1, i) for i in range(6)]))
+
+    assert index.remove("k0")
+    assert not index.remove("k0")
+    for key in keys[1:4]:
+        index.remove(key)
+
+    results = index.search(_unit(1, 0), 10)
+
+    assert sorted(key for key, _ in results) == ["k4", "k5"]
+    assert "k0" not in index
+    assert len(index) == 2
+
+
+@pytest.mark.unit
+def test_dimension_mismatch_raises():
+    """Vectors must match the dimension of the first insert"""
+    index = VectorIndex(exact=True)
+    index.add("a", _unit(1, 0))
+
+    with pytest.raises(ValueError):
+        index.add("b", _unit(1, 0, 0))
+
+
+@pytest.mark.unit
+def test_search_subset_only_ranks_given_keys():
+    """search_subset ignores unknown keys and everything outside the subset"""
+    index = VectorIndex(exact=True)
+    index.add_many(["a", "b", "c"], np.stack([_unit(1, 0), _unit(1, 1), _unit(0, 1)]))
+
+    results = index.search_subset(_unit(1, 0), ["c", "b", "missing"], 5)
+
+    assert [key for key, _ in results] == ["b", "c"]
+    assert index.search_subset(_unit(1, 0), ["missing"], 5) == []
+
+
+@pytest.mark.unit
+def test_empty_index_and_zero_k():
+    """Searching an empty index or with k <= 0 returns nothing"""
+    index = VectorIndex(exact=True)
+    assert index.search(_unit(1, 0), 3) == []
+
+    index.add("a", _unit(1, 0))
+    assert index.search(_unit(1, 0), 0) == []
+
+
+@pytest.mark.unit
+def test_semantic_cache_hits_similar_vector_in_scope():
+    """Near-identical queries share an entry only within the same scope"""
+    semantic = SemanticCache(maxsize=8, ttl=60, threshold=0.99)
+    semantic.set(_unit(1, 0, 0), "scope", ["result"])
+
+    assert semantic.get(_unit(1, 0.01, 0), "scope") == ["result"]
+    assert semantic.get(_unit(1, 0.01, 0), "other") is None
+    assert semantic.get(_unit(1, 1, 0), "scope") is None
+
+
+@pytest.mark.unit
+def test_semantic_cache_expires_entries(monkeypatch):
+    """Expired entries miss and are evicted"""
+    now = [1000.0]
+    monkeypatch.setattr(vector_index.time, "monotonic", lambda: now[0])
+    semantic = SemanticCache(maxsize=8, ttl=10)
+    semantic.set(_unit(1, 0), "scope", "value")
+
+    now[0] += 10
+
+    assert semantic.get(_unit(1, 0), "scope") is None
+    assert len(semantic) == 0
+
+
+@pytest.mark.unit
+def test_semantic_cache_evicts_least_recently_used():
+    """The oldest unused entry is dropped when the cache is full"""
+    semantic = SemanticCache(maxsize=2, ttl=60)
+    semantic.set(_unit(1, 0, 0), "scope", "a")
+    semantic.set(_unit(0, 1, 0), "scope", "b")
+    assert semantic.get(_unit(1, 0, 0), "scope") == "a"
+
+    semantic.set(_unit(0, 0, 1), "scope", "c")
+
+    assert len(semantic) == 2
+    assert semantic.get(_unit(1, 0, 0), "scope") == "a"
+    assert semantic.get(_unit(0, 1, 0), "scope") is None
+
+
+@pytest.mark.unit
+def test_semantic_cache_ignores_other_dimensions_and_clear():
+    """Vectors of another dimension never hit, and clear drops everything"""
+    semantic = SemanticCache(maxsize=8, ttl=60)
+    semantic.set(_unit(1, 0), "scope", "value")
+
+    assert semantic.get(_unit(1, 0, 0), "scope") is None
+    semantic.set(_unit(1, 0, 0), "scope", "ignored")
+    assert len(semantic) == 1
+
+    semantic.clear()
+    assert semantic.get(_unit(1, 0), "scope") is None
@@ -0,0 +1,3 @@
+"""
+Service layer tests
+"""
@@ -0,0 +1,149 @@
+"""
+Embedding Service Tests
+"""
+import asyncio
+import struct
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.embedding_service import (
+    EMBEDDING_FORMAT_FLOAT16,
+    EMBEDDING_FORMAT_FLOAT32,
+    EMBEDDING_FORMAT_INT8,
+    EmbeddingService,
+    pack_embedding,
+    unpack_embedding,
+)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Embedding service with a key configured and caching disabled"""
+    service = EmbeddingService()
+    service.api_key = "test-key"
+    monkeypatch.setattr(service, "_get_cached_embedding", AsyncMock(return_value=None))
+    monkeypatch.setattr(service, "_cache_embedding", AsyncMock())
+    return service
+
+
+@pytest.mark.unit
+def test_float32_round_trip():
+    """float32 packing is lossless for float32 values"""
+    embedding = [0.5, -0.25, 1.0, 0.0]
+    packed = pack_embedding(embedding)
+
+    assert packed[:1] == EMBEDDING_FORMAT_FLOAT32
+    assert len(packed) == 1 + 4 * len(embedding)
+    assert unpack_embedding(packed) == embedding
+
+
+@pytest.mark.unit
+def test_int8_round_trip_within_one_step():
+    """int8 packing is a quarter of the size and within one quantization step"""
+    embedding = [0.9, -0.45, 0.3, -0.9, 0.0]
+    packed = pack_embedding(embedding, quantize=True)
+
+    assert packed[:1] == EMBEDDING_FORMAT_INT8
+    assert len(packed) == 1 + 4 + len(embedding)
+    step = 0.9 / 127
+    for original, restored in zip(embedding, unpack_embedding(packed)):
+        assert restored == pytest.approx(original, abs=step)
+
+
+@pytest.mark.unit
+def test_int8_all_zero_vector():
+    """A zero vector quantizes without dividing by zero"""
+    assert unpack_embedding(pack_embedding([0.0, 0.0], quantize=True)) == [0.0, 0.0]
+
+
+@pytest.mark.unit
+def test_float16_unpack():
+    """float16 entries unpack to floats"""
+    packed = EMBEDDING_FORMAT_FLOAT16 + struct.pack("<3e", 0.5, -2.0, 0.125)
+
+    assert unpack_embedding(packed) == [0.5, -2.0, 0.125]
+
+
+@pytest.mark.unit
+def test_unpack_unknown_or_empty():
+    """Missing and unrecognised blobs unpack to None"""
+    assert unpack_embedding(None) is None
+    assert unpack_embedding(b"") is None
+    assert unpack_embedding(b"\x7f\x00\x00") is None
+
+
+@pytest.mark.unit
+async def test_concurrent_requests_share_one_call(service, monkeypatch):
+    """Identical texts in flight at the same time make one API request"""
+    async def request_embedding(text, cache_key, cache_ttl):
+        await asyncio.sleep(0.01)
+        return [1.0, 2.0]
+
+    request = AsyncMock(side_effect=request_embedding)
+    monkeypatch.setattr(service, "_request_embedding", request)
+
+    results = await asyncio.gather(*(service.generate_embedding("hello") for _ in range(3)))
+
+    assert request.await_count == 1
+    assert results == [[1.0, 2.0]] * 3
+    assert service._inflight == {}
+
+
+@pytest.mark.unit
+async def test_concurrent_requests_share_failure(service, monkeypatch):
+    """Callers joined to a failed request all see its error"""
+    async def request_embedding(text, cache_key, cache_ttl):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    request = AsyncMock(side_effect=request_embedding)
+    monkeypatch.setattr(service, "_request_embedding", request)
+
+    results = await asyncio.gather(
+        *(service.generate_embedding("hello") for _ in range(2)),
+        return_exceptions=True
+    )
+
+    assert request.await_count == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert service._inflight == {}
+
+
+@pytest.mark.unit
+async def test_batch_sends_duplicates_once(service, monkeypatch):
+    """Duplicate and blank texts in a batch do not reach the API"""
+    create = AsyncMock(return_value=SimpleNamespace(data=[
+        SimpleNamespace(embedding=[1.0]),
+        SimpleNamespace(embedding=[2.0]),
+    ]))
+    client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+    monkeypatch.setattr(service, "_client", lambda: client)
+
+    embeddings = await service.generate_batch_embeddings(["a", "b", "a", " "])
+
+    assert create.await_args.kwargs["input"] == ["a", "b"]
+    assert embeddings[:3] == [[1.0], [2.0], [1.0]]
+    assert embeddings[3] == [0.0] * service.dimensions
+    assert service._inflight == {}
+
+
+@pytest.mark.unit
+async def test_batch_joins_request_in_flight(service, monkeypatch):
+    """A batch waits for a single request already embedding one of its texts"""
+    async def request_embedding(text, cache_key, cache_ttl):
+        await asyncio.sleep(0.01)
+        return [9.0]
+
+    monkeypatch.setattr(service, "_request_embedding", AsyncMock(side_effect=request_embedding))
+    create = AsyncMock(return_value=SimpleNamespace(data=[SimpleNamespace(embedding=[1.0])]))
+    monkeypatch.setattr(service, "_client", lambda: SimpleNamespace(embeddings=SimpleNamespace(create=create)))
+
+    single = asyncio.create_task(service.generate_embedding("shared"))
+    await asyncio.sleep(0)
+    batch = await service.generate_batch_embeddings(["other", "shared"])
+
+    assert batch == [[1.0], [9.0]]
+    assert await single == [9.0]
+    assert create.await_args.kwargs["input"] == ["other"]
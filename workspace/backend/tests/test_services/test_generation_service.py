@@ -0,0 +1,189 @@
+"""
+Generation Service Tests
+"""
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.generation_service import (
+    GenerationService,
+    GenerationServiceError,
+    GenerationStatus,
+)
+from app.services.redis_service import redis_service
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Generation service whose Redis writes and task queueing are recorded in call order"""
+    service = GenerationService()
+    calls = []
+
+    async def save_generation(generation_id, data, changed=None):
+        calls.append(("save", dict(changed or data)))
+
+    async def start_pipeline(generation_request):
+        calls.append(("enqueue", generation_request["id"]))
+        return "task-1"
+
+    async def record_pipeline_task(generation_id, pipeline_task_id):
+        calls.append(("record_task", pipeline_task_id))
+
+    monkeypatch.setattr(service, "_save_generation", AsyncMock(side_effect=save_generation))
+    monkeypatch.setattr(service, "_start_generation_pipeline", AsyncMock(side_effect=start_pipeline))
+    monkeypatch.setattr(service, "_record_pipeline_task", AsyncMock(side_effect=record_pipeline_task))
+    monkeypatch.setattr(service, "_track_generation_event", AsyncMock())
+    service.calls = calls
+    return service
+
+
+@pytest.mark.unit
+async def test_create_generation_saves_before_enqueue(service):
+    """The worker must find the record, so it is written before the task is queued"""
+    result = await service.create_generation(user_id="user-1", prompt="epic thumbnail")
+
+    assert [name for name, _ in service.calls] == ["save", "enqueue", "record_task"]
+    saved = service.calls[0][1]
+    assert saved["status"] == GenerationStatus.PENDING.value
+    assert saved["pipeline_task_id"] is None
+    assert result["generation"]["pipeline_task_id"] == "task-1"
+    service._track_generation_event.assert_awaited_once()
+
+
+@pytest.mark.unit
+async def test_create_generation_marks_failed_enqueue(service):
+    """A record whose task never got queued is marked failed, not left pending"""
+    service._start_generation_pipeline.side_effect = GenerationServiceError("broker down")
+
+    with pytest.raises(GenerationServiceError, match="broker down"):
+        await service.create_generation(user_id="user-1", prompt="epic thumbnail")
+
+    assert [name for name, _ in service.calls] == ["save", "save"]
+    failed = service.calls[1][1]
+    assert set(failed) == {"status", "updated_at"}
+    assert failed["status"] == GenerationStatus.FAILED.value
+    service._record_pipeline_task.assert_not_awaited()
+
+
+@pytest.mark.unit
+async def test_coalesce_shares_one_fetch():
+    """Concurrent callers with the same key share one fetch and its result"""
+    service = GenerationService()
+    inflight = {}
+    fetch_count = 0
+
+    async def fetch():
+        nonlocal fetch_count
+        fetch_count += 1
+        await asyncio.sleep(0.01)
+        return {"status": "generating"}
+
+    results = await asyncio.gather(*(service._coalesce(inflight, "gen_1", fetch) for _ in range(3)))
+
+    assert fetch_count == 1
+    assert results == [{"status": "generating"}] * 3
+    assert inflight == {}
+
+
+@pytest.mark.unit
+async def test_coalesce_shares_failure_then_retries():
+    """A failed fetch fails every joined caller and is not cached"""
+    service = GenerationService()
+    inflight = {}
+
+    async def failing_fetch():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("redis down")
+
+    results = await asyncio.gather(
+        *(service._coalesce(inflight, "gen_1", failing_fetch) for _ in range(2)),
+        return_exceptions=True
+    )
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert inflight == {}
+    assert await service._coalesce(inflight, "gen_1", AsyncMock(return_value="ok")) == "ok"
+
+
+@pytest.mark.unit
+async def test_status_polls_share_fetch_without_leaking_fields(monkeypatch):
+    """Concurrent status polls make one fetch and get independent copies"""
+    service = GenerationService()
+
+    async def fetch_status(generation_id):
+        await asyncio.sleep(0.01)
+        return {"id": generation_id, "user_id": "user-1", "status": "generating", "created_at_ts": time.time()}
+
+    fetch = AsyncMock(side_effect=fetch_status)
+    monkeypatch.setattr(service, "_fetch_generation_status", fetch)
+
+    first, second = await asyncio.gather(
+        service.get_generation_status("gen_1", user_id="user-1"),
+        service.get_generation_status("gen_1", user_id="user-1")
+    )
+
+    assert fetch.await_count == 1
+    assert first["id"] == second["id"] == "gen_1"
+    assert "time_estimates" in first and "time_estimates" in second
+    assert first is not second
+
+
+def _legacy_record(generation_id: str) -> dict:
+    return {
+        "id": generation_id,
+        "user_id": "user-1",
+        "prompt": "epic thumbnail",
+        "status": GenerationStatus.GENERATING.value,
+        "progress": 10,
+        "created_at": "2026-01-01T00:00:00+00:00",
+        "created_at_ts": time.time(),
+    }
+
+
+@pytest.mark.unit
+async def test_legacy_string_record_moves_to_hash(fake_redis):
+    """Records cached as JSON strings before the hash layout are read and moved over"""
+    service = GenerationService()
+    await redis_service.set("generation:gen_old", _legacy_record("gen_old"), 60)
+
+    data = await service._get_cached_generation_data("gen_old")
+
+    assert data["prompt"] == "epic thumbnail"
+    assert fake_redis.type("generation:gen_old") == "none"
+    assert (await redis_service.hgetall("gen:record:gen_old"))["progress"] == 10
+
+
+@pytest.mark.unit
+async def test_patch_before_migration_is_kept(fake_redis):
+    """Field patches to a not yet migrated record succeed and win over the legacy copy"""
+    service = GenerationService()
+    await redis_service.set("generation:gen_old", _legacy_record("gen_old"), 60)
+
+    await service._patch_generation_fields("gen_old", progress=50)
+    await service._record_pipeline_task("gen_old", "task-9")
+    data = await service._get_cached_generation_data("gen_old")
+
+    assert data["progress"] == 50
+    assert data["pipeline_task_id"] == "task-9"
+    assert data["user_id"] == "user-1"
+
+
+@pytest.mark.unit
+async def test_history_includes_legacy_records(fake_redis):
+    """History pages move legacy records over instead of dropping them"""
+    service = GenerationService()
+    await redis_service.set("generation:gen_old", _legacy_record("gen_old"), 60)
+    await redis_service.zadd("user:user-1:generations", {"gen_old": time.time()})
+
+    generations, total = await service._get_user_generations("user-1", 10, 0, None)
+
+    assert total == 1
+    assert [data["id"] for data in generations] == ["gen_old"]
+
+
+@pytest.mark.unit
+async def test_missing_generation_is_none(fake_redis):
+    """Generations in neither layout are reported missing"""
+    assert await GenerationService()._get_cached_generation_data("gen_none") is None
@@ -0,0 +1,68 @@
+"""
+Midjourney Service Tests
+"""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.services.midjourney_service import MidjourneyService, MidjourneyServiceError
+from app.services.redis_service import redis_service
+
+
+@pytest.fixture
+def service(monkeypatch):
+    """Midjourney service with no cached results"""
+    monkeypatch.setattr(redis_service, "get", AsyncMock(return_value=None))
+    return MidjourneyService()
+
+
+@pytest.mark.unit
+async def test_identical_requests_share_one_job(service, monkeypatch):
+    """Concurrent identical generations submit a single provider job"""
+    async def generate_once(cache_key, *args):
+        await asyncio.sleep(0.01)
+        return {"image_url": "https://cdn.example.com/a.png"}
+
+    generate = AsyncMock(side_effect=generate_once)
+    monkeypatch.setattr(service, "_generate_once", generate)
+
+    results = await asyncio.gather(*(service.generate_thumbnail("epic thumbnail") for _ in range(3)))
+
+    assert generate.await_count == 1
+    assert results == [{"image_url": "https://cdn.example.com/a.png"}] * 3
+    assert service._inflight == {}
+
+
+@pytest.mark.unit
+async def test_different_requests_run_separately(service, monkeypatch):
+    """Requests with different prompts are not coalesced"""
+    generate = AsyncMock(return_value={"image_url": "https://cdn.example.com/a.png"})
+    monkeypatch.setattr(service, "_generate_once", generate)
+
+    await asyncio.gather(
+        service.generate_thumbnail("epic thumbnail"),
+        service.generate_thumbnail("calm thumbnail")
+    )
+
+    assert generate.await_count == 2
+
+
+@pytest.mark.unit
+async def test_joined_requests_share_failure(service, monkeypatch):
+    """Every caller joined to a failed job gets a service error"""
+    async def generate_once(cache_key, *args):
+        await asyncio.sleep(0.01)
+        raise MidjourneyServiceError("No Midjourney service available")
+
+    generate = AsyncMock(side_effect=generate_once)
+    monkeypatch.setattr(service, "_generate_once", generate)
+
+    results = await asyncio.gather(
+        *(service.generate_thumbnail("epic thumbnail") for _ in range(2)),
+        return_exceptions=True
+    )
+
+    assert generate.await_count == 1
+    assert all(isinstance(result, MidjourneyServiceError) for result in results)
+    assert service._inflight == {}
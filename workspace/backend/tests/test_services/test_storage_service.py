@@ -0,0 +1,119 @@
+"""
+Storage Service Tests
+"""
+import asyncio
+import os
+
+import pytest
+
+from app.services.storage_service import StorageService
+
+
+@pytest.fixture
+def storage(fake_redis, tmp_path):
+    """Local storage service under a temporary upload directory"""
+    return StorageService({'STORAGE_TYPE': 'local', 'UPLOAD_DIR': str(tmp_path)})
+
+
+def _stored(storage: StorageService, file_key: str) -> bool:
+    return os.path.exists(os.path.join(storage._upload_dir_str, file_key))
+
+
+@pytest.mark.unit
+async def test_identical_uploads_share_one_object(storage, fake_redis):
+    """Uploading the same bytes twice stores one object with two references"""
+    first = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+    second = await storage.upload_file(b"thumbnail bytes", "b.png", folder="templates")
+
+    assert first['key'] == second['key']
+    assert not first['deduplicated']
+    assert second['deduplicated']
+    assert _stored(storage, first['key'])
+    assert fake_redis.get(f"storage:refs:{first['key']}") == "2"
+
+
+@pytest.mark.unit
+async def test_delete_keeps_object_until_last_reference(storage, fake_redis):
+    """A shared object survives deletes until its last upload is deleted"""
+    first = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+    await storage.upload_file(b"thumbnail bytes", "b.png", folder="templates")
+    file_key = first['key']
+
+    assert await storage.delete_file(file_key)
+    assert _stored(storage, file_key)
+
+    assert await storage.delete_file(file_key)
+    assert not _stored(storage, file_key)
+    assert fake_redis.get(f"storage:refs:{file_key}") is None
+    assert not fake_redis.keys("storage:lock:*")
+
+
+@pytest.mark.unit
+async def test_upload_after_last_delete_stores_again(storage):
+    """Re-uploading bytes whose object was deleted writes a fresh copy"""
+    first = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+    await storage.delete_file(first['key'])
+
+    again = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+
+    assert again['key'] == first['key']
+    assert not again['deduplicated']
+    assert _stored(storage, again['key'])
+
+
+@pytest.mark.unit
+async def test_delete_many_only_removes_unreferenced(storage):
+    """Bulk deletes skip shared objects and remove the rest"""
+    shared = await storage.upload_file(b"shared bytes", "a.png", folder="templates")
+    await storage.upload_file(b"shared bytes", "b.png", folder="templates")
+    single = await storage.upload_file(b"single bytes", "c.png", folder="templates")
+
+    result = await storage.delete_many([shared['key'], single['key']])
+
+    assert result == {'deleted': 2, 'failed': []}
+    assert _stored(storage, shared['key'])
+    assert not _stored(storage, single['key'])
+
+
+@pytest.mark.unit
+async def test_unreferenced_upload_gets_unique_key(storage, monkeypatch):
+    """When references cannot be counted the upload is stored under its own key"""
+    async def no_incr(key, amount=1):
+        return 0
+
+    monkeypatch.setattr("app.services.storage_service.redis_service.incr", no_incr)
+
+    first = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+    second = await storage.upload_file(b"thumbnail bytes", "b.png", folder="templates")
+
+    assert first['key'] != second['key']
+    assert first['hash'] == second['hash']
+
+    assert await storage.delete_file(first['key'])
+    assert not _stored(storage, first['key'])
+    assert _stored(storage, second['key'])
+
+
+@pytest.mark.unit
+async def test_reference_lock_leaves_other_holders_lock(storage, fake_redis):
+    """A holder whose lock expired does not release the lock another worker took"""
+    async with storage._reference_lock("templates/ab/cd/key.png"):
+        # The TTL ran out and another worker acquired the lock
+        fake_redis.set("storage:lock:templates/ab/cd/key.png", "other-worker")
+
+    assert fake_redis.get("storage:lock:templates/ab/cd/key.png") == "other-worker"
+
+
+@pytest.mark.unit
+async def test_delete_locks_are_refreshed_until_released(storage, fake_redis):
+    """Locks held for a delete outlive their TTL while the delete runs, then go away"""
+    uploaded = await storage.upload_file(b"thumbnail bytes", "a.png", folder="templates")
+    lock_key = f"storage:lock:{uploaded['key']}"
+    storage.key_lock_ttl = 1
+
+    async with storage._releasing([uploaded['key']]) as deletable:
+        assert deletable == [uploaded['key']]
+        await asyncio.sleep(1.5)
+        assert fake_redis.exists(lock_key)
+
+    assert not fake_redis.exists(lock_key)
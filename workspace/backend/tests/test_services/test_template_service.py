@@ -0,0 +1,127 @@
+"""
+Template Service Tests
+"""
+import pytest
+
+from app.services.redis_service import redis_service
+from app.services.template_service import TemplateService, _pack_unit_vector, _unit_vector
+
+TEMPLATES = {
+    "tpl_a": {"category": "gaming", "user_id": "u1", "tags": ["fps", "neon"]},
+    "tpl_b": {"category": "gaming", "user_id": "u2", "tags": ["rpg"]},
+    "tpl_c": {"category": "vlog", "user_id": "u1", "tags": ["neon"]},
+    "tpl_d": {"category": "gaming", "user_id": "u1", "tags": []},
+}
+
+
+@pytest.fixture
+async def service(fake_redis):
+    """Template service whose index sets hold the templates above"""
+    service = TemplateService()
+    for template_id, template_data in TEMPLATES.items():
+        await service._update_search_indexes(template_id, None, template_data)
+    return service
+
+
+@pytest.mark.unit
+async def test_match_filters_required_sets(service):
+    """Every all-of set must contain a match"""
+    filter_keys = service._filter_keys("gaming", None, "u1")
+
+    assert sorted(await service._match_filters(filter_keys)) == ["tpl_a", "tpl_d"]
+
+
+@pytest.mark.unit
+async def test_match_filters_any_of_tags(service):
+    """Tags match when any one of them is present"""
+    tags_only = service._filter_keys(None, ["neon", "rpg"], None)
+    gaming_tags = service._filter_keys("gaming", ["neon", "rpg"], None)
+
+    assert sorted(await service._match_filters(tags_only)) == ["tpl_a", "tpl_b", "tpl_c"]
+    assert sorted(await service._match_filters(gaming_tags)) == ["tpl_a", "tpl_b"]
+
+
+@pytest.mark.unit
+async def test_match_filters_keeps_candidate_order_and_limit(service):
+    """Given candidates are checked in order and cut off at the limit"""
+    filter_keys = service._filter_keys(None, None, "u1")
+    candidates = ["tpl_d", "tpl_b", "tpl_c", "tpl_a"]
+
+    assert await service._match_filters(filter_keys, candidates) == ["tpl_d", "tpl_c", "tpl_a"]
+    assert await service._match_filters(filter_keys, candidates, limit=2) == ["tpl_d", "tpl_c"]
+    assert await service._match_filters(filter_keys, []) == []
+
+
+@pytest.mark.unit
+async def test_deleted_template_leaves_index_sets(service):
+    """Deleting a template removes it from every set it was indexed in"""
+    deleted = dict(TEMPLATES["tpl_a"], status="deleted")
+    await service._update_search_indexes("tpl_a", TEMPLATES["tpl_a"], deleted)
+
+    tags_only = service._filter_keys(None, ["fps", "neon"], None)
+    assert await service._match_filters(tags_only) == ["tpl_c"]
+
+
+@pytest.mark.unit
+async def test_backfill_indexes_live_templates(fake_redis):
+    """Backfill indexes cached templates and skips deleted ones"""
+    service = TemplateService()
+    await redis_service.set("template:tpl_live", {"category": "gaming", "user_id": "u1", "tags": ["fps"]}, 60)
+    await redis_service.set("template:tpl_gone", {"category": "gaming", "user_id": "u1", "status": "deleted"}, 60)
+
+    assert await service.backfill_search_indexes(batch_size=1) == 1
+    assert await service._match_filters(service._filter_keys("gaming", ["fps"], "u1")) == ["tpl_live"]
+
+
+@pytest.mark.unit
+async def test_soft_deleted_template_leaves_vector_search(fake_redis):
+    """A soft-deleted template is not returned by search, even after the index is rebuilt"""
+    service = TemplateService()
+    service.analytics_enabled = False
+    vector = _unit_vector([1.0, 0.0, 0.0])
+    await service._cache_template_data("tpl_x", {"template_id": "tpl_x", "user_id": "u1", "status": "active"})
+    await redis_service.set_bytes("template:embedding:tpl_x", _pack_unit_vector(vector), 60)
+
+    found = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+    assert [result["template_id"] for result in found["results"]] == ["tpl_x"]
+
+    await service.delete_template("tpl_x", "u1", soft_delete=True)
+    service._vector_index_loaded_at = None
+
+    found = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+    assert found["results"] == []
+    assert await redis_service.get_bytes("template:embedding:tpl_x") is None
+
+
+@pytest.mark.unit
+async def test_search_skips_deleted_records(fake_redis):
+    """Records marked deleted are dropped even when their embedding is still indexed"""
+    service = TemplateService()
+    vector = _unit_vector([1.0, 0.0, 0.0])
+    await service._cache_template_data("tpl_x", {"template_id": "tpl_x", "status": "deleted"})
+    await redis_service.set_bytes("template:embedding:tpl_x", _pack_unit_vector(vector), 60)
+
+    found = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+
+    assert found["results"] == []
+    assert found["metadata"]["returned"] == 0
+
+
+@pytest.mark.unit
+async def test_search_cache_hits_return_copies(fake_redis):
+    """Annotating a search result does not change what later cache hits return"""
+    service = TemplateService()
+    vector = _unit_vector([1.0, 0.0, 0.0])
+    await service._cache_template_data("tpl_x", {"template_id": "tpl_x", "status": "active"})
+    await redis_service.set_bytes("template:embedding:tpl_x", _pack_unit_vector(vector), 60)
+
+    first = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+    first["results"][0]["note"] = "mine"
+    first["results"].append({"template_id": "tpl_extra"})
+    second = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+    second["results"][0]["note"] = "mine"
+    third = await service.search_templates(embedding=[1.0, 0.0, 0.0])
+
+    assert third["metadata"]["cache_hit"] is True
+    assert [result["template_id"] for result in third["results"]] == ["tpl_x"]
+    assert "note" not in third["results"][0]